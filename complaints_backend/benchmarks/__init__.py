@@ -0,0 +1,12 @@
+"""
+حزمة قياس أداء نقاط النهاية (Benchmarks)
+
+- seed: توليد بيانات اصطناعية بأحجام قابلة للضبط (تجار، شكاوى، إشعارات، مدفوعات)
+- runner: تشغيل السيناريوهات عبر app.test_client() وقياس p50/p95/p99
+  والإنتاجية وعدد جمل SQL لكل طلب، مع حفظ النتائج بصيغة JSON للمقارنة
+
+تشغيل:
+    cd complaints_backend
+    python -m benchmarks --traders 50000 --complaints 1000000 --notifications 10000000
+    python -m benchmarks --skip-seed --requests 500 --output results/after.json --compare results/before.json
+"""
@@ -0,0 +1,232 @@
+"""
+تشغيل سيناريوهات القياس على تطبيق Flask الحقيقي عبر app.test_client()
+
+لكل سيناريو: زمن كل طلب، عدد جمل SQL المنفذة أثناءه (من خيط الطلب فقط)،
+ثم p50/p95/p99 والمتوسط والأقصى والإنتاجية (طلب/ثانية) ومعدل الأخطاء.
+"""
+import json
+import math
+import platform
+import statistics
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta
+import jwt
+from sqlalchemy import event
+from src.database.db import db
+from src.models.complaint import User, Role
+from benchmarks.seed import BENCH_PASSWORD
+
+
+def percentile(values, pct):
+    """نسبة مئوية بطريقة nearest-rank"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class BenchmarkContext:
+    """المستخدمون والرموز المستخدمة في السيناريوهات"""
+
+    def __init__(self, app, trader_usernames, committee_usernames, search_terms):
+        self.app = app
+        self.trader_usernames = trader_usernames
+        self.committee_usernames = committee_usernames
+        self.search_terms = search_terms
+        self._tokens = {}
+        self._counter = 0
+
+        with app.app_context():
+            usernames = trader_usernames + committee_usernames
+            self._user_ids = dict(
+                db.session.query(User.username, User.user_id).filter(User.username.in_(usernames)).all()
+            )
+
+    @classmethod
+    def from_database(cls, app, search_terms=None):
+        """بناء السياق من بيانات موجودة (عند تخطي التوليد)"""
+        with app.app_context():
+            def usernames(role_name, limit):
+                return [
+                    username for (username,) in db.session.query(User.username)
+                    .join(Role, User.role_id == Role.role_id)
+                    .filter(Role.role_name == role_name, User.username.like('bench_%'))
+                    .order_by(User.username).limit(limit).all()
+                ]
+            traders = usernames('Trader', 50)
+            committee = usernames('Technical Committee', 10)
+        return cls(app, traders, committee, search_terms or ['فاتوره', 'الاغلاق'])
+
+    def next_index(self):
+        self._counter += 1
+        return self._counter
+
+    def headers(self, username):
+        token = self._tokens.get(username)
+        if token is None:
+            token = jwt.encode({
+                'user_id': self._user_ids[username],
+                'exp': datetime.utcnow() + timedelta(hours=6)
+            }, self.app.config['SECRET_KEY'], algorithm='HS256')
+            self._tokens[username] = token
+        return {'Authorization': f'Bearer {token}'}
+
+    def trader(self):
+        return self.trader_usernames[self.next_index() % len(self.trader_usernames)]
+
+    def committee(self):
+        return self.committee_usernames[self.next_index() % len(self.committee_usernames)]
+
+
+def _login(client, ctx):
+    return client.post('/api/login', json={'username': ctx.trader(), 'password': BENCH_PASSWORD})
+
+
+def _complaint_list(client, ctx):
+    return client.get('/api/complaints?per_page=20', headers=ctx.headers(ctx.committee()))
+
+
+def _complaint_list_trader(client, ctx):
+    return client.get('/api/complaints?per_page=20', headers=ctx.headers(ctx.trader()))
+
+
+def _complaint_search(client, ctx):
+    term = ctx.search_terms[ctx.next_index() % len(ctx.search_terms)]
+    return client.get('/api/complaints', query_string={'search': term, 'per_page': 20},
+                      headers=ctx.headers(ctx.committee()))
+
+
+def _dashboard_stats(client, ctx):
+    return client.get('/api/dashboard/stats', headers=ctx.headers(ctx.committee()))
+
+
+def _notifications(client, ctx):
+    return client.get('/api/notifications?per_page=20', headers=ctx.headers(ctx.trader()))
+
+
+def _subscription_status(client, ctx):
+    return client.get('/api/subscription/status', headers=ctx.headers(ctx.trader()))
+
+
+def _payment_review(client, ctx):
+    return client.get('/api/admin/payments?status=pending', headers=ctx.headers(ctx.committee()))
+
+
+SCENARIOS = {
+    'login': _login,
+    'complaint_list': _complaint_list,
+    'complaint_list_trader': _complaint_list_trader,
+    'complaint_search': _complaint_search,
+    'dashboard_stats': _dashboard_stats,
+    'notifications': _notifications,
+    'subscription_status': _subscription_status,
+    'payment_review': _payment_review,
+}
+
+
+def run_scenario(app, ctx, name, requests=100, warmup=5):
+    scenario = SCENARIOS[name]
+    client = app.test_client()
+    request_thread = threading.current_thread()
+    statements = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread() is request_thread:
+            statements[0] += 1
+
+    for _ in range(warmup):
+        scenario(client, ctx)
+
+    with app.app_context():
+        engine = db.engine
+
+    latencies = []
+    sql_counts = []
+    errors = 0
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        started = time.perf_counter()
+        for _ in range(requests):
+            statements[0] = 0
+            request_started = time.perf_counter()
+            response = scenario(client, ctx)
+            latencies.append((time.perf_counter() - request_started) * 1000)
+            sql_counts.append(statements[0])
+            if response.status_code >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'max_ms': round(max(latencies), 3),
+        'throughput_rps': round(requests / elapsed, 2) if elapsed else None,
+        'sql_per_request': round(statistics.mean(sql_counts), 2),
+        'sql_per_request_max': max(sql_counts)
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(app, ctx, scenarios=None, requests=100, warmup=5, progress=print):
+    """تشغيل السيناريوهات المطلوبة وإرجاع تقرير قابل للحفظ بصيغة JSON"""
+    results = {}
+    for name in scenarios or SCENARIOS:
+        results[name] = run_scenario(app, ctx, name, requests=requests, warmup=warmup)
+        progress(f"{name:<22} p50={results[name]['p50_ms']}ms p95={results[name]['p95_ms']}ms "
+                 f"p99={results[name]['p99_ms']}ms rps={results[name]['throughput_rps']} "
+                 f"sql/req={results[name]['sql_per_request']} errors={results[name]['errors']}")
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+
+    return {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'database': dialect,
+            'requests_per_scenario': requests,
+            'warmup': warmup
+        },
+        'scenarios': results
+    }
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, ensure_ascii=False, indent=2)
+
+
+def compare_reports(current, baseline, metrics=('p50_ms', 'p95_ms', 'p99_ms', 'sql_per_request')):
+    """الفروقات النسبية بين تقريرين لكل سيناريو مشترك"""
+    comparison = {}
+    for name, result in current['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        comparison[name] = {}
+        for metric in metrics:
+            before, after = previous.get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            change = round((after - before) / before * 100, 1) if before else None
+            comparison[name][metric] = {'before': before, 'after': after, 'change_pct': change}
+    return comparison
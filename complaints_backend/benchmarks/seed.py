@@ -0,0 +1,245 @@
+"""
+توليد بيانات اصطناعية بحجم الإنتاج لقياس الأداء
+
+إعادة التهيئة تفرغ قاعدة البيانات ثم تبني المخطط بمشغّل الترحيلات (migrate_app) كما في
+النشر، فيُقاس الأداء على نفس الجداول والفهارس التي تنتجها الترحيلات.
+يكتب الصفوف بجمل INSERT جماعية على دفعات عبر Core (دون أحداث الـ ORM)،
+ثم يعيد بناء فهرس البحث وعدادات لوحة المعلومات مرة واحدة في النهاية.
+"""
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import MetaData
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.database.migrate import migrate_app
+from src.models.complaint import (
+    Role, User, ComplaintCategory, ComplaintStatus, Complaint,
+    Notification, Subscription, PaymentMethod, Payment
+)
+from src.services.search import rebuild_search_index
+from src.services.dashboard_stats import reconcile_dashboard_stats
+from src.services.notification_counters import reconcile_unread_counters
+
+BENCH_PASSWORD = 'bench-password'
+
+ROLES = [
+    (1, 'Trader', 'تاجر'),
+    (2, 'Technical Committee', 'لجنة فنية'),
+    (3, 'Higher Committee', 'لجنة عليا'),
+]
+CATEGORIES = ['غش تجاري', 'جودة المنتج', 'خدمة العملاء', 'تسعير', 'أخرى']
+STATUSES = ['جديدة', 'قيد المراجعة', 'محالة للجنة الفنية', 'مقبولة', 'مرفوضة', 'مغلقة']
+PRIORITIES = ['Low', 'Medium', 'High', 'Urgent']
+WORDS = [
+    'فاتورة', 'الأسعار', 'إغلاق', 'المحل', 'تأخير', 'التوصيل', 'جودة', 'المنتج',
+    'غش', 'الميزان', 'ضريبة', 'الجمارك', 'مخالفة', 'ترخيص', 'الكهرباء', 'المياه',
+    'شحنة', 'مستودع', 'تسعيرة', 'انتهاء', 'صلاحية', 'استيراد', 'تصدير', 'عقد',
+]
+
+
+@dataclass
+class SeedVolumes:
+    traders: int = 1000
+    committee: int = 20
+    admins: int = 5
+    complaints: int = 10000
+    notifications: int = 50000
+    payments: int = 2000
+    chunk_size: int = 5000
+
+    def to_dict(self):
+        return asdict(self)
+
+
+def _chunks(generator, size):
+    chunk = []
+    for row in generator:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(table, rows, chunk_size):
+    total = 0
+    for chunk in _chunks(rows, chunk_size):
+        with db.engine.begin() as connection:
+            connection.execute(table.insert(), chunk)
+        total += len(chunk)
+    return total
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _empty_database():
+    """حذف كل ما في قاعدة بيانات القياس بما فيه schema_migrations والجداول المشتقة"""
+    db.session.remove()
+    engine = db.engine
+    dialect = engine.dialect.name
+    if dialect == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+        engine.dispose()
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            try:
+                os.remove(engine.url.database + suffix)
+            except FileNotFoundError:
+                pass
+    elif dialect == 'postgresql':
+        with engine.begin() as connection:
+            connection.exec_driver_sql('DROP SCHEMA public CASCADE')
+            connection.exec_driver_sql('CREATE SCHEMA public')
+    else:
+        metadata = MetaData()
+        metadata.reflect(engine)
+        metadata.drop_all(engine)
+
+
+def seed(volumes=None, reset=True, random_seed=42, progress=print):
+    """
+    تعبئة قاعدة البيانات الحالية (app context مطلوب)
+
+    Returns:
+        dict: الأحجام الفعلية والزمن المستغرق ومعرفات المستخدمين المرجعيين للسيناريوهات
+    """
+    volumes = volumes or SeedVolumes()
+    rng = random.Random(random_seed)
+    started = time.perf_counter()
+    now = datetime.utcnow()
+
+    if reset:
+        _empty_database()
+        migrate_app(current_app._get_current_object())
+
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+
+    with db.engine.begin() as connection:
+        connection.execute(Role.__table__.insert(), [
+            {'role_id': role_id, 'role_name': name, 'description': description}
+            for role_id, name, description in ROLES
+        ])
+        connection.execute(ComplaintCategory.__table__.insert(), [
+            {'category_id': i + 1, 'category_name': name} for i, name in enumerate(CATEGORIES)
+        ])
+        connection.execute(ComplaintStatus.__table__.insert(), [
+            {'status_id': i + 1, 'status_name': name} for i, name in enumerate(STATUSES)
+        ])
+        method_id = str(uuid.uuid4())
+        connection.execute(PaymentMethod.__table__.insert(), [{
+            'method_id': method_id, 'name': 'تحويل بنكي', 'account_number': '000111',
+            'account_holder': 'اللجنة', 'is_active': True, 'display_order': 1
+        }])
+
+    def users(prefix, count, role_id):
+        for i in range(count):
+            yield {
+                'user_id': str(uuid.uuid4()),
+                'username': f'bench_{prefix}_{i}',
+                'email': f'bench_{prefix}_{i}@bench.local',
+                'password_hash': password_hash,
+                'full_name': f'{prefix} {i}',
+                'role_id': role_id,
+                'is_active': True,
+                'created_at': now,
+                'updated_at': now
+            }
+
+    trader_rows = list(users('trader', volumes.traders, 1))
+    committee_rows = list(users('committee', volumes.committee, 2))
+    admin_rows = list(users('admin', volumes.admins, 3))
+    for rows in (trader_rows, committee_rows, admin_rows):
+        _insert(User.__table__, iter(rows), volumes.chunk_size)
+    trader_ids = [row['user_id'] for row in trader_rows]
+    committee_ids = [row['user_id'] for row in committee_rows]
+    progress(f'users: {len(trader_ids) + len(committee_ids) + len(admin_rows)}')
+
+    def subscriptions():
+        for user_id in trader_ids:
+            start = now - timedelta(days=rng.randint(0, 300))
+            yield {
+                'subscription_id': str(uuid.uuid4()),
+                'user_id': user_id,
+                'start_date': start,
+                'end_date': start + timedelta(days=365),
+                'status': 'active',
+                'created_at': start,
+                'updated_at': start
+            }
+
+    _insert(Subscription.__table__, subscriptions(), volumes.chunk_size)
+    progress(f'subscriptions: {len(trader_ids)}')
+
+    def complaints():
+        for _ in range(volumes.complaints):
+            submitted = now - timedelta(minutes=rng.randint(0, 60 * 24 * 730))
+            yield {
+                'complaint_id': str(uuid.uuid4()),
+                'trader_id': rng.choice(trader_ids),
+                'title': _text(rng, 4),
+                'description': _text(rng, 20),
+                'category_id': rng.randint(1, len(CATEGORIES)),
+                'status_id': rng.randint(1, len(STATUSES)),
+                'priority': rng.choice(PRIORITIES),
+                'submitted_at': submitted,
+                'last_updated_at': submitted,
+                'assigned_to_committee_id': rng.choice(committee_ids) if committee_ids and rng.random() < 0.5 else None
+            }
+
+    complaint_count = _insert(Complaint.__table__, complaints(), volumes.chunk_size)
+    progress(f'complaints: {complaint_count}')
+
+    recipients = trader_ids + committee_ids
+
+    def notifications():
+        for _ in range(volumes.notifications):
+            yield {
+                'notification_id': str(uuid.uuid4()),
+                'user_id': rng.choice(recipients),
+                'message': _text(rng, 8),
+                'type': 'status_update',
+                'is_read': rng.random() < 0.7,
+                'created_at': now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            }
+
+    notification_count = _insert(Notification.__table__, notifications(), volumes.chunk_size)
+    progress(f'notifications: {notification_count}')
+
+    def payments():
+        for _ in range(volumes.payments):
+            created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+            yield {
+                'payment_id': str(uuid.uuid4()),
+                'user_id': rng.choice(trader_ids),
+                'method_id': method_id,
+                'sender_name': 'مرسل',
+                'sender_phone': '777000000',
+                'amount': 50000.0,
+                'currency': 'YER',
+                'payment_date': created,
+                'receipt_image_path': f'{uuid.uuid4()}.jpg',
+                'status': rng.choice(['pending', 'approved', 'approved', 'rejected']),
+                'created_at': created
+            }
+
+    payment_count = _insert(Payment.__table__, payments(), volumes.chunk_size)
+    progress(f'payments: {payment_count}')
+
+    rebuild_search_index()
+    reconcile_dashboard_stats()
+    reconcile_unread_counters()
+    progress('search index, dashboard and unread counters rebuilt')
+
+    return {
+        'volumes': volumes.to_dict(),
+        'seed_seconds': round(time.perf_counter() - started, 2),
+        'trader_usernames': [row['username'] for row in trader_rows[:50]],
+        'committee_usernames': [row['username'] for row in committee_rows[:10]],
+        'search_terms': ['فاتوره', 'الاغلاق', 'جودة المنتج', 'تأخير التوصيل']
+    }
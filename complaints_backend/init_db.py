@@ -2,14 +2,15 @@
 Initialize database with default roles and data
 """
 from src.database.db import db
+from src.database.migrate import run_migrations
 from src.main import app
 from src.models.complaint import Role, ComplaintCategory, ComplaintStatus
 
 def init_database():
     """Initialize database with default data"""
     with app.app_context():
-        # Create all tables
-        db.create_all()
+        # Create/upgrade the schema through the versioned migrations
+        run_migrations(db.engine)
         
         # Add default roles if they don't exist
         if Role.query.count() == 0:
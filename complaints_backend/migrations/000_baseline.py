@@ -0,0 +1,24 @@
+"""
+Migration Script: Baseline schema
+Created: 2026-10-17
+Description: Creates every model table that does not exist yet (the schema src/main.py used to
+create with db.create_all() on every worker boot). Existing tables are left untouched.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.db import db
+import src.models.complaint  # noqa: F401  (register all tables on db.metadata)
+import src.services.search  # noqa: F401  (after_create hooks for the search index)
+
+
+def upgrade(connection):
+    """Create missing tables (and the search index through their after_create hooks)"""
+    db.metadata.create_all(connection)
+
+
+if __name__ == "__main__":
+    from src.database.migrate import main
+    main()
@@ -0,0 +1,73 @@
+"""
+Migration Script: Composite indexes for hot list/lookup queries
+Created: 2026-10-17
+Description: Adds composite indexes matching the filters and sort order of the hot queries
+(complaint lists, active subscription lookups, payment review queue, receipt owner lookup,
+notification lists, audit log list) and drops the single-column indexes from migration 001
+that the new ones make redundant.
+On PostgreSQL indexes are built with CONCURRENTLY so writes are not blocked.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+# Keep in sync with __table_args__ in src/models/complaint.py
+INDEXES = [
+    ("idx_complaints_trader_submitted", "complaints", ("trader_id", "submitted_at")),
+    ("idx_complaints_assigned_submitted", "complaints", ("assigned_to_committee_id", "submitted_at")),
+    ("idx_subscriptions_user_status_end", "subscriptions", ("user_id", "status", "end_date")),
+    ("idx_subscriptions_status_end", "subscriptions", ("status", "end_date")),
+    ("idx_payments_status_created", "payments", ("status", "created_at")),
+    ("idx_payments_user_status", "payments", ("user_id", "status")),
+    ("ix_payments_receipt_image_path", "payments", ("receipt_image_path",)),
+    ("idx_notifications_user_created", "notifications", ("user_id", "created_at")),
+    ("idx_notifications_user_read_created", "notifications", ("user_id", "is_read", "created_at")),
+    ("idx_audit_logs_action_created", "audit_logs", ("action_type", "created_at")),
+    ("idx_audit_logs_created", "audit_logs", ("created_at",)),
+]
+
+# Leading column of a composite index above; dropping them saves a write per insert/update
+REDUNDANT_INDEXES = [
+    "idx_complaints_trader_id",
+    "idx_complaints_assigned_to",
+    "idx_subscriptions_user_id",
+    "idx_subscriptions_status",
+    "idx_payments_user_id",
+    "idx_payments_status",
+    "idx_audit_logs_action_type",
+]
+
+
+# CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+TRANSACTIONAL = False
+
+
+def upgrade(connection):
+    """Execute migration to add composite indexes (applied by src/database/migrate.py)"""
+    concurrently = "CONCURRENTLY " if connection.dialect.name == "postgresql" else ""
+
+    print("Starting migration: Adding composite indexes...")
+    print("\n1. Creating composite indexes...")
+    for idx_name, table_name, columns in INDEXES:
+        connection.execute(text(
+            f"CREATE INDEX {concurrently}IF NOT EXISTS {idx_name} ON {table_name}({', '.join(columns)})"
+        ))
+        print(f"   ✓ Created index: {idx_name}")
+
+    print("\n2. Dropping redundant single-column indexes...")
+    for idx_name in REDUNDANT_INDEXES:
+        connection.execute(text(f"DROP INDEX {concurrently}IF EXISTS {idx_name}"))
+        print(f"   ✓ Dropped index: {idx_name}")
+
+    print("\n3. Refreshing planner statistics...")
+    connection.execute(text("ANALYZE"))
+
+    print("\n✅ Migration completed successfully!")
+
+
+if __name__ == "__main__":
+    from src.database.migrate import main
+    main()
@@ -1,4 +1,4 @@
 from .logger import get_logger, setup_logging
-from .audit import AuditLogger
+from .audit import AuditLogger, audit_buffer
 
-__all__ = ['get_logger', 'setup_logging', 'AuditLogger']
+__all__ = ['get_logger', 'setup_logging', 'AuditLogger', 'audit_buffer']
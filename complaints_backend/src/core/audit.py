@@ -1,13 +1,131 @@
+"""
+سجل التدقيق (Audit) مع كتابة مؤجلة على دفعات
+
+- الوضع الافتراضي: يُضاف السجل إلى طابور محدود (AUDIT_QUEUE_SIZE) ويكتبه عامل خلفي
+  على دفعات عند امتلاء الدفعة (AUDIT_BATCH_SIZE) أو مرور AUDIT_FLUSH_INTERVAL ثانية،
+  عبر اتصال مستقل بقاعدة البيانات دون المساس بجلسة الطلب
+- must_persist=True: كتابة متزامنة عبر اتصال مستقل للأحداث الأمنية الحرجة
+- commit=False: إضافة السجل إلى جلسة المستدعي ليُثبّت مع عمله في نفس المعاملة
+- عند امتلاء الطابور يُسقط السجل ويُحتسب في مقياس dropped
+"""
+import atexit
 import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
 from typing import Optional
+from flask import current_app
+from sqlalchemy import insert
 from src.database.db import db
 from src.models.complaint import AuditLog
 
+
+class AuditBuffer:
+    """طابور محدود لسجلات التدقيق مع عامل خلفي يكتبها على دفعات"""
+
+    def __init__(self, maxsize=10000, batch_size=100, flush_interval=2.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._app = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('complaints_system.audit')
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_flush_ms = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._app is None:
+                self._app = current_app._get_current_object()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def put(self, row):
+        """إضافة سجل دون انتظار، يعيد False إن كان الطابور ممتلئاً"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            self.logger.warning(f"Audit queue full, dropped {row['action_type']} entry")
+            return False
+        self.enqueued += 1
+        return True
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, rows):
+        started = time.perf_counter()
+        with self._app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(insert(AuditLog.__table__).values(rows))
+        self.last_flush_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                self._write(batch)
+                self.written += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.failed += len(batch)
+                self.logger.error(f"Failed to write {len(batch)} audit entries: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """انتظار كتابة كل السجلات المعلقة"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'queue_capacity': self._queue.maxsize,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+            'last_flush_ms': self.last_flush_ms
+        }
+
+
+audit_buffer = AuditBuffer(
+    maxsize=int(os.getenv('AUDIT_QUEUE_SIZE', 10000)),
+    batch_size=int(os.getenv('AUDIT_BATCH_SIZE', 100)),
+    flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', 2))
+)
+atexit.register(audit_buffer.flush)
+
+
 class AuditLogger:
-    
+
     def __init__(self):
         self.logger = logging.getLogger('complaints_system.audit')
-    
+
     @staticmethod
     def log(
         action_type: str,
@@ -17,72 +135,80 @@ class AuditLogger:
         old_value: Optional[str] = None,
         new_value: Optional[str] = None,
         ip_address: Optional[str] = None,
-        commit: bool = True
+        commit: bool = True,
+        must_persist: bool = False
     ):
         logger = logging.getLogger('complaints_system.audit')
+        row = {
+            'log_id': str(uuid.uuid4()),
+            'action_type': action_type,
+            'performed_by_id': performed_by_id,
+            'affected_user_id': affected_user_id,
+            'old_value': old_value,
+            'new_value': new_value,
+            'description': description,
+            'ip_address': ip_address,
+            'created_at': datetime.utcnow()
+        }
         try:
-            audit_entry = AuditLog()
-            audit_entry.action_type = action_type
-            audit_entry.performed_by_id = performed_by_id
-            audit_entry.affected_user_id = affected_user_id
-            audit_entry.old_value = old_value
-            audit_entry.new_value = new_value
-            audit_entry.description = description
-            audit_entry.ip_address = ip_address
-            
-            db.session.add(audit_entry)
-            if commit:
-                db.session.commit()
-            else:
-                db.session.flush()
-            
+            if not commit:
+                db.session.add(AuditLog(**row))
+            elif must_persist:
+                with db.engine.begin() as connection:
+                    connection.execute(insert(AuditLog.__table__).values(row))
+            elif not audit_buffer.put(row):
+                return False
+
             logger.info(
                 f"AUDIT: {action_type} by {performed_by_id} - {description}"
             )
-            
+
             return True
         except Exception as e:
             logger.error(
                 f"Failed to create audit log: {str(e)}"
             )
-            db.session.rollback()
             return False
-    
+
     @staticmethod
-    def log_payment_approval(payment_id: str, reviewer_id: str, status: str, ip_address: Optional[str] = None):
+    def log_payment_approval(payment_id: str, reviewer_id: str, status: str, ip_address: Optional[str] = None, user_id: Optional[str] = None):
         AuditLogger.log(
             action_type='payment_approval',
             performed_by_id=reviewer_id,
+            affected_user_id=user_id,
             description=f"Payment {payment_id} {status}",
             old_value='pending',
             new_value=status,
-            ip_address=ip_address
+            ip_address=ip_address,
+            must_persist=True
         )
-    
+
     @staticmethod
-    def log_user_role_change(user_id: str, admin_id: str, old_role: str, new_role: str, ip_address: Optional[str] = None):
+    def log_user_role_change(user_id: str, admin_id: str, old_role: str, new_role: str, ip_address: Optional[str] = None, description: Optional[str] = None):
         AuditLogger.log(
             action_type='role_change',
             performed_by_id=admin_id,
             affected_user_id=user_id,
-            description=f"User role changed from {old_role} to {new_role}",
+            description=description or f"User role changed from {old_role} to {new_role}",
             old_value=old_role,
             new_value=new_role,
-            ip_address=ip_address
+            ip_address=ip_address,
+            must_persist=True
         )
-    
+
     @staticmethod
-    def log_user_status_change(user_id: str, admin_id: str, old_status: bool, new_status: bool, ip_address: Optional[str] = None):
+    def log_user_status_change(user_id: str, admin_id: str, old_status: bool, new_status: bool, ip_address: Optional[str] = None, description: Optional[str] = None):
         AuditLogger.log(
             action_type='status_change',
             performed_by_id=admin_id,
             affected_user_id=user_id,
-            description=f"User status changed from {'active' if old_status else 'inactive'} to {'active' if new_status else 'inactive'}",
-            old_value=str(old_status),
-            new_value=str(new_status),
-            ip_address=ip_address
+            description=description or f"User status changed from {'active' if old_status else 'inactive'} to {'active' if new_status else 'inactive'}",
+            old_value='نشط' if old_status else 'غير نشط',
+            new_value='نشط' if new_status else 'غير نشط',
+            ip_address=ip_address,
+            must_persist=True
         )
-    
+
     @staticmethod
     def log_login(user_id: str, success: bool, ip_address: Optional[str] = None):
         AuditLogger.log(
@@ -91,7 +217,7 @@ class AuditLogger:
             description=f"Login {'successful' if success else 'failed'}",
             ip_address=ip_address
         )
-    
+
     @staticmethod
     def log_settings_change(admin_id: str, setting_key: str, old_value: str, new_value: str, ip_address: Optional[str] = None):
         AuditLogger.log(
@@ -100,5 +226,14 @@ class AuditLogger:
             description=f"Setting {setting_key} changed",
             old_value=old_value,
             new_value=new_value,
-            ip_address=ip_address
+            ip_address=ip_address,
+            must_persist=True
         )
+
+    @staticmethod
+    def flush():
+        audit_buffer.flush()
+
+    @staticmethod
+    def stats():
+        return audit_buffer.stats()
@@ -0,0 +1,170 @@
+"""
+استقبال الملفات المرفوعة كتدفق
+
+- نوع MIME يُحدد من أول SNIFF_BYTES في الذاكرة قبل كتابة أي شيء على القرص
+- الباقي يُكتب على دفعات إلى ملف مؤقت في نفس المجلد مع حساب الحجم و SHA-256 أثناء الكتابة
+- تجاوز الحد الأقصى يوقف القراءة فوراً ويحذف الملف المؤقت
+- النجاح يُثبت بـ os.replace (إعادة تسمية ذرية) فلا يظهر ملف ناقص أبداً
+- ingest_content_addressed يسمي الملف ببصمة محتواه فيُخزن المحتوى المكرر مرة واحدة؛
+  دالة sanitize الاختيارية تُعيد كتابة الملف المؤقت (مثل إزالة EXIF) قبل حساب البصمة
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+import magic
+
+SNIFF_BYTES = 2048
+CHUNK_SIZE = 64 * 1024
+
+MIME_EXTENSIONS = {
+    'image/png': 'png',
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+}
+
+
+class UploadRejected(Exception):
+    """الملف مرفوض (نوع غير مسموح أو حجم زائد)"""
+
+
+class UploadTooLarge(UploadRejected):
+    def __init__(self, max_size):
+        super().__init__(f'upload exceeds {max_size} bytes')
+        self.max_size = max_size
+
+
+class UnsupportedMimeType(UploadRejected):
+    def __init__(self, mime):
+        super().__init__(f'unsupported MIME type: {mime}')
+        self.mime = mime
+
+
+@dataclass
+class IngestResult:
+    path: str
+    size: int
+    sha256: str
+    mime: str
+    name: str = None
+    deduplicated: bool = False
+
+
+def _read_head(stream, size):
+    head = b''
+    while len(head) < size:
+        chunk = stream.read(size - len(head))
+        if not chunk:
+            break
+        head += chunk
+    return head
+
+
+def sniff_mime(head):
+    return magic.from_buffer(head, mime=True)
+
+
+def _touch(path):
+    """تحديث mtime لملف موجود (رفع مكرر يحميه من حذف الإيصالات غير المستخدمة)؛ False إن لم يوجد"""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _spool(stream, directory, max_size, allowed_mimes, chunk_size):
+    """نسخ التدفق إلى ملف مؤقت داخل directory؛ يعيد (المسار المؤقت، الحجم، البصمة، النوع)"""
+    head = _read_head(stream, SNIFF_BYTES)
+    mime = sniff_mime(head)
+    if allowed_mimes is not None and mime not in allowed_mimes:
+        raise UnsupportedMimeType(mime)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise UploadTooLarge(max_size)
+                digest.update(chunk)
+                output.write(chunk)
+                chunk = stream.read(chunk_size)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    return temp_path, size, digest.hexdigest(), mime
+
+
+def _file_digest(path, chunk_size):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            size += len(chunk)
+            digest.update(chunk)
+    return size, digest.hexdigest()
+
+
+def ingest_stream(stream, dest_path, max_size=None, allowed_mimes=None, chunk_size=CHUNK_SIZE):
+    """
+    نسخ تدفق إلى dest_path مع التحقق أثناء القراءة
+
+    Raises:
+        UnsupportedMimeType: قبل إنشاء أي ملف
+        UploadTooLarge: بمجرد تجاوز max_size
+
+    Returns:
+        IngestResult
+    """
+    temp_path, size, sha256, mime = _spool(
+        stream, os.path.dirname(dest_path) or '.', max_size, allowed_mimes, chunk_size
+    )
+    try:
+        os.replace(temp_path, dest_path)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    return IngestResult(path=dest_path, size=size, sha256=sha256, mime=mime)
+
+
+def content_address(sha256, mime):
+    """المسار النسبي للمحتوى: <أول حرفين>/<sha256>.<ext>"""
+    return f'{sha256[:2]}/{sha256}.{MIME_EXTENSIONS.get(mime, "bin")}'
+
+
+def ingest_content_addressed(stream, directory, max_size=None, allowed_mimes=None, chunk_size=CHUNK_SIZE, sanitize=None):
+    """
+    مثل ingest_stream لكن اسم الملف يُشتق من SHA-256 للمحتوى؛
+    إن كان المحتوى موجوداً مسبقاً يُحذف المؤقت ويُعاد المسار الموجود (deduplicated=True)
+
+    sanitize(path) تُستدعى على الملف المؤقت وتعيد True إن غيّرته، فتُحسب البصمة
+    والحجم من المحتوى المخزن فعلاً لا من المرفوع
+    """
+    temp_path, size, sha256, mime = _spool(stream, directory, max_size, allowed_mimes, chunk_size)
+    try:
+        if sanitize is not None and sanitize(temp_path):
+            size, sha256 = _file_digest(temp_path, chunk_size)
+        name = content_address(sha256, mime)
+        dest_path = os.path.join(directory, *name.split('/'))
+        if _touch(dest_path):
+            _remove_quietly(temp_path)
+            deduplicated = True
+        else:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            os.replace(temp_path, dest_path)
+            deduplicated = False
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    return IngestResult(path=dest_path, size=size, sha256=sha256, mime=mime, name=name, deduplicated=deduplicated)
@@ -0,0 +1,125 @@
+"""
+مقاييس Prometheus بصيغة العرض النصية عبر /metrics
+
+- زمن الطلبات (Histogram) حسب الـ blueprint ونقطة النهاية والطريقة والحالة
+- الطلبات الجارية (Gauge) حسب الـ blueprint
+- زمن انتظار الحصول على اتصال من مجمع قاعدة البيانات
+- أحجام الملفات المرفوعة وعدد مستلمي كل إشعار جماعي
+
+مع gunicorn يجب ضبط PROMETHEUS_MULTIPROC_DIR قبل تشغيل العمال حتى تُكتب القيم
+في ملفات على القرص وتُجمع من كل العمليات عند القراءة (انظر gunicorn.conf.py).
+"""
+import os
+import time
+from flask import Response, abort, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+UPLOAD_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 512 * 1024, 1024 * 1024, 2 * 1024 * 1024, 5 * 1024 * 1024)
+FANOUT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+REQUEST_LATENCY = Histogram(
+    'allajnah_http_request_duration_seconds', 'HTTP request latency',
+    ['blueprint', 'endpoint', 'method', 'status'], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'allajnah_http_requests_in_progress', 'HTTP requests currently being served',
+    ['blueprint'], multiprocess_mode='livesum'
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'allajnah_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled DB connection',
+    buckets=POOL_WAIT_BUCKETS
+)
+UPLOAD_BYTES = Histogram(
+    'allajnah_upload_bytes', 'Size of accepted uploads in bytes', ['kind'], buckets=UPLOAD_BUCKETS
+)
+NOTIFICATION_FANOUT = Histogram(
+    'allajnah_notification_fanout_recipients', 'Recipients per role fan-out', ['mode'], buckets=FANOUT_BUCKETS
+)
+NOTIFICATION_FANOUT_ROWS = Counter(
+    'allajnah_notification_fanout_rows', 'Notification rows produced by role fan-out', ['mode']
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool يقيس زمن انتظار كل عملية checkout"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def observe_upload(kind, size):
+    UPLOAD_BYTES.labels(kind=kind).observe(size)
+
+
+def observe_fanout(mode, recipients):
+    NOTIFICATION_FANOUT.labels(mode=mode).observe(recipients)
+    NOTIFICATION_FANOUT_ROWS.labels(mode=mode).inc(recipients)
+
+
+def _multiprocess_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+def render_metrics():
+    """النص الكامل للمقاييس؛ في وضع تعدد العمليات يُجمع من ملفات كل العمال"""
+    if _multiprocess_dir():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def init_metrics(app):
+    token = os.environ.get('METRICS_TOKEN')
+
+    def _labels():
+        return request.blueprint or 'app', request.endpoint or UNMATCHED_ENDPOINT
+
+    @app.before_request
+    def _start_request_metrics():
+        if request.endpoint == 'metrics':
+            return
+        blueprint, _ = _labels()
+        g._metrics = (time.perf_counter(), blueprint)
+        REQUESTS_IN_PROGRESS.labels(blueprint=blueprint).inc()
+
+    @app.after_request
+    def _observe_request_metrics(response):
+        state = g.get('_metrics')
+        if state is not None:
+            blueprint, endpoint = _labels()
+            REQUEST_LATENCY.labels(
+                blueprint=blueprint, endpoint=endpoint, method=request.method, status=str(response.status_code)
+            ).observe(time.perf_counter() - state[0])
+        return response
+
+    @app.teardown_request
+    def _finish_request_metrics(exc):
+        state = g.pop('_metrics', None)
+        if state is not None:
+            REQUESTS_IN_PROGRESS.labels(blueprint=state[1]).dec()
+
+    def metrics():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+        return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
+    limiter = getattr(app, 'limiter', None)
+    if limiter is not None:
+        limiter.exempt(metrics)
+
+    return app
@@ -0,0 +1,171 @@
+"""
+قياس أداء كل طلب: عدد جمل SQL وزمنها وأبطأ جملة وزمن تحويل JSON
+
+- أحداث المحرك (before/after_cursor_execute) تُسجّل في حالة الطلب الحالي فقط
+  (الخيوط الخلفية مثل كاتب التدقيق لا تُحتسب)
+- تُرسل القيم في ترويسة Server-Timing (PERF_SERVER_TIMING=false لتعطيلها)
+- تُجمع لكل نقطة نهاية آخر PERF_WINDOW طلب داخل العملية وتُعرض عبر /api/admin/perf
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from flask import g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_STATEMENT_CHARS = 300
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class RequestPerf:
+    __slots__ = ('started', 'statements', 'db_ms', 'slowest_ms', 'slowest_sql', 'serialize_ms')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_sql = None
+        self.serialize_ms = 0.0
+
+    def record(self, statement, elapsed_ms):
+        self.statements += 1
+        self.db_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = statement
+
+
+class PerfAggregator:
+    """نافذة متحركة من القياسات لكل نقطة نهاية"""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._samples = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, status_code, total_ms, perf):
+        sample = (total_ms, perf.db_ms, perf.statements, perf.serialize_ms, perf.slowest_ms, perf.slowest_sql)
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+                self._totals[endpoint] = {'requests': 0, 'errors': 0}
+            samples.append(sample)
+            self._totals[endpoint]['requests'] += 1
+            if status_code >= 500:
+                self._totals[endpoint]['errors'] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    def snapshot(self):
+        with self._lock:
+            items = [(endpoint, list(samples), dict(self._totals[endpoint])) for endpoint, samples in self._samples.items()]
+
+        endpoints = []
+        for endpoint, samples, totals in items:
+            total = [s[0] for s in samples]
+            statements = [s[2] for s in samples]
+            slowest = max(samples, key=lambda s: s[4])
+            endpoints.append({
+                'endpoint': endpoint,
+                'requests': totals['requests'],
+                'errors': totals['errors'],
+                'window': len(samples),
+                'p50_ms': round(_percentile(total, 50), 2),
+                'p95_ms': round(_percentile(total, 95), 2),
+                'p99_ms': round(_percentile(total, 99), 2),
+                'avg_db_ms': round(sum(s[1] for s in samples) / len(samples), 2),
+                'avg_serialize_ms': round(sum(s[3] for s in samples) / len(samples), 2),
+                'avg_statements': round(sum(statements) / len(statements), 2),
+                'max_statements': max(statements),
+                'slowest_statement_ms': round(slowest[4], 2),
+                'slowest_statement': slowest[5]
+            })
+        endpoints.sort(key=lambda e: e['p95_ms'] * e['window'], reverse=True)
+        return endpoints
+
+
+perf_aggregator = PerfAggregator(window=int(os.getenv('PERF_WINDOW', 500)))
+
+
+def _current_perf():
+    if has_request_context():
+        return g.get('_perf')
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_perf() is not None:
+        conn.info.setdefault('_perf_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    perf = _current_perf()
+    stack = conn.info.get('_perf_started')
+    if perf is None or not stack:
+        return
+    elapsed_ms = (time.perf_counter() - stack.pop()) * 1000
+    perf.record(statement[:SLOW_STATEMENT_CHARS], elapsed_ms)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """مزود JSON يحتسب زمن التحويل ضمن قياس الطلب"""
+
+    def dumps(self, obj, **kwargs):
+        perf = _current_perf()
+        if perf is None:
+            return super().dumps(obj, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            perf.serialize_ms += (time.perf_counter() - started) * 1000
+
+
+def _server_timing(perf, total_ms):
+    return ', '.join([
+        f'db;dur={perf.db_ms:.2f};desc="{perf.statements} queries"',
+        f'db-slowest;dur={perf.slowest_ms:.2f}',
+        f'serialize;dur={perf.serialize_ms:.2f}',
+        f'total;dur={total_ms:.2f}',
+    ])
+
+
+def init_perf(app):
+    app.json = TimedJSONProvider(app)
+    server_timing = os.getenv('PERF_SERVER_TIMING', 'true').lower() == 'true'
+
+    @app.before_request
+    def _start_request_perf():
+        g._perf = RequestPerf()
+
+    @app.after_request
+    def _finish_request_perf(response):
+        perf = g.pop('_perf', None)
+        if perf is None:
+            return response
+        total_ms = (time.perf_counter() - perf.started) * 1000
+        if server_timing:
+            response.headers['Server-Timing'] = _server_timing(perf, total_ms)
+        if request.url_rule is not None:
+            perf_aggregator.add(f'{request.method} {request.url_rule.rule}', response.status_code, total_ms, perf)
+        return response
+
+    return app
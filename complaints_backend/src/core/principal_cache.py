@@ -0,0 +1,136 @@
+"""
+ذاكرة مؤقتة لهوية المستخدم (Principal) داخل كل عملية
+
+تحفظ لكل user_id نسخة منفصلة (detached) من المستخدم مع دوره، وحالة التفعيل،
+ونافذة الاستحقاق (تاريخ انتهاء آخر اشتراك نشط) حتى لا يعيد token_required
+تنفيذ استعلامات المستخدم والدور والاشتراك مع كل طلب.
+
+الإبطال:
+- صريح من update_user_role و toggle_user_status واعتماد الدفع وانتهاء الاشتراكات
+- تلقائي بعد أي commit يعدّل صف مستخدم أو اشتراك عبر الـ ORM
+- مهلة الصلاحية (PRINCIPAL_CACHE_TTL) تحد من التقادم بين عمال gunicorn
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from src.database.db import db
+from src.models.complaint import User, Subscription
+from src.core.cache import TTLCache
+
+principal_cache = TTLCache(
+    maxsize=int(os.getenv('PRINCIPAL_CACHE_SIZE', 4096)),
+    ttl=float(os.getenv('PRINCIPAL_CACHE_TTL', 30))
+)
+
+
+@dataclass(frozen=True)
+class Principal:
+    user_id: str
+    role_name: Optional[str]
+    is_active: bool
+    subscription_end: Optional[datetime]
+    grace_period_enabled: bool
+    user: User
+
+    @property
+    def has_subscription(self):
+        return self.subscription_end is not None
+
+    def attach(self):
+        """ربط نسخة المستخدم بالجلسة الحالية دون أي استعلام"""
+        return db.session.merge(self.user, load=False)
+
+
+def _detached_copy(instance):
+    mapper = inspect(instance).mapper
+    clone = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        set_committed_value(clone, attr.key, getattr(instance, attr.key))
+    return clone
+
+
+def _load_principal(user_id):
+    user = User.query.options(joinedload(User.role)).filter_by(user_id=user_id).first()
+    if not user:
+        return None
+
+    role_name = user.role.role_name if user.role else None
+
+    subscription_end = None
+    grace_period_enabled = False
+    if role_name == 'Trader':
+        latest = Subscription.query.filter_by(
+            user_id=user.user_id,
+            status='active'
+        ).order_by(Subscription.end_date.desc()).first()
+        if latest:
+            subscription_end = latest.end_date
+            grace_period_enabled = bool(latest.grace_period_enabled)
+
+    snapshot = _detached_copy(user)
+    if user.role:
+        role_snapshot = _detached_copy(user.role)
+        make_transient_to_detached(role_snapshot)
+        set_committed_value(snapshot, 'role', role_snapshot)
+    make_transient_to_detached(snapshot)
+
+    return Principal(
+        user_id=user.user_id,
+        role_name=role_name,
+        is_active=bool(user.is_active),
+        subscription_end=subscription_end,
+        grace_period_enabled=grace_period_enabled,
+        user=snapshot
+    )
+
+
+def get_principal(user_id):
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        principal = _load_principal(user_id)
+        if principal is not None:
+            principal_cache.set(user_id, principal)
+    return principal
+
+
+def invalidate_principal(user_id):
+    principal_cache.delete(user_id)
+
+
+def invalidate_principals(user_ids):
+    for user_id in user_ids:
+        principal_cache.delete(user_id)
+
+
+def invalidate_all_principals():
+    principal_cache.clear()
+
+
+def get_principal_cache_stats():
+    return principal_cache.stats()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_principal_changes(session, flush_context):
+    touched = session.info.setdefault('principal_invalidations', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            touched.add(obj.user_id)
+        elif isinstance(obj, Subscription):
+            touched.add(obj.user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_principal_invalidations(session):
+    touched = session.info.pop('principal_invalidations', None)
+    if touched:
+        invalidate_principals(touched)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_principal_invalidations(session):
+    session.info.pop('principal_invalidations', None)
@@ -0,0 +1,199 @@
+"""
+موزع أحداث (publish/subscribe) داخل العملية مع نقل محلي بين عمال gunicorn
+
+- المشتركون (اتصالات SSE) يُسجلون حسب المفتاح (user_id) ويحصلون على إشارة "حدث شيء"
+  بنوع الحدث فقط؛ الإشارات المتتالية لنفس المشترك تُدمج فلا يتراكم طابور
+- publish يوصل الإشارة محلياً ثم يرسلها عبر مقابس Unix datagram إلى كل العمليات الأخرى
+  التي لها مقبس في PUBSUB_DIR (العمال والمهام المجدولة على نفس الخادم)
+- الإرسال غير حاجب: مستقبل ممتلئ أو ميت لا يبطئ الناشر (يُحذف مقبس العملية الميتة)
+- بدون PUBSUB_DIR يعمل الموزع داخل العملية فقط (خادم التطوير)
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import defaultdict
+
+logger = logging.getLogger('complaints_system.pubsub')
+
+# عدد المفاتيح في كل رسالة حتى تبقى الرسالة أصغر من حد مقابس datagram
+KEYS_PER_MESSAGE = 500
+MAX_DATAGRAM = 64 * 1024
+
+
+class Subscription:
+    """مشترك واحد؛ wait تعيد أنواع الأحداث التي وصلت منذ آخر استدعاء"""
+
+    def __init__(self, key):
+        self.key = key
+        self._condition = threading.Condition()
+        self._kinds = set()
+
+    def push(self, kind):
+        with self._condition:
+            self._kinds.add(kind)
+            self._condition.notify()
+
+    def wait(self, timeout=None):
+        with self._condition:
+            if not self._kinds:
+                self._condition.wait(timeout)
+            kinds, self._kinds = self._kinds, set()
+            return kinds
+
+
+class UnixDatagramTransport:
+    """مقبس Unix datagram لكل عملية داخل مجلد مشترك"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = None
+        self._receiver = None
+        self._sender = None
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+
+    def listen(self, handler):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock')
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.bind(path)
+        self.path, self._receiver = path, receiver
+        threading.Thread(target=self._receive, args=(receiver, handler), name='pubsub-receiver', daemon=True).start()
+
+    def _receive(self, receiver, handler):
+        while True:
+            try:
+                data = receiver.recv(MAX_DATAGRAM)
+            except OSError:
+                return
+            self.received += 1
+            try:
+                handler(json.loads(data))
+            except Exception as e:
+                logger.warning(f'رسالة pubsub غير صالحة: {str(e)}')
+
+    def send(self, message):
+        data = json.dumps(message, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            if self._sender is None:
+                self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sender.setblocking(False)
+            sender = self._sender
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.sock') or path == self.path:
+                continue
+            try:
+                sender.sendto(data, path)
+                self.sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # العملية المالكة انتهت دون حذف مقبسها
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            except OSError:
+                self.dropped += 1
+
+    def close(self):
+        for sock in (self._receiver, self._sender):
+            if sock is not None:
+                sock.close()
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        self.path = self._receiver = self._sender = None
+
+
+class PubSubHub:
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._transport = None
+        self._pid = None
+        self._listening = False
+        self.published = 0
+
+    def _get_transport(self, listen=False):
+        if not self.directory:
+            return None
+        with self._lock:
+            # بعد fork لا يُعاد استخدام مقابس العملية الأم
+            if self._pid != os.getpid():
+                self._transport = UnixDatagramTransport(self.directory)
+                self._pid = os.getpid()
+                self._listening = False
+            if listen and not self._listening:
+                self._transport.listen(self._on_message)
+                self._listening = True
+            return self._transport
+
+    def _on_message(self, message):
+        self._deliver(message.get('keys', ()), message.get('kind'))
+
+    def _deliver(self, keys, kind):
+        with self._lock:
+            subscriptions = [sub for key in keys for sub in self._subscribers.get(key, ())]
+        for subscription in subscriptions:
+            subscription.push(kind)
+
+    def subscribe(self, key):
+        self._get_transport(listen=True)
+        subscription = Subscription(key)
+        with self._lock:
+            self._subscribers[key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.key]
+
+    def publish(self, keys, kind):
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return
+        self.published += 1
+        self._deliver(keys, kind)
+        transport = self._get_transport()
+        if transport is None:
+            return
+        for start in range(0, len(keys), KEYS_PER_MESSAGE):
+            transport.send({'keys': keys[start:start + KEYS_PER_MESSAGE], 'kind': kind})
+
+    def close(self):
+        with self._lock:
+            if self._transport is not None and self._pid == os.getpid():
+                self._transport.close()
+            self._transport = None
+            self._pid = None
+            self._listening = False
+
+    def stats(self):
+        with self._lock:
+            transport = self._transport if self._pid == os.getpid() else None
+            return {
+                'subscribers': sum(len(subs) for subs in self._subscribers.values()),
+                'keys': len(self._subscribers),
+                'published': self.published,
+                'transport': self.directory if transport else None,
+                'sent': transport.sent if transport else 0,
+                'received': transport.received if transport else 0,
+                'dropped': transport.dropped if transport else 0
+            }
@@ -0,0 +1,162 @@
+"""
+ذاكرة مؤقتة للبيانات المرجعية (الفئات، الحالات، الأدوار، طرق الدفع، سعر الاشتراك)
+
+تُحفظ لكل مجموعة نسخة JSON جاهزة مع ETag قوي مشتق من محتواها، فيتطابق الإصدار
+بين عمال gunicorn دون أي تنسيق. الطلب الذي يرسل If-None-Match مطابقاً يحصل على
+304 من الذاكرة دون استعلام ولا تحويل إلى JSON.
+
+الإبطال:
+- كل المجموعات مرتبطة برقم إصدار settings_registry؛ أي تعديل لصفوف هذه الجداول عبر
+  الـ ORM (تعديلات لوحة الإدارة) يرفع settings_version في المعاملة نفسها
+- العامل الذي نفّذ التعديل يبطل نسخته فور الـ commit، والبقية خلال
+  SETTINGS_REFRESH_SECONDS عند تحققهم التالي من الإصدار
+- REFERENCE_CACHE_TTL يحد فقط من بقاء المدخلات غير المستخدمة في الذاكرة
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from flask import Response, current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.core.cache import TTLCache
+from src.core.settings_registry import VERSION_KEY, bump_version, settings_registry
+from src.models.complaint import ComplaintCategory, ComplaintStatus, PaymentMethod, Role
+
+REFERENCE_MAX_AGE = int(os.getenv('REFERENCE_MAX_AGE', 60))
+
+reference_cache = TTLCache(maxsize=32, ttl=float(os.getenv('REFERENCE_CACHE_TTL', 300)))
+
+
+@dataclass(frozen=True)
+class ReferenceEntry:
+    body: bytes
+    etag: str
+    source_version: object = None
+
+
+def _categories():
+    return {'categories': [c.to_dict() for c in ComplaintCategory.query.order_by(ComplaintCategory.category_id)]}
+
+
+def _statuses():
+    return {'statuses': [s.to_dict() for s in ComplaintStatus.query.order_by(ComplaintStatus.status_id)]}
+
+
+def _roles():
+    return {'roles': [r.to_dict() for r in Role.query.order_by(Role.role_id)]}
+
+
+def _payment_methods():
+    methods = PaymentMethod.query.filter_by(is_active=True).order_by(
+        PaymentMethod.display_order, PaymentMethod.created_at, PaymentMethod.method_id
+    )
+    return {'payment_methods': [m.to_dict() for m in methods]}
+
+
+def _subscription_price():
+    settings = settings_registry.get()
+    return {'price': settings.annual_subscription_price, 'currency': settings.currency}
+
+
+def _settings_version():
+    return settings_registry.get().version
+
+
+# الاسم -> (دالة التحميل، دالة إصدار المصدر أو None)
+LOADERS = {
+    'categories': (_categories, _settings_version),
+    'statuses': (_statuses, _settings_version),
+    'roles': (_roles, _settings_version),
+    'payment_methods': (_payment_methods, _settings_version),
+    'subscription_price': (_subscription_price, _settings_version),
+}
+
+WATCHED_MODELS = {
+    ComplaintCategory: 'categories',
+    ComplaintStatus: 'statuses',
+    Role: 'roles',
+    PaymentMethod: 'payment_methods',
+}
+
+
+def get_reference_entry(name):
+    loader, source_version = LOADERS[name]
+    version = source_version() if source_version else None
+    entry = reference_cache.get(name)
+    if entry is not None and entry.source_version == version:
+        return entry
+
+    body = current_app.json.dumps(loader()).encode('utf-8')
+    entry = ReferenceEntry(body=body, etag=hashlib.sha256(body).hexdigest()[:32], source_version=version)
+    reference_cache.set(name, entry)
+    return entry
+
+
+def reference_response(name, private=False):
+    """
+    استجابة JSON للمجموعة name مع ETag و Cache-Control؛ 304 إن طابق If-None-Match
+
+    Args:
+        private: للمسارات التي تتطلب تسجيل الدخول (لا تخزنها الوسائط المشتركة)
+    """
+    entry = get_reference_entry(name)
+    response = Response(entry.body, mimetype='application/json')
+    response.set_etag(entry.etag)
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    response.cache_control.max_age = REFERENCE_MAX_AGE
+    response.cache_control.must_revalidate = True
+    return response.make_conditional(request)
+
+
+def invalidate_reference_data(*names):
+    for name in names or LOADERS:
+        reference_cache.delete(name)
+
+
+def reference_stats():
+    return reference_cache.stats()
+
+
+def _mark_changed(session, name):
+    changed = session.info.setdefault('reference_changed', set())
+    if not changed:
+        # مرة واحدة لكل معاملة: العمال الآخرون يرون الإصدار الجديد في تحققهم التالي
+        bump_version(VERSION_KEY, session)
+    changed.add(name)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_reference_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        name = WATCHED_MODELS.get(type(obj))
+        if name:
+            _mark_changed(session, name)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+def _collect_reference_bulk_update(update_context):
+    name = WATCHED_MODELS.get(update_context.mapper.class_)
+    if name:
+        _mark_changed(update_context.session, name)
+
+
+@event.listens_for(Session, 'after_bulk_delete')
+def _collect_reference_bulk_delete(delete_context):
+    name = WATCHED_MODELS.get(delete_context.mapper.class_)
+    if name:
+        _mark_changed(delete_context.session, name)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_reference_invalidation(session):
+    changed = session.info.pop('reference_changed', None)
+    if changed:
+        invalidate_reference_data(*changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_reference_invalidation(session):
+    session.info.pop('reference_changed', None)
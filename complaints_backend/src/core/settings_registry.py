@@ -0,0 +1,245 @@
+"""
+سجل الإعدادات داخل العملية (Settings Registry)
+
+يُحمّل جدول settings مرة واحدة لكل عملية ويحوّل القيم إلى حقول مطبوعة
+(typed) مع رقم إصدار. المسارات الساخنة (token_required، المهام المجدولة،
+خدمة الاشتراك) تقرأ من الذاكرة دون أي استعلام.
+
+- التعديل يتم عبر settings_registry.update: upsert جماعي في جملة واحدة ورفع الإصدار
+  ذرياً في SQL (bump_version) فلا يتسابق مسؤولان على الرقم نفسه
+- كل عامل gunicorn يتحقق من صف settings_version مرة كل
+  SETTINGS_REFRESH_SECONDS ويعيد التحميل عند تغيّره
+- أي commit داخل العملية يلمس جدول settings يبطل النسخة المحلية فوراً
+"""
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict
+from sqlalchemy import Integer, cast, event, select
+from sqlalchemy.orm import Session
+from src.database.db import db
+from src.models.complaint import Settings
+
+VERSION_KEY = 'settings_version'
+
+DEFAULTS = {
+    'annual_subscription_price': '50000',
+    'currency': 'YER',
+    'grace_period_days': '7',
+    'enable_grace_period': 'true',
+}
+
+
+def _parse_float(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float(default)
+
+
+def _parse_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return int(default)
+
+
+def _parse_bool(value, default):
+    if value is None:
+        return str(default).lower() == 'true'
+    return str(value).lower() == 'true'
+
+
+@dataclass(frozen=True)
+class SettingsSnapshot:
+    annual_subscription_price: float
+    currency: str
+    grace_period_days: int
+    enable_grace_period: bool
+    version: int
+    values: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_rows(cls, rows):
+        values = {key: value for key, value in rows}
+        return cls(
+            annual_subscription_price=_parse_float(values.get('annual_subscription_price'), DEFAULTS['annual_subscription_price']),
+            currency=values.get('currency') or DEFAULTS['currency'],
+            grace_period_days=_parse_int(values.get('grace_period_days'), DEFAULTS['grace_period_days']),
+            enable_grace_period=_parse_bool(values.get('enable_grace_period'), DEFAULTS['enable_grace_period']),
+            version=_parse_int(values.get(VERSION_KEY), 0),
+            values=values
+        )
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+
+class SettingsRegistry:
+
+    def __init__(self, refresh_seconds=60):
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _read_version(self):
+        value = db.session.query(Settings.value).filter(Settings.key == VERSION_KEY).scalar()
+        return _parse_int(value, 0)
+
+    def _load(self):
+        rows = db.session.query(Settings.key, Settings.value).all()
+        self._snapshot = SettingsSnapshot.from_rows(rows)
+        self._next_check = time.monotonic() + self.refresh_seconds
+        self.loads += 1
+        return self._snapshot
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None:
+                return self._load()
+            if time.monotonic() >= self._next_check:
+                if self._read_version() != self._snapshot.version:
+                    return self._load()
+                self._next_check = time.monotonic() + self.refresh_seconds
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._next_check = 0.0
+
+    def update(self, values, commit=True):
+        """upsert جماعي لعدة مفاتيح في جملة واحدة مع رفع رقم الإصدار"""
+        now = datetime.utcnow()
+        rows = [
+            {'setting_id': str(uuid.uuid4()), 'key': key, 'value': str(value), 'updated_at': now}
+            for key, value in values.items()
+            if key != VERSION_KEY
+        ]
+
+        insert = _upsert_insert(db.session.get_bind())
+        if rows and insert is not None:
+            stmt = insert(Settings.__table__).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Settings.__table__.c.key],
+                set_={'value': stmt.excluded.value, 'updated_at': stmt.excluded.updated_at}
+            )
+            db.session.execute(stmt)
+        else:
+            for row in rows:
+                setting = Settings.query.filter_by(key=row['key']).first()
+                if setting:
+                    setting.value = row['value']
+                    setting.updated_at = now
+                else:
+                    db.session.add(Settings(**row))
+
+        new_version = bump_version(VERSION_KEY)
+        if commit:
+            db.session.commit()
+        return new_version
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'loaded': snapshot is not None,
+            'version': snapshot.version if snapshot else None,
+            'loads': self.loads,
+            'refresh_seconds': self.refresh_seconds
+        }
+
+
+settings_registry = SettingsRegistry(
+    refresh_seconds=float(os.getenv('SETTINGS_REFRESH_SECONDS', 60))
+)
+
+
+def get_settings():
+    return settings_registry.get()
+
+
+def _upsert_insert(connection):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+def bump_version(key, session=None):
+    """
+    رفع عدّاد إصدار مخزن في جدول settings بجملة UPDATE واحدة (value = value + 1)
+
+    الصف يبقى مقفلاً حتى نهاية المعاملة، فلا يحصل تحديثان متزامنان على الرقم نفسه.
+    جمل Core فقط، فيصح استدعاؤها من after_flush
+    """
+    session = session or db.session
+    table = Settings.__table__
+    bind = session.get_bind()
+    now = datetime.utcnow()
+
+    insert = _upsert_insert(bind)
+    if insert is not None:
+        session.execute(insert(table).values(
+            setting_id=str(uuid.uuid4()), key=key, value='0', updated_at=now
+        ).on_conflict_do_nothing(index_elements=[table.c.key]))
+    elif session.execute(select(table.c.key).where(table.c.key == key)).first() is None:
+        session.execute(table.insert().values(setting_id=str(uuid.uuid4()), key=key, value='0', updated_at=now))
+
+    stmt = table.update().where(table.c.key == key).values(
+        value=cast(cast(table.c.value, Integer) + 1, table.c.value.type), updated_at=now
+    )
+    if bind.dialect.update_returning:
+        version = session.execute(stmt.returning(table.c.value)).scalar_one()
+    else:
+        session.execute(stmt)
+        version = session.execute(select(table.c.value).where(table.c.key == key)).scalar_one()
+    _mark_settings_changed(session)
+    return int(version)
+
+
+def _mark_settings_changed(session):
+    session.info['settings_changed'] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_settings_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Settings):
+            _mark_settings_changed(session)
+            return
+
+
+@event.listens_for(Session, 'after_bulk_update')
+def _collect_settings_bulk_update(update_context):
+    if update_context.mapper.class_ is Settings:
+        _mark_settings_changed(update_context.session)
+
+
+@event.listens_for(Session, 'after_bulk_delete')
+def _collect_settings_bulk_delete(delete_context):
+    if delete_context.mapper.class_ is Settings:
+        _mark_settings_changed(delete_context.session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_settings_invalidation(session):
+    if session.info.pop('settings_changed', False):
+        settings_registry.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_settings_invalidation(session):
+    session.info.pop('settings_changed', None)
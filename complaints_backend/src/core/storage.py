@@ -1,8 +1,16 @@
 import os
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional, BinaryIO
+from typing import Iterable, Optional, BinaryIO
 from werkzeug.utils import secure_filename
 import uuid
+from src.core.cache import TTLCache
+from src.core.ingest import ingest_stream
+
+MB = 1024 * 1024
+
+# S3 DeleteObjects accepts at most 1000 keys per request
+S3_DELETE_BATCH = 1000
 
 class StorageBackend(ABC):
     
@@ -22,6 +30,9 @@ class StorageBackend(ABC):
     def exists(self, filepath: str) -> bool:
         pass
 
+    def delete_many(self, filepaths: Iterable[str]) -> int:
+        return sum(1 for filepath in filepaths if self.delete(filepath))
+
 class LocalStorage(StorageBackend):
     
     def __init__(self, base_path: str = 'src/uploads'):
@@ -38,8 +49,8 @@ class LocalStorage(StorageBackend):
         
         filepath = os.path.join(folder_path, unique_name)
         
-        with open(filepath, 'wb') as f:
-            f.write(file.read())
+        # Streamed in chunks to a temp file and renamed into place
+        ingest_stream(file, filepath)
         
         relative_path = os.path.join(folder, unique_name) if folder else unique_name
         return relative_path
@@ -61,6 +72,72 @@ class LocalStorage(StorageBackend):
         full_path = os.path.join(self.base_path, filepath)
         return os.path.exists(full_path)
 
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_s3_client(
+    endpoint_url: Optional[str] = None,
+    access_key: Optional[str] = None,
+    secret_key: Optional[str] = None,
+    region: Optional[str] = 'us-east-1'
+):
+    # boto3 clients are thread-safe but expensive to build (endpoint resolution,
+    # credential chain, a fresh urllib3 pool), so every backend in this process
+    # shares one client per configuration. Keyed by pid so a forked worker never
+    # reuses its parent's sockets.
+    key = (os.getpid(), endpoint_url, access_key, secret_key, region)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    import boto3
+    from botocore.config import Config
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            config = Config(
+                max_pool_connections=_env_int('S3_MAX_POOL_CONNECTIONS', 50),
+                connect_timeout=_env_int('S3_CONNECT_TIMEOUT', 5),
+                read_timeout=_env_int('S3_READ_TIMEOUT', 60),
+                retries={'max_attempts': _env_int('S3_MAX_ATTEMPTS', 5), 'mode': 'standard'},
+                tcp_keepalive=True,
+                signature_version='s3v4',
+                # MinIO and most S3-compatible servers only support path-style URLs
+                s3={'addressing_style': 'path' if endpoint_url else 'auto'}
+            )
+            credentials = {}
+            if access_key and secret_key:
+                credentials['aws_access_key_id'] = access_key
+                credentials['aws_secret_access_key'] = secret_key
+            client = boto3.session.Session().client(
+                's3',
+                endpoint_url=endpoint_url or None,
+                region_name=region or None,
+                config=config,
+                **credentials
+            )
+            _clients[key] = client
+    return client
+
+
+def get_transfer_config():
+    from boto3.s3.transfer import TransferConfig
+
+    # Objects above the threshold are uploaded as concurrent multipart parts
+    return TransferConfig(
+        multipart_threshold=_env_int('S3_MULTIPART_THRESHOLD_MB', 8) * MB,
+        multipart_chunksize=_env_int('S3_MULTIPART_CHUNKSIZE_MB', 8) * MB,
+        max_concurrency=_env_int('S3_MAX_CONCURRENCY', 10),
+        use_threads=True
+    )
+
+
 class S3Storage(StorageBackend):
     
     def __init__(
@@ -69,24 +146,21 @@ class S3Storage(StorageBackend):
         endpoint_url: Optional[str] = None,
         access_key: Optional[str] = None,
         secret_key: Optional[str] = None,
-        region: str = 'us-east-1'
+        region: str = 'us-east-1',
+        presign_expires: Optional[int] = None,
+        presign_refresh_margin: Optional[int] = None
     ):
-        import boto3
-        
         self.bucket_name = bucket_name
-        
-        session_config = {}
-        if access_key and secret_key:
-            session_config['aws_access_key_id'] = access_key
-            session_config['aws_secret_access_key'] = secret_key
-        if region:
-            session_config['region_name'] = region
-        
-        client_config = {}
-        if endpoint_url:
-            client_config['endpoint_url'] = endpoint_url
-        
-        self.s3_client = boto3.client('s3', **session_config, **client_config)
+        self.s3_client = get_s3_client(endpoint_url, access_key, secret_key, region)
+        self.transfer_config = get_transfer_config()
+
+        self.presign_expires = presign_expires or _env_int('S3_PRESIGN_EXPIRES', 3600)
+        margin = presign_refresh_margin if presign_refresh_margin is not None else _env_int('S3_PRESIGN_REFRESH_MARGIN', 300)
+        # A cached URL is handed out only while it still has at least `margin` seconds to live
+        self._presigned = TTLCache(
+            maxsize=_env_int('S3_PRESIGN_CACHE_SIZE', 4096),
+            ttl=max(self.presign_expires - margin, 0)
+        )
     
     def save(self, file: BinaryIO, filename: str, folder: str = '') -> str:
         secure_name = secure_filename(filename)
@@ -95,23 +169,47 @@ class S3Storage(StorageBackend):
         
         s3_key = f"{folder}/{unique_name}" if folder else unique_name
         
-        self.s3_client.upload_fileobj(file, self.bucket_name, s3_key)
+        self.s3_client.upload_fileobj(file, self.bucket_name, s3_key, Config=self.transfer_config)
         
         return s3_key
     
     def delete(self, filepath: str) -> bool:
+        self._presigned.delete(filepath)
         try:
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=filepath)
             return True
         except Exception:
             return False
+
+    def delete_many(self, filepaths: Iterable[str]) -> int:
+        keys = list(dict.fromkeys(filepaths))
+        deleted = 0
+        for start in range(0, len(keys), S3_DELETE_BATCH):
+            batch = keys[start:start + S3_DELETE_BATCH]
+            for key in batch:
+                self._presigned.delete(key)
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            except Exception:
+                continue
+            # Quiet mode only reports the keys that failed
+            deleted += len(batch) - len(response.get('Errors', []))
+        return deleted
     
     def get_url(self, filepath: str) -> str:
-        return self.s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': self.bucket_name, 'Key': filepath},
-            ExpiresIn=3600
-        )
+        url = self._presigned.get(filepath)
+        if url is None:
+            url = self.s3_client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket_name, 'Key': filepath},
+                ExpiresIn=self.presign_expires
+            )
+            if self._presigned.ttl > 0:
+                self._presigned.set(filepath, url)
+        return url
     
     def exists(self, filepath: str) -> bool:
         try:
@@ -120,16 +218,39 @@ class S3Storage(StorageBackend):
         except Exception:
             return False
 
-def get_storage_backend() -> StorageBackend:
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _create_storage_backend() -> StorageBackend:
     storage_type = os.getenv('STORAGE_BACKEND', 'local').lower()
     
     if storage_type == 's3' or storage_type == 'minio':
+        endpoint = os.getenv('S3_ENDPOINT') or os.getenv('MINIO_ENDPOINT')
+        if endpoint and '://' not in endpoint:
+            endpoint = f"http://{endpoint}"
         return S3Storage(
-            bucket_name=os.getenv('S3_BUCKET_NAME', 'complaints-uploads'),
-            endpoint_url=os.getenv('S3_ENDPOINT'),
-            access_key=os.getenv('S3_ACCESS_KEY'),
-            secret_key=os.getenv('S3_SECRET_KEY'),
+            bucket_name=os.getenv('S3_BUCKET_NAME') or os.getenv('MINIO_BUCKET', 'complaints-uploads'),
+            endpoint_url=endpoint,
+            access_key=os.getenv('S3_ACCESS_KEY') or os.getenv('MINIO_ACCESS_KEY'),
+            secret_key=os.getenv('S3_SECRET_KEY') or os.getenv('MINIO_SECRET_KEY'),
             region=os.getenv('S3_REGION', 'us-east-1')
         )
     else:
         return LocalStorage(base_path=os.getenv('LOCAL_STORAGE_PATH', 'complaints_backend/src/uploads'))
+
+
+def get_storage_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_storage_backend()
+    return _backend
+
+
+def reset_storage_backend():
+    """Drop the cached backend (tests, or after changing STORAGE_BACKEND)"""
+    global _backend
+    with _backend_lock:
+        _backend = None
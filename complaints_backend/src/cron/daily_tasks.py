@@ -3,6 +3,7 @@
 وظيفة مجدولة (Scheduler/Cron) يومية:
 - إرسال تذكيرات انتهاء (D-14, D-7, D-3) داخل التطبيق
 - تغيير الاشتراكات المنتهية إلى expired
+- أرشفة/حذف الإشعارات القديمة حسب سياسات الاحتفاظ
 
 تشغيل يدوي:
     python complaints_backend/src/cron/daily_tasks.py
@@ -56,6 +57,21 @@ def main():
         else:
             print(f"✗ خطأ في إرسال التذكيرات: {reminder_result.get('error', 'خطأ غير معروف')}")
         
+        # نتائج سياسات الاحتفاظ بالإشعارات
+        retention_result = results.get('notification_retention', {})
+        if retention_result.get('success'):
+            for policy, rows in retention_result.get('by_policy', {}).items():
+                print(f"✓ {policy}: {rows} إشعار")
+        else:
+            print(f"✗ خطأ في الاحتفاظ بالإشعارات: {retention_result.get('error', 'خطأ غير معروف')}")
+        
+        # نتائج حذف الإيصالات غير المستخدمة
+        receipt_result = results.get('receipt_cleanup', {})
+        if receipt_result.get('success'):
+            print(f"✓ تم حذف {receipt_result.get('removed', 0)} إيصال غير مستخدم")
+        else:
+            print(f"✗ خطأ في حذف الإيصالات: {receipt_result.get('error', 'خطأ غير معروف')}")
+        
         print("\n=== اكتمل التنفيذ ===")
 
 if __name__ == '__main__':
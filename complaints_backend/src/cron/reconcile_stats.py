@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+مطابقة عدادات لوحة المعلومات مع جدول الشكاوى وعدادات الإشعارات غير المقروءة:
+- إعادة حساب العدادات من الصفر
+- طباعة أي فروقات (drift) ثم تصحيحها
+
+تشغيل يدوي:
+    python complaints_backend/src/cron/reconcile_stats.py
+    python complaints_backend/src/cron/reconcile_stats.py --dry-run
+
+إعداد Cron (Linux/Mac):
+    30 3 * * * cd /path/to/project && python complaints_backend/src/cron/reconcile_stats.py
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.database.db import db
+from src.services.dashboard_stats import reconcile_dashboard_stats
+from src.services.notification_counters import reconcile_unread_counters
+from flask import Flask
+
+def setup_app():
+    """إعداد Flask app للتشغيل خارج السياق الرئيسي"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or \
+        f"sqlite:///{os.path.join(os.path.dirname(__file__), '..', 'database', 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+def main():
+    """مطابقة العدادات وطباعة الفروقات"""
+    dry_run = '--dry-run' in sys.argv[1:]
+    app = setup_app()
+
+    with app.app_context():
+        print("بدء مطابقة إحصائيات لوحة المعلومات...")
+        result = reconcile_dashboard_stats(apply=not dry_run)
+
+        if not result.get('success'):
+            print(f"✗ خطأ في المطابقة: {result.get('error', 'خطأ غير معروف')}")
+            sys.exit(1)
+
+        drift = result.get('drift', [])
+        for item in drift:
+            print(f"  {item['dimension']}/{item['bucket']}: المخزن {item['stored']} ← الفعلي {item['expected']}")
+
+        print("بدء مطابقة عدادات الإشعارات غير المقروءة...")
+        unread = reconcile_unread_counters(apply=not dry_run)
+        if not unread.get('success'):
+            print(f"✗ خطأ في المطابقة: {unread.get('error', 'خطأ غير معروف')}")
+            sys.exit(1)
+        for item in unread.get('drift', []):
+            print(f"  unread/{item['user_id']}: المخزن {item['stored']} ← الفعلي {item['expected']}")
+        drift = drift + unread.get('drift', [])
+
+        if not drift:
+            print("✓ العدادات مطابقة، لا توجد فروقات")
+        elif dry_run:
+            print(f"! تم اكتشاف {len(drift)} فرق (لم يتم التصحيح --dry-run)")
+            sys.exit(2)
+        else:
+            print(f"✓ تم تصحيح {len(drift)} فرق")
+
+if __name__ == '__main__':
+    main()
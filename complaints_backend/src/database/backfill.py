@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+تعبئة تدريجية (online backfill) لتغييرات المخطط على الجداول الكبيرة
+
+ترحيل يضيف عموداً مشتقاً أو قيداً يُقسم إلى ثلاث مراحل لا تقفل الجدول طويلاً:
+1. add_nullable_column: إضافة العمود قابلاً لـ NULL وبلا قيمة افتراضية (تعديل في التعريف فقط)
+2. run_backfill: تعبئته على دفعات مرتبة بالمفتاح الأساسي، كل دفعة في معاملة قصيرة تحفظ
+   موضعها في backfill_checkpoints؛ التوقف أو الفشل يستأنف من آخر دفعة مكتملة
+3. set_not_null / add_foreign_key / create_index: القيود بعد اكتمال التعبئة (على PostgreSQL
+   بصيغ NOT VALID ثم VALIDATE و CONCURRENTLY فلا تُمنع الكتابة أثناء الفحص)
+
+الترحيل الذي يستخدمها يعيّن TRANSACTIONAL = False لأن التعبئة تمتد عبر معاملات كثيرة.
+بين الدفعات فاصل BACKFILL_PAUSE_MS إضافة إلى نسبة من زمن الدفعة (BACKFILL_LOAD_FACTOR)
+حتى يبقى للطلبات الحية نصيب من قاعدة البيانات.
+
+متابعة التقدم من طرفية أخرى:
+    python complaints_backend/src/database/backfill.py
+"""
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, select, text, update
+from sqlalchemy.schema import CreateColumn
+
+logger = logging.getLogger('complaints_system.backfill')
+
+BATCH_SIZE = int(os.environ.get('BACKFILL_BATCH_SIZE', 1000))
+PAUSE_SECONDS = float(os.environ.get('BACKFILL_PAUSE_MS', 50)) / 1000
+LOAD_FACTOR = float(os.environ.get('BACKFILL_LOAD_FACTOR', 0.5))
+
+RUNNING = 'running'
+DONE = 'done'
+
+backfill_checkpoints = Table(
+    'backfill_checkpoints', MetaData(),
+    Column('name', String(255), primary_key=True),
+    Column('table_name', String(255), nullable=False),
+    Column('last_key', String(255)),
+    Column('rows_done', Integer, nullable=False, default=0),
+    Column('batches', Integer, nullable=False, default=0),
+    Column('rows_total', Integer),
+    Column('status', String(20), nullable=False, default=RUNNING),
+    Column('started_at', DateTime, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+    Column('finished_at', DateTime)
+)
+
+
+@dataclass
+class Backfill:
+    """
+    تعريف تعبئة واحدة
+
+    Args:
+        name: معرف ثابت (مفتاح نقطة الاستئناف)، مثل '004_complaints_comments_count'
+        table: جدول SQLAlchemy (Model.__table__)
+        values: {column: expression} لـ UPDATE ... SET على صفوف الدفعة
+        apply: بديل values لمنطق مخصص: apply(connection, keys) ← عدد الصفوف المعدلة
+        where: شرط إضافي لاختيار الصفوف (مثل column IS NULL لتخطي ما عُبئ)
+    """
+    name: str
+    table: Table
+    values: Optional[dict] = None
+    apply: Optional[Callable] = None
+    where: list = field(default_factory=list)
+    batch_size: Optional[int] = None
+    pause: Optional[float] = None
+    load_factor: Optional[float] = None
+
+    @property
+    def key(self):
+        primary_key = list(self.table.primary_key.columns)
+        if len(primary_key) != 1:
+            raise ValueError(f'{self.table.name}: التعبئة تتطلب مفتاحاً أساسياً من عمود واحد')
+        return primary_key[0]
+
+    def run_batch(self, connection, keys):
+        if self.apply is not None:
+            return self.apply(connection, keys)
+        result = connection.execute(update(self.table).where(self.key.in_(keys)).values(self.values))
+        return result.rowcount
+
+
+def _checkpoint(connection, name):
+    return connection.execute(select(backfill_checkpoints).where(backfill_checkpoints.c.name == name)).first()
+
+
+def _estimate_rows(connection, backfill):
+    if connection.dialect.name == 'postgresql' and not backfill.where:
+        # تقدير المخطط يكفي للتقدم ويتجنب COUNT(*) على جدول كبير
+        estimate = connection.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE relname = :name'), {'name': backfill.table.name}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    return connection.execute(select(func.count()).select_from(backfill.table).where(*backfill.where)).scalar()
+
+
+def _start(engine, backfill):
+    backfill_checkpoints.create(engine, checkfirst=True)
+    with engine.begin() as connection:
+        checkpoint = _checkpoint(connection, backfill.name)
+        if checkpoint is None:
+            now = datetime.utcnow()
+            connection.execute(backfill_checkpoints.insert().values(
+                name=backfill.name, table_name=backfill.table.name, rows_done=0, batches=0,
+                rows_total=_estimate_rows(connection, backfill), status=RUNNING, started_at=now, updated_at=now
+            ))
+            checkpoint = _checkpoint(connection, backfill.name)
+    return checkpoint
+
+
+def run_backfill(engine, backfill, progress=None):
+    """
+    تعبئة دفعات حتى نهاية الجدول مع الاستئناف من آخر نقطة محفوظة
+
+    Args:
+        progress: دالة اختيارية تُستدعى بعد كل دفعة بقاموس التقدم
+    Returns:
+        dict: {'name', 'status', 'rows_done', 'batches', 'rows_total', 'resumed'}
+    """
+    batch_size = backfill.batch_size or BATCH_SIZE
+    pause = PAUSE_SECONDS if backfill.pause is None else backfill.pause
+    load_factor = LOAD_FACTOR if backfill.load_factor is None else backfill.load_factor
+    key = backfill.key
+    checkpoints = backfill_checkpoints.c
+
+    checkpoint = _start(engine, backfill)
+    state = {
+        'name': backfill.name,
+        'status': checkpoint.status,
+        'rows_done': checkpoint.rows_done,
+        'batches': checkpoint.batches,
+        'rows_total': checkpoint.rows_total,
+        'resumed': checkpoint.last_key is not None and checkpoint.status == RUNNING
+    }
+    if checkpoint.status == DONE:
+        return state
+
+    # last_key مخزن نصاً؛ يُعاد إلى نوع المفتاح (أعداد صحيحة أو UUID نصي)
+    last_key = None if checkpoint.last_key is None else key.type.python_type(checkpoint.last_key)
+    if state['resumed']:
+        logger.info(f'{backfill.name}: استئناف بعد المفتاح {last_key} ({state["rows_done"]} صف)')
+    started = time.perf_counter()
+
+    while True:
+        batch_started = time.perf_counter()
+        with engine.begin() as connection:
+            query = select(key).where(*backfill.where).order_by(key).limit(batch_size)
+            if last_key is not None:
+                query = query.where(key > last_key)
+            keys = connection.execute(query).scalars().all()
+            if not keys:
+                connection.execute(update(backfill_checkpoints).where(checkpoints.name == backfill.name).values(
+                    status=DONE, updated_at=datetime.utcnow(), finished_at=datetime.utcnow()
+                ))
+                state['status'] = DONE
+                break
+
+            rows = backfill.run_batch(connection, keys)
+            last_key = keys[-1]
+            state['rows_done'] += rows
+            state['batches'] += 1
+            # نقطة الاستئناف تُحفظ في نفس معاملة الدفعة
+            connection.execute(update(backfill_checkpoints).where(checkpoints.name == backfill.name).values(
+                last_key=str(last_key), rows_done=state['rows_done'], batches=state['batches'],
+                updated_at=datetime.utcnow()
+            ))
+
+        elapsed = time.perf_counter() - started
+        rate = state['rows_done'] / elapsed if elapsed else 0
+        if state['rows_total']:
+            percent = min(100.0, state['rows_done'] * 100 / state['rows_total'])
+            logger.info(f'{backfill.name}: {state["rows_done"]}/{state["rows_total"]} ({percent:.1f}%) '
+                        f'{rate:.0f} صف/ث')
+        if progress is not None:
+            progress(dict(state, last_key=last_key, rate=rate))
+
+        if len(keys) < batch_size:
+            continue
+        delay = pause + (time.perf_counter() - batch_started) * load_factor
+        if delay > 0:
+            time.sleep(delay)
+
+    logger.info(f'{backfill.name}: اكتملت التعبئة ({state["rows_done"]} صف في {state["batches"]} دفعة)')
+    return state
+
+
+def backfill_status(engine):
+    if not inspect(engine).has_table(backfill_checkpoints.name):
+        return []
+    with engine.connect() as connection:
+        return [dict(row._mapping) for row in connection.execute(
+            select(backfill_checkpoints).order_by(backfill_checkpoints.c.started_at)
+        )]
+
+
+def add_nullable_column(connection, table_name, column):
+    """المرحلة 1: إضافة عمود قابل لـ NULL إن لم يكن موجوداً (بلا قيمة افتراضية تعيد كتابة الجدول)"""
+    if not column.nullable or column.server_default is not None:
+        raise ValueError(f'{table_name}.{column.name}: أضف العمود قابلاً لـ NULL وبلا قيمة افتراضية ثم عبّئه')
+    if column.name in {existing['name'] for existing in inspect(connection).get_columns(table_name)}:
+        return False
+    ddl = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {ddl}'))
+    return True
+
+
+def _constraint_state(connection, table_name, constraint):
+    """None إن لم يوجد القيد، وإلا convalidated (False لقيد NOT VALID بقي من محاولة فشلت)"""
+    return connection.execute(text(
+        'SELECT convalidated FROM pg_constraint WHERE conname = :name AND conrelid = to_regclass(:table)'
+    ), {'name': constraint, 'table': table_name}).scalar()
+
+
+def _add_not_valid(connection, table_name, constraint, definition):
+    """إضافة القيد NOT VALID إن لم يكن موجوداً ثم VALIDATE؛ إعادة التشغيل بعد فشل VALIDATE تكمل من حيث توقفت"""
+    state = _constraint_state(connection, table_name, constraint)
+    if state is None:
+        connection.execute(text(f'ALTER TABLE {table_name} ADD CONSTRAINT {constraint} {definition} NOT VALID'))
+    if not state:
+        connection.execute(text(f'ALTER TABLE {table_name} VALIDATE CONSTRAINT {constraint}'))
+    return state is None
+
+
+def set_not_null(connection, table_name, column_name):
+    """
+    المرحلة 3: NOT NULL بعد التعبئة
+
+    على PostgreSQL: قيد CHECK بصيغة NOT VALID ثم VALIDATE (فحص لا يمنع الكتابة) فيستغني
+    SET NOT NULL عن مسح الجدول تحت قفل حصري. SQLite لا يغيّر قيود الأعمدة دون إعادة بناء
+    الجدول، فيبقى القيد على مستوى النموذج.
+    """
+    if connection.dialect.name != 'postgresql':
+        logger.warning(f'{table_name}.{column_name}: NOT NULL غير مدعوم على {connection.dialect.name}، تم التخطي')
+        return False
+    constraint = f'{table_name}_{column_name}_not_null'
+    nullable = {column['name']: column['nullable'] for column in inspect(connection).get_columns(table_name)}
+    if not nullable[column_name]:
+        connection.execute(text(f'ALTER TABLE {table_name} DROP CONSTRAINT IF EXISTS {constraint}'))
+        return False
+    _add_not_valid(connection, table_name, constraint, f'CHECK ({column_name} IS NOT NULL)')
+    connection.execute(text(f'ALTER TABLE {table_name} ALTER COLUMN {column_name} SET NOT NULL'))
+    connection.execute(text(f'ALTER TABLE {table_name} DROP CONSTRAINT {constraint}'))
+    return True
+
+
+def add_foreign_key(connection, table_name, constraint, column_name, referenced):
+    """
+    المرحلة 3: مفتاح أجنبي NOT VALID ثم VALIDATE على PostgreSQL؛ referenced مثل 'users(user_id)'
+
+    Returns:
+        bool: False إن كان القيد موجوداً (ويُكمل VALIDATE إن لم يكن قد نجح)
+    """
+    if connection.dialect.name != 'postgresql':
+        logger.warning(f'{table_name}.{column_name}: إضافة مفتاح أجنبي غير مدعومة على {connection.dialect.name}، تم التخطي')
+        return False
+    return _add_not_valid(connection, table_name, constraint,
+                          f'FOREIGN KEY ({column_name}) REFERENCES {referenced}')
+
+
+def create_index(connection, name, table_name, columns, unique=False):
+    """المرحلة 3: فهرس (CONCURRENTLY على PostgreSQL، يتطلب اتصالاً خارج معاملة)"""
+    concurrently = 'CONCURRENTLY ' if connection.dialect.name == 'postgresql' else ''
+    unique = 'UNIQUE ' if unique else ''
+    connection.execute(text(
+        f'CREATE {unique}INDEX {concurrently}IF NOT EXISTS {name} ON {table_name}({", ".join(columns)})'
+    ))
+
+
+def main():
+    from src.database.migrate import detach_worker_metrics
+    detach_worker_metrics()
+    from src.main import app
+    from src.database.db import db
+
+    with app.app_context():
+        items = backfill_status(db.engine)
+    if not items:
+        print("لا توجد عمليات تعبئة مسجلة")
+        return
+    for item in items:
+        total = item['rows_total'] or 0
+        percent = f" ({min(100.0, item['rows_done'] * 100 / total):.1f}%)" if total else ''
+        print(f"{item['name']} [{item['status']}]: {item['rows_done']}/{total}{percent} "
+              f"في {item['batches']} دفعة، آخر مفتاح {item['last_key']}، آخر تحديث {item['updated_at'].isoformat()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+مشغّل الترحيلات المرقّمة (complaints_backend/migrations/NNN_name.py)
+
+- كل ترحيل وحدة تعرّف upgrade(connection)؛ يُطبق ما لم يُسجل في schema_migrations
+  بترتيب الرقم، كل ترحيل في معاملة واحدة مع تسجيله (فإن فشل لا يُسجل ولا يُكمل ما بعده)
+- TRANSACTIONAL = False في الوحدة يشغّلها بوضع AUTOCOMMIT (مثل CREATE INDEX CONCURRENTLY)
+- 000_baseline ينشئ جداول النماذج الناقصة، فيجب أن تبقى الترحيلات اللاحقة قابلة للتكرار
+  (تتحقق من وجود العمود/الفهرس قبل إضافته)
+- يُشغّل مرة واحدة عند النشر قبل بدء gunicorn، فلا ينفذ العمال أي DDL عند الإقلاع؛
+  على PostgreSQL يمنع قفل استشاري تشغيل نسختين في آن واحد
+
+تشغيل:
+    python complaints_backend/src/database/migrate.py            # تطبيق المعلق
+    python complaints_backend/src/database/migrate.py --status   # عرض الحالة فقط
+"""
+import importlib.util
+import logging
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import Column, DateTime, Float, MetaData, String, Table, inspect, select, text
+
+logger = logging.getLogger('complaints_system.migrations')
+
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'migrations'
+)
+_FILENAME = re.compile(r'^(\d{3,})_(\w+)\.py$')
+# مفتاح pg_advisory_lock ثابت لكل التطبيق
+ADVISORY_LOCK_KEY = 724011
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', String(20), primary_key=True),
+    Column('name', String(255), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+    Column('duration_ms', Float)
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: str
+    name: str
+    path: str
+
+    def load(self):
+        spec = importlib.util.spec_from_file_location(f'migration_{self.version}_{self.name}', self.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if not callable(getattr(module, 'upgrade', None)):
+            raise ValueError(f'الترحيل {self.path} لا يعرّف upgrade(connection)')
+        return module
+
+
+def discover(directory=None):
+    """ترحيلات المجلد مرتبة حسب الرقم؛ يرفع ValueError عند تكرار رقم"""
+    directory = directory or MIGRATIONS_DIR
+    migrations = {}
+    for filename in os.listdir(directory):
+        match = _FILENAME.match(filename)
+        if not match:
+            continue
+        version, name = match.groups()
+        if version in migrations:
+            raise ValueError(f'رقم ترحيل مكرر: {version}')
+        migrations[version] = Migration(version, name, os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations, key=int)]
+
+
+def applied_versions(connection):
+    if not inspect(connection).has_table(schema_migrations.name):
+        return {}
+    return {row.version: row for row in connection.execute(select(schema_migrations))}
+
+
+def _lock(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': ADVISORY_LOCK_KEY})
+
+
+def _unlock(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': ADVISORY_LOCK_KEY})
+
+
+def _apply(engine, migration):
+    module = migration.load()
+    started = time.perf_counter()
+
+    def record(connection):
+        connection.execute(schema_migrations.insert().values(
+            version=migration.version, name=migration.name, applied_at=datetime.utcnow(),
+            duration_ms=round((time.perf_counter() - started) * 1000, 2)
+        ))
+
+    if getattr(module, 'TRANSACTIONAL', True):
+        with engine.begin() as connection:
+            module.upgrade(connection)
+            record(connection)
+    else:
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            module.upgrade(connection)
+        with engine.begin() as connection:
+            record(connection)
+
+
+def run_migrations(engine, directory=None):
+    """
+    تطبيق الترحيلات المعلقة بالترتيب
+
+    Returns:
+        list: أسماء الترحيلات المطبقة (version_name)
+    """
+    migrations = discover(directory)
+    applied = []
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as lock_connection:
+        _lock(lock_connection)
+        try:
+            schema_migrations.create(lock_connection, checkfirst=True)
+            done = applied_versions(lock_connection)
+            for migration in migrations:
+                if migration.version in done:
+                    continue
+                logger.info(f'تطبيق الترحيل {migration.version}_{migration.name}')
+                _apply(engine, migration)
+                applied.append(f'{migration.version}_{migration.name}')
+        finally:
+            _unlock(lock_connection)
+    return applied
+
+
+def migration_status(engine, directory=None):
+    with engine.connect() as connection:
+        done = applied_versions(connection)
+    return [
+        {
+            'version': migration.version,
+            'name': migration.name,
+            'applied_at': done[migration.version].applied_at if migration.version in done else None
+        }
+        for migration in discover(directory)
+    ]
+
+
+def migrate_app(app):
+    """تطبيق الترحيلات ثم تهيئة البيانات المشتقة (فهرس البحث والعدادات) لأول مرة"""
+    from src.database.db import db
+    from src.services.search import ensure_search_index
+    from src.services.dashboard_stats import ensure_dashboard_stats
+    from src.services.notification_counters import ensure_unread_counters
+
+    with app.app_context():
+        applied = run_migrations(db.engine)
+        ensure_search_index()
+        ensure_dashboard_stats()
+        ensure_unread_counters()
+        db.session.remove()
+    return applied
+
+
+def detach_worker_metrics():
+    """
+    أوامر النشر تستورد src.main قبل أن ينشئ gunicorn مجلد PROMETHEUS_MULTIPROC_DIR (on_starting)،
+    ومقاييس العملية لا تهم هنا؛ يجب الاستدعاء قبل أول استيراد لـ prometheus_client
+    """
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+
+
+def main():
+    detach_worker_metrics()
+    from src.main import app
+    from src.database.db import db
+
+    if '--status' in sys.argv[1:]:
+        with app.app_context():
+            for item in migration_status(db.engine):
+                state = item['applied_at'].isoformat() if item['applied_at'] else 'معلق'
+                print(f"{item['version']}_{item['name']}: {state}")
+        return
+
+    print("بدء تطبيق الترحيلات...")
+    applied = migrate_app(app)
+    for name in applied:
+        print(f"✓ {name}")
+    print(f"✅ اكتمل ({len(applied)} ترحيل جديد)" if applied else "✓ قاعدة البيانات محدثة")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
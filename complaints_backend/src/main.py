@@ -8,6 +8,8 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from src.database.db import db
+from src.core.perf import init_perf
+from src.core.metrics import init_metrics, TimedQueuePool
 from src.routes.user import user_bp
 from src.routes.complaint import complaint_bp
 from src.routes.auth import auth_bp
@@ -29,6 +31,8 @@ limiter = Limiter(
 )
 
 app.limiter = limiter  # type: ignore
+init_perf(app)
+init_metrics(app)
 
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(complaint_bp, url_prefix='/api')
@@ -36,20 +40,30 @@ app.register_blueprint(auth_bp, url_prefix='/api')
 app.register_blueprint(subscription_bp, url_prefix='/api')
 app.register_blueprint(subscription_v2_bp, url_prefix='/api')
 
+# Every gunicorn thread may hold a connection, so the server pool defaults to one per thread.
+# SQLite keeps SQLAlchemy's default pool: its file lock serialises writers anyway.
+pool_options = {
+    "poolclass": TimedQueuePool,
+    "pool_size": int(os.environ.get('DB_POOL_SIZE', os.environ.get('GUNICORN_THREADS', 16))),
+    "max_overflow": int(os.environ.get('DB_MAX_OVERFLOW', 4)),
+}
+
 database_url = os.environ.get('DATABASE_URL')
-if database_url:
+if database_url and database_url.startswith('sqlite'):
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+elif database_url:
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
         "pool_recycle": 300,
         "pool_pre_ping": True,
+        **pool_options,
     }
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
-with app.app_context():
-    db.create_all()
+# No DDL at import time: the schema is managed by src/database/migrate.py, run once per deploy
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -69,4 +83,6 @@ def serve(path):
 
 
 if __name__ == '__main__':
+    from src.database.migrate import migrate_app
+    migrate_app(app)
     app.run(host='0.0.0.0', port=8000, debug=True)
@@ -1,5 +1,6 @@
 from datetime import datetime
 import uuid
+from sqlalchemy.orm import joinedload
 from src.database.db import db
 
 class Role(db.Model):
@@ -98,6 +99,11 @@ class ComplaintStatus(db.Model):
 
 class Complaint(db.Model):
     __tablename__ = 'complaints'
+    __table_args__ = (
+        # قائمة التاجر وقائمة "المسندة إلي" مرتبة بالأحدث
+        db.Index('idx_complaints_trader_submitted', 'trader_id', 'submitted_at'),
+        db.Index('idx_complaints_assigned_submitted', 'assigned_to_committee_id', 'submitted_at'),
+    )
     
     complaint_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     trader_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=False)
@@ -117,7 +123,44 @@ class Complaint(db.Model):
     comments = db.relationship('ComplaintComment', backref='complaint', lazy=True, cascade='all, delete-orphan')
     notifications = db.relationship('Notification', backref='related_complaint', lazy=True)
     
-    def to_dict(self):
+    @staticmethod
+    def list_options():
+        """خيارات التحميل المسبق لحقول العرض في قوائم الشكاوى (بدون N+1)"""
+        return (
+            joinedload(Complaint.trader),
+            joinedload(Complaint.category),
+            joinedload(Complaint.status),
+            joinedload(Complaint.assigned_committee_member)
+        )
+    
+    @classmethod
+    def to_dict_many(cls, complaints):
+        """تسلسل صفحة من الشكاوى مع عدّ المرفقات والتعليقات باستعلامين مجمّعين"""
+        complaint_ids = [complaint.complaint_id for complaint in complaints]
+        attachments_counts = {}
+        comments_counts = {}
+        if complaint_ids:
+            attachments_counts = dict(
+                db.session.query(ComplaintAttachment.complaint_id, db.func.count(ComplaintAttachment.attachment_id))
+                .filter(ComplaintAttachment.complaint_id.in_(complaint_ids))
+                .group_by(ComplaintAttachment.complaint_id)
+                .all()
+            )
+            comments_counts = dict(
+                db.session.query(ComplaintComment.complaint_id, db.func.count(ComplaintComment.comment_id))
+                .filter(ComplaintComment.complaint_id.in_(complaint_ids))
+                .group_by(ComplaintComment.complaint_id)
+                .all()
+            )
+        return [
+            complaint.to_dict(
+                attachments_count=attachments_counts.get(complaint.complaint_id, 0),
+                comments_count=comments_counts.get(complaint.complaint_id, 0)
+            )
+            for complaint in complaints
+        ]
+    
+    def to_dict(self, attachments_count=None, comments_count=None):
         return {
             'complaint_id': self.complaint_id,
             'trader_id': self.trader_id,
@@ -135,8 +178,36 @@ class Complaint(db.Model):
             'assigned_committee_member_name': self.assigned_committee_member.full_name if self.assigned_committee_member else None,
             'resolution_details': self.resolution_details,
             'closed_at': self.closed_at.isoformat() if self.closed_at else None,
-            'attachments_count': len(self.attachments),
-            'comments_count': len(self.comments)
+            'attachments_count': len(self.attachments) if attachments_count is None else attachments_count,
+            'comments_count': len(self.comments) if comments_count is None else comments_count
+        }
+
+class ComplaintStatsCounter(db.Model):
+    """عدادات لوحة المعلومات (total / status / category / priority) تُحدّث مع كل flush"""
+    __tablename__ = 'complaint_stats_counters'
+
+    dimension = db.Column(db.String(20), primary_key=True)
+    bucket = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'dimension': self.dimension,
+            'bucket': self.bucket,
+            'count': self.count
+        }
+
+class ComplaintDailyCount(db.Model):
+    """عدد الشكاوى المقدمة في كل يوم (لحساب آخر 30 يوماً دون المرور على جدول الشكاوى)"""
+    __tablename__ = 'complaint_daily_counts'
+
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat() if self.day else None,
+            'count': self.count
         }
 
 class ComplaintAttachment(db.Model):
@@ -181,6 +252,11 @@ class ComplaintComment(db.Model):
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('idx_notifications_user_created', 'user_id', 'created_at'),
+        # unread_only والقراءة الجماعية
+        db.Index('idx_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+    )
     
     notification_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=False)
@@ -201,8 +277,55 @@ class Notification(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class NotificationArchive(db.Model):
+    """إشعارات قديمة نقلتها مهمة الاحتفاظ من notifications؛ مقسم شهرياً حسب created_at على PostgreSQL"""
+    __tablename__ = 'notifications_archive'
+    __table_args__ = (
+        db.Index('idx_notifications_archive_user_created', 'user_id', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'}
+    )
+
+    notification_id = db.Column(db.String(36), primary_key=True)
+    # جزء من المفتاح الأساسي لأن PostgreSQL يشترط أن يتضمن مفتاح التقسيم
+    created_at = db.Column(db.DateTime, primary_key=True)
+    user_id = db.Column(db.String(36), nullable=False)
+    complaint_id = db.Column(db.String(36))
+    message = db.Column(db.Text, nullable=False)
+    type = db.Column(db.String(50))
+    is_read = db.Column(db.Boolean, default=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'notification_id': self.notification_id,
+            'user_id': self.user_id,
+            'complaint_id': self.complaint_id,
+            'message': self.message,
+            'type': self.type,
+            'is_read': self.is_read,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None
+        }
+
+class NotificationUnreadCounter(db.Model):
+    """عدد الإشعارات غير المقروءة لكل مستخدم؛ يُحدّث داخل نفس معاملة الإضافة أو القراءة"""
+    __tablename__ = 'notification_unread_counters'
+
+    user_id = db.Column(db.String(36), db.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'unread_count': self.unread_count
+        }
+
 class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        db.Index('idx_audit_logs_action_created', 'action_type', 'created_at'),
+        db.Index('idx_audit_logs_created', 'created_at'),
+    )
     
     log_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     action_type = db.Column(db.String(100), nullable=False)  # e.g., 'role_change', 'user_created', 'user_deleted', 'status_change'
@@ -231,6 +354,11 @@ class AuditLog(db.Model):
 
 class Subscription(db.Model):
     __tablename__ = 'subscriptions'
+    __table_args__ = (
+        # الاشتراك الفعال للمستخدم، ثم مهام الانتهاء والتذكير المجدولة (status + نافذة end_date)
+        db.Index('idx_subscriptions_user_status_end', 'user_id', 'status', 'end_date'),
+        db.Index('idx_subscriptions_status_end', 'status', 'end_date'),
+    )
     
     subscription_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=False)
@@ -296,6 +424,10 @@ class PaymentMethod(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
+    __table_args__ = (
+        db.Index('idx_payments_status_created', 'status', 'created_at'),
+        db.Index('idx_payments_user_status', 'user_id', 'status'),
+    )
     
     payment_id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.user_id'), nullable=False)
@@ -306,7 +438,7 @@ class Payment(db.Model):
     amount = db.Column(db.Float, nullable=False)
     currency = db.Column(db.String(10), default='YER')
     payment_date = db.Column(db.DateTime, nullable=False)
-    receipt_image_path = db.Column(db.String(500), nullable=False)
+    receipt_image_path = db.Column(db.String(500), nullable=False, index=True)
     status = db.Column(db.String(20), default='pending')
     reviewed_by_id = db.Column(db.String(36), db.ForeignKey('users.user_id'))
     review_notes = db.Column(db.Text)
@@ -339,6 +471,31 @@ class Payment(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class ReceiptBlob(db.Model):
+    """فهرس ملفات الإيصالات المخزنة حسب بصمة المحتوى مع عدد الدفعات التي تشير إليها"""
+    __tablename__ = 'receipt_blobs'
+    
+    sha256 = db.Column(db.String(64), primary_key=True)
+    storage_path = db.Column(db.String(500), nullable=False, unique=True)
+    size = db.Column(db.Integer, nullable=False)
+    mime_type = db.Column(db.String(100))
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    first_payment_id = db.Column(db.String(36), db.ForeignKey('payments.payment_id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_referenced_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'sha256': self.sha256,
+            'storage_path': self.storage_path,
+            'size': self.size,
+            'mime_type': self.mime_type,
+            'ref_count': self.ref_count,
+            'first_payment_id': self.first_payment_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_referenced_at': self.last_referenced_at.isoformat() if self.last_referenced_at else None
+        }
+
 class Settings(db.Model):
     __tablename__ = 'settings'
     
@@ -1,5 +1,6 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, g
 from werkzeug.security import generate_password_hash, check_password_hash
+import os
 import jwt
 import pyotp
 import qrcode
@@ -8,6 +9,10 @@ import base64
 from datetime import datetime, timedelta
 from functools import wraps
 from src.models.complaint import db, User, Role
+from src.core.principal_cache import get_principal
+from src.core.settings_registry import get_settings
+from src.core.reference_data import reference_response
+from src.core.audit import AuditLogger
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -24,10 +29,29 @@ def rate_limit(limit_string):
         return decorated_function
     return decorator
 
+# Short-lived token for EventSource, which cannot send an Authorization header
+STREAM_TOKEN_SCOPE = 'notification_stream'
+STREAM_TOKEN_SECONDS = int(os.environ.get('STREAM_TOKEN_SECONDS', 60))
+
+def issue_stream_token(user_id):
+    """Signed token accepted only as ?token= by views marked with accepts_stream_token"""
+    return jwt.encode({
+        'user_id': user_id,
+        'scope': STREAM_TOKEN_SCOPE,
+        'exp': datetime.utcnow() + timedelta(seconds=STREAM_TOKEN_SECONDS)
+    }, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+def accepts_stream_token(f):
+    """Let token_required read a stream token from the query string (apply below token_required)"""
+    f.stream_token_scope = STREAM_TOKEN_SCOPE
+    return f
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         token = None
+        # Regular tokens carry no scope; scoped tokens only work where the view allows them
+        scope = None
         
         if 'Authorization' in request.headers:
             auth_header = request.headers['Authorization']
@@ -35,6 +59,9 @@ def token_required(f):
                 token = auth_header.split(" ")[1]  # Bearer TOKEN
             except IndexError:
                 return jsonify({'message': 'تنسيق رمز التوثيق غير صالح'}), 401
+        elif getattr(f, 'stream_token_scope', None) and request.args.get('token'):
+            token = request.args['token']
+            scope = f.stream_token_scope
         
         if not token:
             return jsonify({'message': 'رمز التوثيق مفقود'}), 401
@@ -42,14 +69,22 @@ def token_required(f):
         try:
             from flask import current_app
             data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = User.query.filter_by(user_id=data['user_id']).first()
-            if not current_user:
+            if data.get('scope') != scope:
+                return jsonify({'message': 'رمز التوثيق غير صالح'}), 401
+            principal = get_principal(data['user_id'])
+            if not principal:
                 return jsonify({'message': 'رمز التوثيق غير صالح'}), 401
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'انتهت صلاحية رمز التوثيق'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'message': 'رمز التوثيق غير صالح'}), 401
         
+        if not principal.is_active:
+            return jsonify({'message': 'الحساب غير نشط'}), 401
+        
+        g.principal = principal
+        current_user = principal.attach()
+        
         subscription_exempt_routes = [
             '/api/subscription/status',
             '/api/subscription/me',
@@ -61,30 +96,21 @@ def token_required(f):
             '/api/renewal/check'
         ]
         
-        if current_user.role.role_name == 'Trader':
+        if principal.role_name == 'Trader':
             if not any(request.path.startswith(route) for route in subscription_exempt_routes):
-                from src.models.complaint import Subscription, Settings
-                
-                active_subscription = Subscription.query.filter_by(
-                    user_id=current_user.user_id,
-                    status='active'
-                ).order_by(Subscription.end_date.desc()).first()
-                
-                if not active_subscription:
+                if not principal.has_subscription:
                     return jsonify({
                         'message': 'يجب تفعيل الاشتراك للوصول إلى هذه الميزة',
                         'requires_subscription': True
                     }), 403
                 
-                grace_period_setting = Settings.query.filter_by(key='grace_period_days').first()
-                grace_period_days = int(grace_period_setting.value) if grace_period_setting else 7
+                settings = get_settings()
+                grace_period_days = settings.grace_period_days
+                grace_enabled = settings.enable_grace_period
                 
-                enable_grace_period = Settings.query.filter_by(key='enable_grace_period').first()
-                grace_enabled = enable_grace_period.value.lower() == 'true' if enable_grace_period else True
-                
-                if active_subscription.end_date < datetime.utcnow():
-                    if grace_enabled and active_subscription.grace_period_enabled:
-                        grace_end = active_subscription.end_date + timedelta(days=grace_period_days)
+                if principal.subscription_end < datetime.utcnow():
+                    if grace_enabled and principal.grace_period_enabled:
+                        grace_end = principal.subscription_end + timedelta(days=grace_period_days)
                         if datetime.utcnow() > grace_end:
                             return jsonify({
                                 'message': 'انتهت فترة السماح. يجب تجديد الاشتراك للوصول إلى هذه الميزة',
@@ -115,13 +141,11 @@ def subscription_required(f):
     @wraps(f)
     def decorated(current_user, *args, **kwargs):
         if current_user.role.role_name == 'Trader':
-            from src.models.complaint import Subscription
-            active_subscription = Subscription.query.filter_by(
-                user_id=current_user.user_id,
-                status='active'
-            ).filter(Subscription.end_date > datetime.utcnow()).first()
+            principal = g.get('principal')
+            if principal is None or principal.user_id != current_user.user_id:
+                principal = get_principal(current_user.user_id)
             
-            if not active_subscription:
+            if not principal.has_subscription or principal.subscription_end <= datetime.utcnow():
                 return jsonify({
                     'message': 'يجب تفعيل الاشتراك للوصول إلى هذه الميزة',
                     'requires_subscription': True
@@ -212,6 +236,7 @@ def login():
                 'user_id': user.user_id,
                 'exp': datetime.utcnow() + timedelta(hours=24)
             }, current_app.config['SECRET_KEY'], algorithm='HS256')
+            AuditLogger.log_login(user.user_id, True, request.remote_addr)
             
             return jsonify({
                 'requires_2fa': False,
@@ -220,6 +245,8 @@ def login():
                 'user': user.to_dict()
             }), 200
         
+        if user:
+            AuditLogger.log_login(user.user_id, False, request.remote_addr)
         return jsonify({'message': 'اسم المستخدم أو كلمة المرور غير صحيحة'}), 401
         
     except Exception as e:
@@ -289,10 +316,7 @@ def change_password(current_user):
 @auth_bp.route('/roles', methods=['GET'])
 def get_roles():
     try:
-        roles = Role.query.all()
-        return jsonify({
-            'roles': [role.to_dict() for role in roles]
-        }), 200
+        return reference_response('roles')
     except Exception as e:
         return jsonify({'message': f'خطأ في جلب الأدوار: {str(e)}'}), 500
 
@@ -416,6 +440,7 @@ def validate_2fa():
                 'user_id': user.user_id,
                 'exp': datetime.utcnow() + timedelta(hours=24)
             }, current_app.config['SECRET_KEY'], algorithm='HS256')
+            AuditLogger.log_login(user.user_id, True, request.remote_addr)
             
             return jsonify({
                 'message': 'تم تسجيل الدخول بنجاح',
@@ -423,6 +448,7 @@ def validate_2fa():
                 'user': user.to_dict()
             }), 200
         else:
+            AuditLogger.log_login(user.user_id, False, request.remote_addr)
             return jsonify({'message': 'رمز التحقق غير صحيح'}), 401
         
     except Exception as e:
@@ -1,9 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
 from src.models.complaint import db, Complaint, ComplaintCategory, ComplaintStatus, ComplaintAttachment, ComplaintComment, Notification, User
 from src.routes.auth import token_required, role_required, subscription_required
+from src.utils.pagination import get_pagination_args, keyset_paginate
+from src.services.search import apply_search
+from src.services.dashboard_stats import get_dashboard_stats_snapshot
+from src.services.notifications import notify_roles
+from src.services.complaint_export import EXPORT_FORMATS, stream_complaints
+from src.core.reference_data import reference_response
 
 complaint_bp = Blueprint('complaint', __name__)
 
@@ -65,15 +71,13 @@ def create_complaint(current_user):
         db.session.add(new_complaint)
         db.session.flush()  # Get the complaint_id
         
-        # Create notification for technical committee members
-        technical_committee_members = User.query.join(User.role).filter_by(role_name='Technical Committee').all()
-        for member in technical_committee_members:
-            create_notification(
-                member.user_id,
-                new_complaint.complaint_id,
-                f'شكوى جديدة تم تقديمها: {new_complaint.title}',
-                'new_complaint'
-            )
+        # Notify all technical committee members in one multi-row insert
+        notify_roles(
+            ['Technical Committee'],
+            f'شكوى جديدة تم تقديمها: {new_complaint.title}',
+            'new_complaint',
+            complaint_id=new_complaint.complaint_id
+        )
         
         db.session.commit()
         
@@ -86,54 +90,89 @@ def create_complaint(current_user):
         db.session.rollback()
         return jsonify({'message': f'Error creating complaint: {str(e)}'}), 500
 
+def filtered_complaints_query(current_user, args):
+    """
+    Complaint query scoped to the caller's role with the list filters applied
+    (status_id, category_id, priority, assigned_only, search).
+
+    Returns:
+        tuple: (query, rank_ordering or None)
+    """
+    status_id = args.get('status_id', type=int)
+    category_id = args.get('category_id', type=int)
+    priority = args.get('priority')
+    search = args.get('search')
+    
+    # Build query based on user role
+    query = Complaint.query
+    
+    if current_user.role.role_name == 'Trader':
+        # Traders can only see their own complaints
+        query = query.filter_by(trader_id=current_user.user_id)
+    elif current_user.role.role_name == 'Technical Committee':
+        # Technical committee can see all complaints or assigned ones
+        assigned_only = args.get('assigned_only', 'false').lower() == 'true'
+        if assigned_only:
+            query = query.filter_by(assigned_to_committee_id=current_user.user_id)
+    # Higher Committee can see all complaints (no additional filter)
+    
+    # Apply filters
+    if status_id:
+        query = query.filter_by(status_id=status_id)
+    if category_id:
+        query = query.filter_by(category_id=category_id)
+    if priority:
+        query = query.filter_by(priority=priority)
+    rank_ordering = None
+    if search:
+        query, rank_ordering = apply_search(query, search)
+    return query, rank_ordering
+
 @complaint_bp.route('/complaints', methods=['GET'])
 @token_required
 @subscription_required
 def get_complaints(current_user):
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        status_id = request.args.get('status_id', type=int)
-        category_id = request.args.get('category_id', type=int)
-        priority = request.args.get('priority')
-        search = request.args.get('search')
-        
-        # Build query based on user role
-        query = Complaint.query
-        
-        if current_user.role.role_name == 'Trader':
-            # Traders can only see their own complaints
-            query = query.filter_by(trader_id=current_user.user_id)
-        elif current_user.role.role_name == 'Technical Committee':
-            # Technical committee can see all complaints or assigned ones
-            assigned_only = request.args.get('assigned_only', 'false').lower() == 'true'
-            if assigned_only:
-                query = query.filter_by(assigned_to_committee_id=current_user.user_id)
-        # Higher Committee can see all complaints (no additional filter)
-        
-        # Apply filters
-        if status_id:
-            query = query.filter_by(status_id=status_id)
-        if category_id:
-            query = query.filter_by(category_id=category_id)
-        if priority:
-            query = query.filter_by(priority=priority)
-        if search:
-            query = query.filter(
-                (Complaint.title.contains(search)) |
-                (Complaint.description.contains(search))
-            )
-        
-        # Order by submission date (newest first)
-        query = query.order_by(Complaint.submitted_at.desc())
+        pagination_args = get_pagination_args(request, default_per_page=10)
+        page = pagination_args['page']
+        per_page = pagination_args['per_page']
+        query, rank_ordering = filtered_complaints_query(current_user, request.args)
+        query = query.options(*Complaint.list_options())
+        
+        # Cursor mode: seek on (submitted_at, complaint_id), newest first
+        if pagination_args['use_cursor']:
+            try:
+                items, next_cursor, has_more = keyset_paginate(
+                    query, Complaint.submitted_at, Complaint.complaint_id,
+                    cursor=pagination_args['cursor'], per_page=per_page
+                )
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
+            
+            response = {
+                'complaints': Complaint.to_dict_many(items),
+                'next_cursor': next_cursor,
+                'has_more': has_more,
+                'per_page': per_page
+            }
+            if pagination_args['include_total']:
+                response['total'] = query.order_by(None).count()
+            return jsonify(response), 200
+        
+        # Order by search rank when searching, then by submission date (newest first)
+        if rank_ordering is not None:
+            query = query.order_by(rank_ordering, Complaint.submitted_at.desc())
+        else:
+            query = query.order_by(Complaint.submitted_at.desc())
         
         # Paginate
         complaints = query.paginate(
-            page=page, per_page=per_page, error_out=False
+            page=page, per_page=per_page, error_out=False,
+            count=pagination_args['include_total']
         )
         
         return jsonify({
-            'complaints': [complaint.to_dict() for complaint in complaints.items],
+            'complaints': Complaint.to_dict_many(complaints.items),
             'total': complaints.total,
             'pages': complaints.pages,
             'current_page': page,
@@ -143,6 +182,27 @@ def get_complaints(current_user):
     except Exception as e:
         return jsonify({'message': f'Error fetching complaints: {str(e)}'}), 500
 
+@complaint_bp.route('/complaints/export', methods=['GET'])
+@token_required
+@role_required(['Technical Committee', 'Higher Committee'])
+def export_complaints(current_user):
+    """Stream every complaint matching the list filters as CSV or XLSX (?format=csv|xlsx)"""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': f'Unsupported export format. Use one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    query, _ = filtered_complaints_query(current_user, request.args)
+    filename = f"complaints-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(stream_complaints(query, export_format)),
+        content_type=EXPORT_FORMATS[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Cache-Control': 'no-store',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @complaint_bp.route('/complaints/<complaint_id>', methods=['GET'])
 @token_required
 def get_complaint(current_user, complaint_id):
@@ -320,10 +380,7 @@ def add_comment(current_user, complaint_id):
 @token_required
 def get_categories(current_user):
     try:
-        categories = ComplaintCategory.query.all()
-        return jsonify({
-            'categories': [category.to_dict() for category in categories]
-        }), 200
+        return reference_response('categories', private=True)
     except Exception as e:
         return jsonify({'message': f'Error fetching categories: {str(e)}'}), 500
 
@@ -331,10 +388,7 @@ def get_categories(current_user):
 @token_required
 def get_statuses(current_user):
     try:
-        statuses = ComplaintStatus.query.all()
-        return jsonify({
-            'statuses': [status.to_dict() for status in statuses]
-        }), 200
+        return reference_response('statuses', private=True)
     except Exception as e:
         return jsonify({'message': f'Error fetching statuses: {str(e)}'}), 500
 
@@ -343,41 +397,8 @@ def get_statuses(current_user):
 @role_required(['Technical Committee', 'Higher Committee'])
 def get_dashboard_stats(current_user):
     try:
-        # Basic statistics
-        total_complaints = Complaint.query.count()
-        
-        # Status distribution
-        status_stats = db.session.query(
-            ComplaintStatus.status_name,
-            db.func.count(Complaint.complaint_id).label('count')
-        ).join(Complaint).group_by(ComplaintStatus.status_name).all()
-        
-        # Category distribution
-        category_stats = db.session.query(
-            ComplaintCategory.category_name,
-            db.func.count(Complaint.complaint_id).label('count')
-        ).join(Complaint).group_by(ComplaintCategory.category_name).all()
-        
-        # Priority distribution
-        priority_stats = db.session.query(
-            Complaint.priority,
-            db.func.count(Complaint.complaint_id).label('count')
-        ).group_by(Complaint.priority).all()
-        
-        # Recent complaints (last 30 days)
-        from datetime import timedelta
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_complaints = Complaint.query.filter(
-            Complaint.submitted_at >= thirty_days_ago
-        ).count()
-        
-        return jsonify({
-            'total_complaints': total_complaints,
-            'recent_complaints': recent_complaints,
-            'status_distribution': [{'status': s[0], 'count': s[1]} for s in status_stats],
-            'category_distribution': [{'category': c[0], 'count': c[1]} for c in category_stats],
-            'priority_distribution': [{'priority': p[0], 'count': p[1]} for p in priority_stats]
-        }), 200
+        # Served from the counter tables maintained on every flush
+        return jsonify(get_dashboard_stats_snapshot()), 200
         
     except Exception as e:
         return jsonify({'message': f'Error fetching dashboard stats: {str(e)}'}), 500
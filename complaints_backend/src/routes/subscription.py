@@ -3,6 +3,15 @@ from src.database.db import db
 from src.models.complaint import User, Subscription, Payment, PaymentMethod, Settings, Notification
 from src.routes.auth import token_required, role_required, rate_limit
 from src.utils.security import validate_and_save_file, validate_payment_data
+from src.utils.delivery import send_protected_file
+from src.core.principal_cache import invalidate_principal
+from src.core.settings_registry import settings_registry
+from src.core.reference_data import reference_response
+from src.core.audit import AuditLogger
+from src.services import scheduler
+from src.services.receipts import add_receipt_reference, find_duplicate_receipts, receipt_sha256
+from src.services.receipt_derivatives import DERIVATIVE_SIZES, get_receipt_derivative, schedule_receipt_derivatives
+from src.services.notifications import notify_roles, ADMIN_ROLES
 from datetime import datetime, timedelta
 import os
 
@@ -38,30 +47,14 @@ def get_subscription_status(current_user):
 @subscription_bp.route('/payment-methods', methods=['GET'])
 def get_payment_methods():
     try:
-        methods = PaymentMethod.query.filter_by(is_active=True).order_by(PaymentMethod.display_order).all()
-        return jsonify({
-            'payment_methods': [method.to_dict() for method in methods]
-        }), 200
+        return reference_response('payment_methods')
     except Exception as e:
         return jsonify({'message': f'خطأ في جلب طرق الدفع: {str(e)}'}), 500
 
 @subscription_bp.route('/subscription-price', methods=['GET'])
 def get_subscription_price():
     try:
-        price_setting = Settings.query.filter_by(key='annual_subscription_price').first()
-        if not price_setting:
-            price_setting = Settings(
-                key='annual_subscription_price',
-                value='50000',
-                description='سعر الاشتراك السنوي بالريال اليمني'
-            )
-            db.session.add(price_setting)
-            db.session.commit()
-        
-        return jsonify({
-            'price': float(price_setting.value),
-            'currency': 'YER'
-        }), 200
+        return reference_response('subscription_price')
     except Exception as e:
         return jsonify({'message': f'خطأ في جلب سعر الاشتراك: {str(e)}'}), 500
 
@@ -107,19 +100,16 @@ def submit_payment(current_user):
         
         db.session.add(new_payment)
         db.session.flush()
+        add_receipt_reference(new_payment, result)
         
-        admin_roles = ['Technical Committee', 'Higher Committee']
-        admin_users = User.query.join(User.role).filter(User.role.has(role_name=admin_roles[0]) | User.role.has(role_name=admin_roles[1])).all()
-        
-        for admin in admin_users:
-            notification = Notification(
-                user_id=admin.user_id,
-                message=f'طلب دفع جديد من {current_user.full_name} بمبلغ {data["amount"]} ريال',
-                type='payment_submission'
-            )
-            db.session.add(notification)
+        notify_roles(
+            ADMIN_ROLES,
+            f'طلب دفع جديد من {current_user.full_name} بمبلغ {data["amount"]} ريال',
+            'payment_submission'
+        )
         
         db.session.commit()
+        schedule_receipt_derivatives(UPLOAD_FOLDER, filename)
         
         return jsonify({
             'message': 'تم إرسال إثبات الدفع بنجاح. سيتم مراجعته قريباً',
@@ -133,20 +123,34 @@ def submit_payment(current_user):
 @subscription_bp.route('/payment/receipt/<path:filename>', methods=['GET'])
 @token_required
 def get_receipt(current_user, filename):
-    from flask import send_from_directory
+    """
+    Receipt image; ?size=review|thumb serves a downscaled JPEG copy without EXIF.
+    With FILE_DELIVERY=x-accel the transfer itself is handed to nginx.
+    """
+    size = request.args.get('size')
+    if size and size not in DERIVATIVE_SIZES:
+        return jsonify({'message': f'الحجم غير مدعوم. القيم المسموحة: {", ".join(DERIVATIVE_SIZES)}'}), 400
     try:
-        payment = Payment.query.filter_by(receipt_image_path=filename).first()
+        # The same content-addressed receipt may belong to several payments
+        owners = {user_id for (user_id,) in db.session.query(Payment.user_id).filter_by(receipt_image_path=filename)}
         
-        if not payment:
+        if not owners:
             return jsonify({'message': 'الملف غير موجود'}), 404
         
         is_admin = current_user.role.role_name in ['Technical Committee', 'Higher Committee']
-        is_owner = payment.user_id == current_user.user_id
+        is_owner = current_user.user_id in owners
         
         if not (is_admin or is_owner):
             return jsonify({'message': 'غير مصرح بالوصول'}), 403
         
-        return send_from_directory(UPLOAD_FOLDER, filename)
+        # Content-addressed names (and their derivatives) never change
+        immutable = receipt_sha256(filename) is not None
+        if size:
+            derivative = get_receipt_derivative(UPLOAD_FOLDER, filename, size)
+            if derivative:
+                return send_protected_file(UPLOAD_FOLDER, derivative, immutable=immutable)
+        
+        return send_protected_file(UPLOAD_FOLDER, filename, immutable=immutable)
     except Exception as e:
         return jsonify({'message': 'الملف غير موجود'}), 404
 
@@ -157,9 +161,13 @@ def get_all_payments(current_user):
     try:
         status = request.args.get('status', 'pending')
         payments = Payment.query.filter_by(status=status).order_by(Payment.created_at.desc()).all()
+        duplicates = find_duplicate_receipts(payments)
         
         return jsonify({
-            'payments': [payment.to_dict() for payment in payments]
+            'payments': [
+                {**payment.to_dict(), 'duplicate_receipts': duplicates.get(payment.payment_id, [])}
+                for payment in payments
+            ]
         }), 200
     except Exception as e:
         return jsonify({'message': f'خطأ في جلب المدفوعات: {str(e)}'}), 500
@@ -194,8 +202,7 @@ def approve_payment(current_user, payment_id):
         
         end_date = start_date + timedelta(days=365)
         
-        grace_period_setting = Settings.query.filter_by(key='enable_grace_period').first()
-        grace_enabled = grace_period_setting.value.lower() == 'true' if grace_period_setting else True
+        grace_enabled = settings_registry.get().enable_grace_period
         
         new_subscription = Subscription(
             user_id=user.user_id,
@@ -220,6 +227,8 @@ def approve_payment(current_user, payment_id):
         db.session.add(new_subscription)
         db.session.add(notification)
         db.session.commit()
+        invalidate_principal(user.user_id)
+        AuditLogger.log_payment_approval(payment_id, current_user.user_id, 'approved', request.remote_addr, user_id=user.user_id)
         
         return jsonify({
             'message': 'تم اعتماد الدفع بنجاح',
@@ -260,6 +269,7 @@ def reject_payment(current_user, payment_id):
         
         db.session.add(notification)
         db.session.commit()
+        AuditLogger.log_payment_approval(payment_id, current_user.user_id, 'rejected', request.remote_addr, user_id=payment.user_id)
         
         return jsonify({
             'message': 'تم رفض الدفع'
@@ -389,18 +399,9 @@ def update_settings(current_user):
     try:
         data = request.get_json()
         
-        for key, value in data.items():
-            setting = Settings.query.filter_by(key=key).first()
-            if setting:
-                setting.value = str(value)
-                setting.updated_at = datetime.utcnow()
-            else:
-                new_setting = Settings(key=key, value=str(value))
-                db.session.add(new_setting)
-        
-        db.session.commit()
+        version = settings_registry.update(data)
         
-        return jsonify({'message': 'تم تحديث الإعدادات بنجاح'}), 200
+        return jsonify({'message': 'تم تحديث الإعدادات بنجاح', 'version': version}), 200
         
     except Exception as e:
         db.session.rollback()
@@ -427,11 +428,9 @@ def check_renewal_status(current_user):
         
         days_remaining = (active_subscription.end_date - datetime.utcnow()).days
         
-        grace_period_setting = Settings.query.filter_by(key='grace_period_days').first()
-        grace_period_days = int(grace_period_setting.value) if grace_period_setting else 7
-        
-        enable_grace_period = Settings.query.filter_by(key='enable_grace_period').first()
-        grace_enabled = enable_grace_period.value.lower() == 'true' if enable_grace_period else True
+        settings = settings_registry.get()
+        grace_period_days = settings.grace_period_days
+        grace_enabled = settings.enable_grace_period
         
         in_grace_period = False
         grace_days_remaining = 0
@@ -460,55 +459,15 @@ def check_renewal_status(current_user):
 @token_required
 @role_required(['Technical Committee', 'Higher Committee'])
 def send_renewal_reminders(current_user):
-    try:
-        now = datetime.utcnow()
-        reminders_sent = 0
-        
-        subscriptions = Subscription.query.filter_by(status='active').all()
-        
-        for subscription in subscriptions:
-            days_remaining = (subscription.end_date - now).days
-            
-            if days_remaining == 14 and not subscription.notified_14d:
-                notification = Notification(
-                    user_id=subscription.user_id,
-                    message=f'تنبيه: اشتراكك سينتهي بعد 14 يوماً في {subscription.end_date.strftime("%Y-%m-%d")}. يرجى التجديد قريباً.',
-                    type='renewal_reminder_14d'
-                )
-                subscription.notified_14d = True
-                db.session.add(notification)
-                reminders_sent += 1
-            
-            elif days_remaining == 7 and not subscription.notified_7d:
-                notification = Notification(
-                    user_id=subscription.user_id,
-                    message=f'تنبيه مهم: اشتراكك سينتهي بعد 7 أيام في {subscription.end_date.strftime("%Y-%m-%d")}. يرجى التجديد.',
-                    type='renewal_reminder_7d'
-                )
-                subscription.notified_7d = True
-                db.session.add(notification)
-                reminders_sent += 1
-            
-            elif days_remaining == 3 and not subscription.notified_3d:
-                notification = Notification(
-                    user_id=subscription.user_id,
-                    message=f'تنبيه عاجل: اشتراكك سينتهي بعد 3 أيام في {subscription.end_date.strftime("%Y-%m-%d")}. يرجى التجديد فوراً.',
-                    type='renewal_reminder_3d'
-                )
-                subscription.notified_3d = True
-                db.session.add(notification)
-                reminders_sent += 1
-        
-        db.session.commit()
-        
-        return jsonify({
-            'message': f'تم إرسال {reminders_sent} تذكير تجديد',
-            'reminders_sent': reminders_sent
-        }), 200
-        
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({'message': f'خطأ في إرسال التذكيرات: {str(e)}'}), 500
+    result = scheduler.send_renewal_reminders()
+    if not result.get('success'):
+        return jsonify({'message': f"خطأ في إرسال التذكيرات: {result.get('error')}"}), 500
+
+    return jsonify({
+        'message': f"تم إرسال {result['reminders_sent']} تذكير تجديد",
+        'reminders_sent': result['reminders_sent'],
+        'metrics': result['metrics']
+    }), 200
 
 @subscription_bp.route('/admin/init-settings', methods=['POST'])
 @token_required
@@ -1,11 +1,16 @@
 from flask import Blueprint, request, current_app
 from src.database.db import db
-from src.models.complaint import User, Subscription, Payment, PaymentMethod, Settings, Notification
+from src.models.complaint import Subscription, Payment, PaymentMethod, Notification
 from src.routes.auth import token_required, role_required, rate_limit
 from src.utils.security import validate_and_save_file, validate_payment_data
 from src.utils.response import success_response, error_response
 from src.services.subscription_service import create_or_extend_subscription
+from src.core.settings_registry import get_settings, settings_registry
+from src.core.audit import AuditLogger
 from src.services.scheduler import run_daily_tasks, send_renewal_reminders, check_and_expire_subscriptions
+from src.services.receipts import add_receipt_reference, find_duplicate_receipts
+from src.services.receipt_derivatives import schedule_receipt_derivatives
+from src.services.notifications import notify_roles, ADMIN_ROLES
 from datetime import datetime
 import os
 
@@ -87,21 +92,16 @@ def create_payment(current_user):
         
         db.session.add(new_payment)
         db.session.flush()
+        add_receipt_reference(new_payment, result)
         
-        admin_roles = ['Technical Committee', 'Higher Committee']
-        admin_users = User.query.join(User.role).filter(
-            User.role.has(role_name=admin_roles[0]) | User.role.has(role_name=admin_roles[1])
-        ).all()
-        
-        for admin in admin_users:
-            notification = Notification(
-                user_id=admin.user_id,
-                message=f'طلب دفع جديد من {current_user.full_name} بمبلغ {data["amount"]} ريال',
-                type='payment_submission'
-            )
-            db.session.add(notification)
+        notify_roles(
+            ADMIN_ROLES,
+            f'طلب دفع جديد من {current_user.full_name} بمبلغ {data["amount"]} ريال',
+            'payment_submission'
+        )
         
         db.session.commit()
+        schedule_receipt_derivatives(UPLOAD_FOLDER, filename)
         
         return success_response(
             data={'payment': new_payment.to_dict()},
@@ -132,8 +132,12 @@ def get_all_payments(current_user):
     try:
         status = request.args.get('status', 'pending')
         payments = Payment.query.filter_by(status=status).order_by(Payment.created_at.desc()).all()
+        duplicates = find_duplicate_receipts(payments)
         
-        return success_response(data={'payments': [payment.to_dict() for payment in payments]})
+        return success_response(data={'payments': [
+            {**payment.to_dict(), 'duplicate_receipts': duplicates.get(payment.payment_id, [])}
+            for payment in payments
+        ]})
     except Exception as e:
         return error_response(error=str(e), message='خطأ في جلب المدفوعات', status_code=500)
 
@@ -166,6 +170,8 @@ def approve_payment(current_user, payment_id):
             payment.review_notes = notes
             db.session.commit()
         
+        AuditLogger.log_payment_approval(payment_id, current_user.user_id, 'approved', request.remote_addr, user_id=payment.user_id)
+        
         return success_response(
             data={'subscription': result['subscription']},
             message='تم اعتماد الدفع بنجاح'
@@ -206,6 +212,7 @@ def reject_payment(current_user, payment_id):
         
         db.session.add(notification)
         db.session.commit()
+        AuditLogger.log_payment_approval(payment_id, current_user.user_id, 'rejected', request.remote_addr, user_id=payment.user_id)
         
         return success_response(message='تم رفض الدفع')
         
@@ -221,16 +228,14 @@ def subscription_settings(current_user):
     
     if request.method == 'GET':
         try:
-            price = Settings.query.filter_by(key='annual_subscription_price').first()
-            currency = Settings.query.filter_by(key='currency').first()
-            grace_period = Settings.query.filter_by(key='grace_period_days').first()
-            grace_enabled = Settings.query.filter_by(key='enable_grace_period').first()
+            settings = get_settings()
             
             data = {
-                'annual_subscription_price': float(price.value) if price else 50000,
-                'currency': currency.value if currency else 'YER',
-                'grace_period_days': int(grace_period.value) if grace_period else 7,
-                'enable_grace_period': grace_enabled.value.lower() == 'true' if grace_enabled else True
+                'annual_subscription_price': settings.annual_subscription_price,
+                'currency': settings.currency,
+                'grace_period_days': settings.grace_period_days,
+                'enable_grace_period': settings.enable_grace_period,
+                'version': settings.version
             }
             
             return success_response(data=data)
@@ -249,17 +254,9 @@ def subscription_settings(current_user):
                 'enable_grace_period': 'enable_grace_period'
             }
             
-            for key, db_key in settings_map.items():
-                if key in data:
-                    setting = Settings.query.filter_by(key=db_key).first()
-                    if setting:
-                        setting.value = str(data[key])
-                        setting.updated_at = datetime.utcnow()
-                    else:
-                        new_setting = Settings(key=db_key, value=str(data[key]))
-                        db.session.add(new_setting)
-            
-            db.session.commit()
+            updates = {db_key: data[key] for key, db_key in settings_map.items() if key in data}
+            if updates:
+                settings_registry.update(updates)
             
             return success_response(message='تم تحديث إعدادات الاشتراك بنجاح')
             
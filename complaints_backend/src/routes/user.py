@@ -1,12 +1,21 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from src.database.db import db
 from src.models.complaint import User, Role, AuditLog, Notification
 from werkzeug.security import generate_password_hash
-from src.routes.auth import token_required, role_required
+from src.routes.auth import token_required, role_required, accepts_stream_token, issue_stream_token, STREAM_TOKEN_SECONDS
+from src.core.principal_cache import invalidate_principal, get_principal_cache_stats
+from src.core.audit import AuditLogger
+from src.core.perf import perf_aggregator
+from src.services.notification_stream import stream_notifications
+from src.services.notification_counters import get_unread_count, mark_read
+from src.utils.pagination import get_pagination_args, keyset_paginate, decode_cursor
 from datetime import datetime
+import os
 
 user_bp = Blueprint('user', __name__)
 
+MAX_BULK_READ_IDS = 500
+
 @user_bp.route('/users', methods=['GET'])
 @token_required
 @role_required(['Technical Committee', 'Higher Committee'])
@@ -197,18 +206,18 @@ def update_user_role(current_user, user_id):
         user.role_id = new_role.role_id
         user.updated_at = datetime.utcnow()
         
-        # Create audit log entry
-        audit_log = AuditLog(
-            action_type='role_change',
-            performed_by_id=current_user.user_id,
-            affected_user_id=user.user_id,
-            old_value=old_role_name,
-            new_value=new_role.role_name,
-            description=f'تم تغيير دور المستخدم {user.full_name} من "{old_role_name}" إلى "{new_role.role_name}"',
-            ip_address=request.remote_addr
-        )
-        db.session.add(audit_log)
         db.session.commit()
+        invalidate_principal(user.user_id)
+        
+        # Audit entry is written synchronously on its own connection
+        AuditLogger.log_user_role_change(
+            user.user_id,
+            current_user.user_id,
+            old_role_name,
+            new_role.role_name,
+            ip_address=request.remote_addr,
+            description=f'تم تغيير دور المستخدم {user.full_name} من "{old_role_name}" إلى "{new_role.role_name}"'
+        )
         
         return jsonify({
             'message': f'تم تحديث دور المستخدم من "{old_role_name}" إلى "{new_role.role_name}" بنجاح',
@@ -235,23 +244,23 @@ def toggle_user_status(current_user, user_id):
             return jsonify({'message': 'لا يمكنك تعديل حالة حسابك الخاص'}), 403
         
         # Toggle the is_active status
+        was_active = user.is_active
         old_status = 'نشط' if user.is_active else 'غير نشط'
         user.is_active = not user.is_active
         new_status = 'نشط' if user.is_active else 'غير نشط'
         user.updated_at = datetime.utcnow()
-        
-        # Create audit log
-        audit_log = AuditLog(
-            action_type='status_change',
-            performed_by_id=current_user.user_id,
-            affected_user_id=user.user_id,
-            old_value=old_status,
-            new_value=new_status,
-            description=f'تم تغيير حالة حساب {user.full_name} من "{old_status}" إلى "{new_status}"',
-            ip_address=request.remote_addr
-        )
-        db.session.add(audit_log)
         db.session.commit()
+        invalidate_principal(user.user_id)
+        
+        # Audit entry is written synchronously on its own connection
+        AuditLogger.log_user_status_change(
+            user.user_id,
+            current_user.user_id,
+            was_active,
+            user.is_active,
+            ip_address=request.remote_addr,
+            description=f'تم تغيير حالة حساب {user.full_name} من "{old_status}" إلى "{new_status}"'
+        )
         
         status = 'activated' if user.is_active else 'deactivated'
         return jsonify({
@@ -263,6 +272,40 @@ def toggle_user_status(current_user, user_id):
         db.session.rollback()
         return jsonify({'message': f'خطأ في تحديث حالة المستخدم: {str(e)}'}), 500
 
+@user_bp.route('/admin/cache/principals', methods=['GET'])
+@token_required
+@role_required(['Higher Committee'])
+def get_principal_cache_statistics(current_user):
+    """Higher Committee ONLY endpoint to inspect the per-process principal cache counters"""
+    return jsonify({
+        'pid': os.getpid(),
+        'principal_cache': get_principal_cache_stats()
+    }), 200
+
+@user_bp.route('/admin/audit-logs/metrics', methods=['GET'])
+@token_required
+@role_required(['Higher Committee'])
+def get_audit_queue_metrics(current_user):
+    """Higher Committee ONLY endpoint to inspect the per-process audit write-behind queue"""
+    return jsonify({
+        'pid': os.getpid(),
+        'audit_queue': AuditLogger.stats()
+    }), 200
+
+@user_bp.route('/admin/perf', methods=['GET'])
+@token_required
+@role_required(['Higher Committee'])
+def get_request_perf(current_user):
+    """Higher Committee ONLY endpoint to inspect per-endpoint latency and SQL aggregates of this worker"""
+    endpoints = perf_aggregator.snapshot()
+    if request.args.get('reset', 'false').lower() == 'true':
+        perf_aggregator.reset()
+    return jsonify({
+        'pid': os.getpid(),
+        'window': perf_aggregator.window,
+        'endpoints': endpoints
+    }), 200
+
 # AUDIT LOG ENDPOINTS
 @user_bp.route('/admin/audit-logs', methods=['GET'])
 @token_required
@@ -270,8 +313,9 @@ def toggle_user_status(current_user, user_id):
 def get_audit_logs(current_user):
     """Higher Committee ONLY endpoint to view audit logs"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 50, type=int)
+        pagination_args = get_pagination_args(request, default_per_page=50)
+        page = pagination_args['page']
+        per_page = pagination_args['per_page']
         action_type = request.args.get('action_type')
         affected_user_id = request.args.get('affected_user_id')
         
@@ -285,9 +329,30 @@ def get_audit_logs(current_user):
         if affected_user_id:
             query = query.filter_by(affected_user_id=affected_user_id)
         
+        # Cursor mode: seek on (created_at, log_id), newest first
+        if pagination_args['use_cursor']:
+            try:
+                items, next_cursor, has_more = keyset_paginate(
+                    query, AuditLog.created_at, AuditLog.log_id,
+                    cursor=pagination_args['cursor'], per_page=per_page
+                )
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
+            
+            response = {
+                'logs': [log.to_dict() for log in items],
+                'next_cursor': next_cursor,
+                'has_more': has_more,
+                'per_page': per_page
+            }
+            if pagination_args['include_total']:
+                response['total'] = query.count()
+            return jsonify(response), 200
+        
         # Paginate results (newest first)
         pagination = query.order_by(AuditLog.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+            page=page, per_page=per_page, error_out=False,
+            count=pagination_args['include_total']
         )
         
         return jsonify({
@@ -305,8 +370,9 @@ def get_audit_logs(current_user):
 def get_notifications(current_user):
     """Get current user's notifications"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        pagination_args = get_pagination_args(request, default_per_page=20)
+        page = pagination_args['page']
+        per_page = pagination_args['per_page']
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
         
         query = Notification.query.filter_by(user_id=current_user.user_id)
@@ -314,15 +380,34 @@ def get_notifications(current_user):
         if unread_only:
             query = query.filter_by(is_read=False)
         
+        unread_count = get_unread_count(current_user.user_id)
+        
+        # Cursor mode: seek on (created_at, notification_id), newest first
+        if pagination_args['use_cursor']:
+            try:
+                items, next_cursor, has_more = keyset_paginate(
+                    query, Notification.created_at, Notification.notification_id,
+                    cursor=pagination_args['cursor'], per_page=per_page
+                )
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
+            
+            response = {
+                'notifications': [notif.to_dict() for notif in items],
+                'next_cursor': next_cursor,
+                'has_more': has_more,
+                'per_page': per_page,
+                'unread_count': unread_count
+            }
+            if pagination_args['include_total']:
+                response['total'] = query.count()
+            return jsonify(response), 200
+        
         pagination = query.order_by(Notification.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+            page=page, per_page=per_page, error_out=False,
+            count=pagination_args['include_total']
         )
         
-        unread_count = Notification.query.filter_by(
-            user_id=current_user.user_id,
-            is_read=False
-        ).count()
-        
         return jsonify({
             'notifications': [notif.to_dict() for notif in pagination.items],
             'total': pagination.total,
@@ -334,6 +419,37 @@ def get_notifications(current_user):
     except Exception as e:
         return jsonify({'message': f'خطأ في جلب الإشعارات: {str(e)}'}), 500
 
+@user_bp.route('/notifications/stream-token', methods=['POST'])
+@token_required
+def create_stream_token(current_user):
+    """
+    Short-lived token for the notification stream.
+    The browser's EventSource cannot send the Authorization header, so the client calls this
+    first and opens /api/notifications/stream?token=<token>. The token is checked when the
+    stream opens; when the stream errors out (e.g. reconnecting after SSE_MAX_SECONDS with an
+    expired token), close it, request a new token and reopen with ?last_event_id=.
+    """
+    return jsonify({
+        'token': issue_stream_token(current_user.user_id),
+        'expires_in': STREAM_TOKEN_SECONDS
+    }), 200
+
+@user_bp.route('/notifications/stream', methods=['GET'])
+@token_required
+@accepts_stream_token
+def stream_user_notifications(current_user):
+    """
+    Server-Sent Events stream of new notifications and unread-count changes.
+    Authenticated by the Authorization header or ?token= from /api/notifications/stream-token.
+    Resumes after the notification named by Last-Event-ID (or ?last_event_id=).
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    events = stream_notifications(current_user.user_id, last_event_id=last_event_id)
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no'
+    })
+
 @user_bp.route('/notifications/<notification_id>/read', methods=['PUT'])
 @token_required
 def mark_notification_read(current_user, notification_id):
@@ -359,16 +475,50 @@ def mark_notification_read(current_user, notification_id):
         db.session.rollback()
         return jsonify({'message': f'خطأ في تحديث الإشعار: {str(e)}'}), 500
 
+@user_bp.route('/notifications/read', methods=['PUT'])
+@token_required
+def mark_notifications_read(current_user):
+    """
+    Mark several notifications as read in one statement:
+    {"ids": [...]} and/or {"before": cursor} (everything at or older than a cursor,
+    e.g. an SSE event id or next_cursor).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids')
+        before = data.get('before')
+        
+        if ids is None and not before:
+            return jsonify({'message': 'يجب تحديد ids أو before'}), 400
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, str) for i in ids)):
+            return jsonify({'message': 'ids يجب أن تكون قائمة معرفات'}), 400
+        if ids is not None and len(ids) > MAX_BULK_READ_IDS:
+            return jsonify({'message': f'الحد الأقصى {MAX_BULK_READ_IDS} معرف في الطلب الواحد'}), 400
+        
+        try:
+            cursor = decode_cursor(before) if before else None
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        updated = mark_read(current_user.user_id, ids=ids, before=cursor)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'تم تحديد الإشعارات كمقروءة',
+            'updated': updated,
+            'unread_count': get_unread_count(current_user.user_id)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'خطأ في تحديث الإشعارات: {str(e)}'}), 500
+
 @user_bp.route('/notifications/mark-all-read', methods=['PUT'])
 @token_required
 def mark_all_notifications_read(current_user):
     """Mark all notifications as read"""
     try:
-        Notification.query.filter_by(
-            user_id=current_user.user_id,
-            is_read=False
-        ).update({'is_read': True})
-        
+        mark_read(current_user.user_id)
         db.session.commit()
         
         return jsonify({'message': 'تم تحديد جميع الإشعارات كمقروءة'}), 200
@@ -0,0 +1,207 @@
+"""
+تصدير الشكاوى كتدفق CSV أو XLSX بذاكرة ثابتة
+
+- الصفوف تُقرأ بأعمدة مسطحة (مع أسماء التصنيف والحالة والمستخدمين عبر JOIN) على دفعات
+  yield_per، وهو ما يستخدم مؤشراً من جهة الخادم في PostgreSQL
+- كل دفعة تُكتب وتُرسل فوراً فيبدأ التنزيل قبل انتهاء الاستعلام
+- ملف XLSX يُكتب بمكتبة zipfile مباشرة إلى التدفق (بدون ملف مؤقت أو مكتبة خارجية)
+"""
+import csv
+import io
+import os
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+from sqlalchemy.orm import aliased
+from src.models.complaint import Complaint, ComplaintCategory, ComplaintStatus, User
+from src.core.logger import get_logger
+
+logger = get_logger('complaint_export')
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+CSV_CHUNK_BYTES = 64 * 1024
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+EXPORT_HEADERS = [
+    'رقم الشكوى', 'العنوان', 'الوصف', 'التصنيف', 'الحالة', 'الأولوية', 'التاجر',
+    'عضو اللجنة المكلف', 'تاريخ التقديم', 'آخر تحديث', 'تاريخ الإغلاق', 'تفاصيل الحل'
+]
+
+# Excel ينفذ الخلايا التي تبدأ بهذه الرموز كصيغ (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def export_rows(query):
+    """صفوف التصدير كـ tuples بنفس ترتيب EXPORT_HEADERS"""
+    trader = aliased(User)
+    committee = aliased(User)
+    rows = (
+        query.order_by(None)
+        .with_entities(
+            Complaint.complaint_id, Complaint.title, Complaint.description,
+            ComplaintCategory.category_name, ComplaintStatus.status_name, Complaint.priority,
+            trader.full_name, committee.full_name,
+            Complaint.submitted_at, Complaint.last_updated_at, Complaint.closed_at,
+            Complaint.resolution_details
+        )
+        .outerjoin(ComplaintCategory, ComplaintCategory.category_id == Complaint.category_id)
+        .outerjoin(ComplaintStatus, ComplaintStatus.status_id == Complaint.status_id)
+        .outerjoin(trader, trader.user_id == Complaint.trader_id)
+        .outerjoin(committee, committee.user_id == Complaint.assigned_to_committee_id)
+        .order_by(Complaint.submitted_at.desc(), Complaint.complaint_id.desc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for row in rows:
+        yield tuple(row)
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+def _csv_cell(value):
+    text = _text(value)
+    if text.startswith(FORMULA_PREFIXES):
+        return "'" + text
+    return text
+
+
+def _take(buffer):
+    data = buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def iter_csv(rows, headers=EXPORT_HEADERS):
+    """CSV بترميز UTF-8 مع BOM حتى يعرض Excel النص العربي بشكل صحيح"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    yield _take(buffer)
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+        if buffer.tell() >= CSV_CHUNK_BYTES:
+            yield _take(buffer)
+    yield _take(buffer)
+
+
+class _StreamSink:
+    """ملف للكتابة فقط يجمع ما يكتبه zipfile ليُرسل في التدفق"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+XLSX_STATIC_PARTS = (
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+     'Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Complaints" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+     'Target="worksheets/sheet1.xml"/>'
+     '</Relationships>'),
+)
+
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0" rightToLeft="1"/></sheetViews>'
+    '<sheetData>'
+)
+SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _xlsx_row(index, values):
+    cells = ''.join(
+        f'<c t="inlineStr"><is><t xml:space="preserve">{escape(INVALID_XML_CHARS.sub("", _text(value)))}</t></is></c>'
+        for value in values
+    )
+    return f'<row r="{index}">{cells}</row>'
+
+
+def iter_xlsx(rows, headers=EXPORT_HEADERS, flush_rows=500):
+    """ملف XLSX بورقة واحدة تُرسل أجزاؤه المضغوطة كل flush_rows صف"""
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS:
+            archive.writestr(name, content)
+        yield sink.drain()
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((SHEET_HEAD + _xlsx_row(1, headers)).encode('utf-8'))
+            pending = []
+            for index, row in enumerate(rows, start=2):
+                pending.append(_xlsx_row(index, row))
+                if len(pending) >= flush_rows:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending.clear()
+                    data = sink.drain()
+                    if data:
+                        yield data
+            sheet.write((''.join(pending) + SHEET_TAIL).encode('utf-8'))
+    yield sink.drain()
+
+
+def stream_complaints(query, export_format):
+    """تدفق بايتات ملف التصدير؛ الأخطاء بعد بدء الإرسال تُسجل وينقطع الملف"""
+    writer = iter_xlsx if export_format == 'xlsx' else iter_csv
+    exported = 0
+
+    def counted():
+        nonlocal exported
+        for row in export_rows(query):
+            exported += 1
+            yield row
+
+    try:
+        yield from writer(counted())
+    except Exception:
+        logger.exception('Complaint export aborted after %s rows', exported)
+        raise
+    logger.info('Complaint export finished: %s rows as %s', exported, export_format)
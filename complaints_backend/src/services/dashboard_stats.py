@@ -0,0 +1,277 @@
+"""
+عدادات لوحة المعلومات (Read Model) لـ /api/dashboard/stats
+
+- complaint_stats_counters: عدد الشكاوى الكلي وحسب الحالة والتصنيف والأولوية
+- complaint_daily_counts: عدد الشكاوى المقدمة في كل يوم
+- تُحدّث العدادات داخل نفس المعاملة عند إنشاء الشكوى أو تغيير حالتها أو
+  تصنيفها أو أولويتها أو حذفها (حدث after_flush على الجلسة)، فإن فشل الـ commit
+  تراجعت العدادات معه
+- reconcile_dashboard_stats يعيد بناء العدادات من الصفر ويعيد الفروقات المكتشفة
+  (التحديثات الجماعية عبر Query.update لا تمر بالـ ORM وتُصحَّح بالمطابقة)؛ التصحيح
+  يعيد العد والعدادات مقفلة ويضيف الفرق نسبياً فلا يمحو تغييرات الحركة الجارية
+"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+from src.database.db import db
+from src.models.complaint import (
+    Complaint, ComplaintCategory, ComplaintStatus,
+    ComplaintStatsCounter, ComplaintDailyCount
+)
+
+logger = logging.getLogger('complaints_system.dashboard_stats')
+
+RECENT_DAYS = 30
+
+_DIMENSIONS = {
+    'status': 'status_id',
+    'category': 'category_id',
+    'priority': 'priority',
+}
+
+
+def _buckets(values):
+    """مفاتيح العدادات التي تنتمي إليها شكوى بالقيم المعطاة"""
+    keys = [('total', 'all')]
+    for dimension, attribute in _DIMENSIONS.items():
+        value = values.get(attribute)
+        if value is not None:
+            keys.append((dimension, str(value)))
+    return keys
+
+
+def _day(value):
+    return value.date() if value else None
+
+
+def _collect_deltas(session):
+    counters = Counter()
+    days = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, Complaint):
+            for key in _buckets({attr: getattr(obj, attr) for attr in _DIMENSIONS.values()}):
+                counters[key] += 1
+            days[_day(obj.submitted_at or datetime.utcnow())] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Complaint):
+            for key in _buckets({attr: getattr(obj, attr) for attr in _DIMENSIONS.values()}):
+                counters[key] -= 1
+            if obj.submitted_at:
+                days[_day(obj.submitted_at)] -= 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, Complaint) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        for dimension, attribute in _DIMENSIONS.items():
+            history = state.attrs[attribute].history
+            if not history.has_changes():
+                continue
+            if history.deleted and history.deleted[0] is not None:
+                counters[(dimension, str(history.deleted[0]))] -= 1
+            if history.added and history.added[0] is not None:
+                counters[(dimension, str(history.added[0]))] += 1
+
+    return (
+        {key: delta for key, delta in counters.items() if delta},
+        {key: delta for key, delta in days.items() if key and delta}
+    )
+
+
+def _upsert_insert(connection):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+def _bump(connection, table, keys, delta):
+    """إضافة delta إلى عداد واحد مع إنشائه إن لم يكن موجوداً"""
+    insert = _upsert_insert(connection)
+    if insert is not None:
+        stmt = insert(table).values(**keys, count=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={'count': table.c.count + stmt.excluded.count}
+        )
+        connection.execute(stmt)
+        return
+
+    condition = [table.c[column] == value for column, value in keys.items()]
+    result = connection.execute(update(table).where(*condition).values(count=table.c.count + delta))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(**keys, count=delta))
+
+
+def apply_deltas(connection, counters, days):
+    counters_table = ComplaintStatsCounter.__table__
+    days_table = ComplaintDailyCount.__table__
+    for (dimension, bucket), delta in sorted(counters.items()):
+        _bump(connection, counters_table, {'dimension': dimension, 'bucket': bucket}, delta)
+    for day, delta in sorted(days.items()):
+        _bump(connection, days_table, {'day': day}, delta)
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_counters(session, flush_context):
+    counters, days = _collect_deltas(session)
+    if counters or days:
+        apply_deltas(session.connection(), counters, days)
+
+
+def _compute_from_scratch(session):
+    """حساب العدادات من جدول الشكاوى مباشرة (المرجع الصحيح)"""
+    counters = Counter()
+    total = session.query(db.func.count(Complaint.complaint_id)).scalar() or 0
+    if total:
+        counters[('total', 'all')] = total
+
+    for dimension, attribute in _DIMENSIONS.items():
+        column = getattr(Complaint, attribute)
+        rows = session.query(column, db.func.count(Complaint.complaint_id)).group_by(column).all()
+        for value, count in rows:
+            if value is not None and count:
+                counters[(dimension, str(value))] = count
+
+    day_column = db.func.date(Complaint.submitted_at)
+    days = Counter()
+    rows = session.query(day_column, db.func.count(Complaint.complaint_id)) \
+        .filter(Complaint.submitted_at.isnot(None)) \
+        .group_by(day_column).all()
+    for day, count in rows:
+        if isinstance(day, str):
+            day = datetime.strptime(day, '%Y-%m-%d').date()
+        days[day] = count
+    return counters, days
+
+
+def _stored_counters(session, lock=False):
+    """
+    القيم المخزنة؛ lock=True يقفل صفوف العدادات حتى نهاية المعاملة بترتيب apply_deltas نفسه
+    (SQLite لا يعرف FOR UPDATE فتأخذ أول كتابة قفل القاعدة كما تفعل BEGIN IMMEDIATE)
+    """
+    counters_table = ComplaintStatsCounter.__table__
+    days_table = ComplaintDailyCount.__table__
+    if lock and session.get_bind().dialect.name == 'sqlite':
+        session.execute(update(counters_table).values(count=counters_table.c.count))
+
+    counters_query = select(counters_table.c.dimension, counters_table.c.bucket, counters_table.c.count) \
+        .order_by(counters_table.c.dimension, counters_table.c.bucket)
+    days_query = select(days_table.c.day, days_table.c.count).order_by(days_table.c.day)
+    if lock:
+        counters_query = counters_query.with_for_update()
+        days_query = days_query.with_for_update()
+    counters = {(dimension, bucket): count for dimension, bucket, count in session.execute(counters_query)}
+    days = {day: count for day, count in session.execute(days_query)}
+    return counters, days
+
+
+def _drift(expected_counters, stored_counters, expected_days, stored_days):
+    drift = []
+    for key in sorted(set(expected_counters) | set(stored_counters)):
+        expected = expected_counters.get(key, 0)
+        stored = stored_counters.get(key, 0)
+        if expected != stored:
+            drift.append({'dimension': key[0], 'bucket': key[1], 'expected': expected, 'stored': stored})
+    for day in sorted(set(expected_days) | set(stored_days)):
+        expected = expected_days.get(day, 0)
+        stored = stored_days.get(day, 0)
+        if expected != stored:
+            drift.append({'dimension': 'day', 'bucket': day.isoformat(), 'expected': expected, 'stored': stored})
+    return drift
+
+
+def reconcile_dashboard_stats(apply=True):
+    """
+    إعادة بناء العدادات من الصفر ومقارنتها بالقيم المخزنة
+
+    التصحيح في معاملة واحدة: قفل العدادات ثم إعادة العد ثم إضافة (الفعلي - المخزن)؛
+    من يغيّر الشكاوى يحدّث هذه الصفوف في معاملته، فإما يرى العد ما التزمه أو يضيف فرقه بعد التصحيح
+
+    Returns:
+        dict: {'success', 'drift': [...], 'counters', 'days'}
+    """
+    try:
+        expected_counters, expected_days = _compute_from_scratch(db.session)
+        stored_counters, stored_days = _stored_counters(db.session)
+        drift = _drift(expected_counters, stored_counters, expected_days, stored_days)
+        db.session.commit()
+
+        if apply and drift:
+            stored_counters, stored_days = _stored_counters(db.session, lock=True)
+            expected_counters, expected_days = _compute_from_scratch(db.session)
+            drift = _drift(expected_counters, stored_counters, expected_days, stored_days)
+            apply_deltas(
+                db.session.connection(),
+                {key: expected_counters.get(key, 0) - stored_counters.get(key, 0)
+                 for key in set(expected_counters) | set(stored_counters)
+                 if expected_counters.get(key, 0) != stored_counters.get(key, 0)},
+                {day: expected_days.get(day, 0) - stored_days.get(day, 0)
+                 for day in set(expected_days) | set(stored_days)
+                 if expected_days.get(day, 0) != stored_days.get(day, 0)}
+            )
+            db.session.commit()
+            if drift:
+                logger.warning(f'تم تصحيح {len(drift)} عداد في إحصائيات لوحة المعلومات')
+
+        return {
+            'success': True,
+            'drift': drift,
+            'counters': len(expected_counters),
+            'days': len(expected_days)
+        }
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'خطأ في مطابقة إحصائيات لوحة المعلومات: {str(e)}')
+        return {'success': False, 'error': str(e)}
+
+
+def ensure_dashboard_stats():
+    """تهيئة العدادات عند أول تشغيل إن كانت فارغة وتوجد شكاوى"""
+    if ComplaintStatsCounter.query.first() is None and Complaint.query.first() is not None:
+        return reconcile_dashboard_stats()
+    return None
+
+
+def get_dashboard_stats_snapshot(now=None):
+    """قراءة الإحصائيات من العدادات (لا يعتمد على حجم جدول الشكاوى)"""
+    now = now or datetime.utcnow()
+    counters = ComplaintStatsCounter.query.filter(ComplaintStatsCounter.count > 0).all()
+
+    # آخر RECENT_DAYS يوماً تقويمياً بما فيها اليوم الحالي
+    since = (now - timedelta(days=RECENT_DAYS)).date()
+    recent = db.session.query(db.func.coalesce(db.func.sum(ComplaintDailyCount.count), 0)) \
+        .filter(ComplaintDailyCount.day > since).scalar()
+
+    status_names = dict(db.session.query(ComplaintStatus.status_id, ComplaintStatus.status_name).all())
+    category_names = dict(db.session.query(ComplaintCategory.category_id, ComplaintCategory.category_name).all())
+
+    total = 0
+    status_distribution = []
+    category_distribution = []
+    priority_distribution = []
+    for counter in sorted(counters, key=lambda c: (c.dimension, c.bucket)):
+        if counter.dimension == 'total':
+            total = counter.count
+        elif counter.dimension == 'status':
+            status_distribution.append({'status': status_names.get(int(counter.bucket)), 'count': counter.count})
+        elif counter.dimension == 'category':
+            category_distribution.append({'category': category_names.get(int(counter.bucket)), 'count': counter.count})
+        elif counter.dimension == 'priority':
+            priority_distribution.append({'priority': counter.bucket, 'count': counter.count})
+
+    return {
+        'total_complaints': total,
+        'recent_complaints': int(recent or 0),
+        'status_distribution': status_distribution,
+        'category_distribution': category_distribution,
+        'priority_distribution': priority_distribution
+    }
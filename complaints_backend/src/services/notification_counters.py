@@ -0,0 +1,190 @@
+"""
+عدادات الإشعارات غير المقروءة لكل مستخدم (notification_unread_counters)
+
+- تُحدّث داخل نفس المعاملة التي تضيف الإشعار أو تغيّر حالة قراءته، فإن فشل الـ commit
+  تراجع العداد معه؛ قراءة العدد بحث واحد بالمفتاح الأساسي بدل COUNT على الإشعارات
+- إضافات الـ ORM وحذفه وتغيير is_read تُحسب في after_flush، أما جمل Core (التوزيع على
+  الأدوار، INSERT ... SELECT للتذكيرات، القراءة الجماعية) فتستدعي add_unread/mark_read
+- reconcile_unread_counters يعيد الحساب من جدول الإشعارات ويصحح أي فرق؛ التصحيح يعيد عدّ
+  المستخدم تحت قفل صف عداده فلا يمحو تغييرات الحركة الجارية
+"""
+import logging
+from collections import Counter
+from sqlalchemy import and_, event, false, func, inspect, or_, select, update
+from sqlalchemy.orm import Session
+from src.database.db import db
+from src.models.complaint import Notification, NotificationUnreadCounter
+from src.services.notification_stream import UNREAD, mark_notifications_changed
+
+logger = logging.getLogger('complaints_system.notification_counters')
+
+
+def _upsert_insert(connection):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+def _write(connection, user_id, value, relative):
+    table = NotificationUnreadCounter.__table__
+    insert = _upsert_insert(connection)
+    if insert is not None:
+        stmt = insert(table).values(user_id=user_id, unread_count=value)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id'],
+            set_={'unread_count': table.c.unread_count + stmt.excluded.unread_count if relative
+                  else stmt.excluded.unread_count}
+        )
+        connection.execute(stmt)
+        return
+
+    new_value = table.c.unread_count + value if relative else value
+    result = connection.execute(update(table).where(table.c.user_id == user_id).values(unread_count=new_value))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(user_id=user_id, unread_count=value))
+
+
+def apply_unread_deltas(connection, deltas):
+    """deltas: user_id -> تغيّر العدد (بترتيب ثابت لتفادي تعارض الأقفال بين المعاملات)"""
+    for user_id, delta in sorted(deltas.items()):
+        if delta:
+            _write(connection, user_id, delta, relative=True)
+
+
+def add_unread(connection, user_ids):
+    """زيادة العداد لكل إشعار غير مقروء أُضيف بجملة Core (user_id مكرر لكل صف)"""
+    apply_unread_deltas(connection, Counter(user_ids))
+
+
+def get_unread_count(user_id):
+    value = db.session.query(NotificationUnreadCounter.unread_count).filter_by(user_id=user_id).scalar()
+    return max(value or 0, 0)
+
+
+def mark_read(user_id, ids=None, before=None):
+    """
+    تحديد إشعارات المستخدم كمقروءة بجملة UPDATE واحدة وإنقاص العداد بعدد الصفوف المتأثرة
+
+    Args:
+        ids: قائمة معرفات محددة
+        before: مؤشر (created_at, notification_id)؛ كل ما في موضعه أو أقدم منه
+    Returns:
+        int: عدد الإشعارات التي تغيّرت (يجب أن يستدعي المستدعي commit)
+    """
+    table = Notification.__table__
+    conditions = [table.c.user_id == user_id, table.c.is_read == false()]
+    if ids is not None:
+        conditions.append(table.c.notification_id.in_(ids))
+    if before is not None:
+        sort_value, key_value = before
+        conditions.append(or_(
+            table.c.created_at < sort_value,
+            and_(table.c.created_at == sort_value, table.c.notification_id <= key_value)
+        ))
+
+    result = db.session.execute(update(table).where(*conditions).values(is_read=True))
+    if result.rowcount:
+        apply_unread_deltas(db.session.connection(), {user_id: -result.rowcount})
+        mark_notifications_changed(db.session, [user_id], UNREAD)
+    return result.rowcount
+
+
+def _collect_deltas(session):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] -= 1
+    for obj in session.dirty:
+        if not isinstance(obj, Notification) or obj in session.deleted:
+            continue
+        history = inspect(obj).attrs.is_read.history
+        if history.has_changes():
+            was_read = bool(history.deleted[0]) if history.deleted else False
+            if was_read != bool(obj.is_read):
+                deltas[obj.user_id] += 1 if was_read else -1
+    return {user_id: delta for user_id, delta in deltas.items() if delta}
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_unread_counters(session, flush_context):
+    deltas = _collect_deltas(session)
+    if deltas:
+        apply_unread_deltas(session.connection(), deltas)
+
+
+def _reconcile_user(connection, user_id):
+    """
+    إعادة عدّ إشعارات مستخدم وكتابة الناتج وصف عداده مقفل (FOR UPDATE)
+
+    كل معاملة تغيّر إشعارات المستخدم تكتب هذا الصف أيضاً، فالعدّ بعد القفل يرى ما
+    التزمته، وما لم تلتزمه بعد تضيفه كفرق نسبي فوق القيمة المصححة
+    """
+    counters = NotificationUnreadCounter.__table__
+    notifications = Notification.__table__
+    stored = connection.execute(
+        select(counters.c.unread_count).where(counters.c.user_id == user_id).with_for_update()
+    ).scalar() or 0
+    expected = connection.execute(
+        select(func.count()).select_from(notifications)
+        .where(notifications.c.user_id == user_id, notifications.c.is_read == false())
+    ).scalar()
+    if expected != stored:
+        _write(connection, user_id, expected, relative=False)
+    return {'user_id': user_id, 'expected': expected, 'stored': stored}
+
+
+def reconcile_unread_counters(apply=True):
+    """
+    إعادة حساب عدد غير المقروء لكل مستخدم ومقارنته بالعداد المخزن
+
+    Returns:
+        dict: {'success', 'drift': [...], 'users'}
+    """
+    try:
+        expected = dict(
+            db.session.query(Notification.user_id, db.func.count(Notification.notification_id))
+            .filter(Notification.is_read == false())
+            .group_by(Notification.user_id)
+            .all()
+        )
+        stored = dict(db.session.query(NotificationUnreadCounter.user_id, NotificationUnreadCounter.unread_count).all())
+
+        drift = [
+            {'user_id': user_id, 'expected': expected.get(user_id, 0), 'stored': stored.get(user_id, 0)}
+            for user_id in sorted(set(expected) | set(stored))
+            if expected.get(user_id, 0) != stored.get(user_id, 0)
+        ]
+
+        if apply and drift:
+            # معاملة قصيرة لكل مستخدم؛ ما اختفى فرقه بعد إعادة العد كان حركة جارية لا انحرافاً
+            corrected = []
+            for item in drift:
+                item = _reconcile_user(db.session.connection(), item['user_id'])
+                db.session.commit()
+                if item['expected'] != item['stored']:
+                    corrected.append(item)
+            drift = corrected
+            if drift:
+                logger.warning(f'تم تصحيح {len(drift)} عداد للإشعارات غير المقروءة')
+
+        return {'success': True, 'drift': drift, 'users': len(expected)}
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'خطأ في مطابقة عدادات الإشعارات: {str(e)}')
+        return {'success': False, 'error': str(e)}
+
+
+def ensure_unread_counters():
+    """تهيئة العدادات عند أول تشغيل إن كانت فارغة وتوجد إشعارات غير مقروءة"""
+    if NotificationUnreadCounter.query.first() is None and \
+            Notification.query.filter(Notification.is_read == false()).first() is not None:
+        return reconcile_unread_counters()
+    return None
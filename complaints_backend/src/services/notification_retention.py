@@ -0,0 +1,220 @@
+"""
+سياسات الاحتفاظ بالإشعارات وأرشفتها
+
+- جدول notifications يبقى "الجزء الساخن": قائمة إشعارات المستخدم لا تقرأ إلا منه
+- كل سياسة تحدد حالة القراءة والعمر والإجراء: archive (نقل إلى notifications_archive)
+  أو delete (حذف نهائي)، وتُضبط عبر NOTIFICATION_RETENTION_POLICIES مثل:
+      read:90:archive,unread:365:archive
+- التنفيذ على دفعات (NOTIFICATION_RETENTION_BATCH_SIZE صف) كل منها في commit مستقل:
+  INSERT ... SELECT إلى الأرشيف ثم DELETE بالمفاتيح، مع إنقاص عدادات غير المقروء
+- notifications_archive مقسم شهرياً (RANGE على created_at) في PostgreSQL وتُنشأ الأقسام
+  عند الحاجة؛ انتهاء مدة الأرشيف (NOTIFICATION_ARCHIVE_DAYS) يحذف الأقسام كاملة.
+  على SQLite هو جدول عادي ويُحذف منه على دفعات
+"""
+import logging
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, false, literal, select, text, true
+from src.database.db import db
+from src.models.complaint import Notification, NotificationArchive
+from src.services.notification_counters import apply_unread_deltas
+from src.services.notification_stream import UNREAD, mark_notifications_changed
+
+logger = logging.getLogger('complaints_system.notification_retention')
+
+BATCH_SIZE = int(os.environ.get('NOTIFICATION_RETENTION_BATCH_SIZE', 1000))
+ARCHIVE_DAYS = int(os.environ.get('NOTIFICATION_ARCHIVE_DAYS', 730))
+DEFAULT_POLICIES = 'read:90:archive,unread:365:archive'
+
+ARCHIVED_COLUMNS = ['notification_id', 'user_id', 'complaint_id', 'message', 'type', 'is_read', 'created_at']
+PARTITION_PREFIX = 'notifications_archive_p'
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    name: str
+    is_read: Optional[bool]
+    older_than_days: int
+    action: str
+
+    def condition(self, now):
+        table = Notification.__table__
+        clauses = [table.c.created_at < now - timedelta(days=self.older_than_days)]
+        if self.is_read is True:
+            clauses.append(table.c.is_read == true())
+        elif self.is_read is False:
+            clauses.append(table.c.is_read == false())
+        return clauses
+
+
+_READ_STATES = {'read': True, 'unread': False, 'all': None}
+
+
+def parse_policies(spec):
+    """'read:90:archive,unread:365:delete' → [RetentionPolicy]؛ يرفع ValueError إن كانت غير صالحة"""
+    policies = []
+    for item in filter(None, (part.strip() for part in (spec or '').split(','))):
+        try:
+            state, days, action = (value.strip() for value in item.split(':'))
+            days = int(days)
+        except ValueError:
+            raise ValueError(f'سياسة احتفاظ غير صالحة: {item}')
+        if state not in _READ_STATES or action not in ('archive', 'delete') or days < 1:
+            raise ValueError(f'سياسة احتفاظ غير صالحة: {item}')
+        policies.append(RetentionPolicy(f'{state}_{days}d_{action}', _READ_STATES[state], days, action))
+    return policies
+
+
+def get_policies():
+    return parse_policies(os.environ.get('NOTIFICATION_RETENTION_POLICIES', DEFAULT_POLICIES))
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _partition_name(month):
+    return f'{PARTITION_PREFIX}{month:%Y%m}'
+
+
+def ensure_archive_partitions(connection, oldest, newest):
+    """إنشاء أقسام الأرشيف الشهرية التي تغطي [oldest, newest] على PostgreSQL"""
+    if connection.dialect.name != 'postgresql':
+        return
+    month = _month_start(oldest)
+    while month <= newest:
+        upper = _next_month(month)
+        connection.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF notifications_archive '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        ))
+        month = upper
+
+
+def _apply_policy(policy, now, batch_size):
+    table = Notification.__table__
+    archive = NotificationArchive.__table__
+    conditions = policy.condition(now)
+    moved = batches = 0
+
+    while True:
+        rows = db.session.execute(
+            select(table.c.notification_id, table.c.user_id, table.c.is_read, table.c.created_at)
+            .where(*conditions)
+            .order_by(table.c.created_at)
+            .limit(batch_size)
+            # PostgreSQL: قفل الدفعة حتى لا تتغير حالة قراءتها قبل حذفها (تتخطى الصفوف المقفلة)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            break
+
+        ids = [row.notification_id for row in rows]
+        connection = db.session.connection()
+        if policy.action == 'archive':
+            ensure_archive_partitions(connection, rows[0].created_at, rows[-1].created_at)
+            connection.execute(archive.insert().from_select(
+                ARCHIVED_COLUMNS + ['archived_at'],
+                select(*(table.c[column] for column in ARCHIVED_COLUMNS),
+                       literal(now, type_=archive.c.archived_at.type))
+                .where(table.c.notification_id.in_(ids))
+            ))
+        result = connection.execute(delete(table).where(table.c.notification_id.in_(ids)))
+
+        unread = Counter(row.user_id for row in rows if not row.is_read)
+        if unread:
+            apply_unread_deltas(connection, {user_id: -count for user_id, count in unread.items()})
+            mark_notifications_changed(db.session, unread, UNREAD)
+        db.session.commit()
+
+        moved += result.rowcount
+        batches += 1
+        if len(rows) < batch_size:
+            break
+    return moved, batches
+
+
+def _drop_expired_archive(now, batch_size):
+    cutoff = now - timedelta(days=ARCHIVE_DAYS)
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        partitions = connection.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+            "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+            "WHERE parent.relname = 'notifications_archive'"
+        )).scalars().all()
+        dropped = 0
+        for name in sorted(partitions):
+            try:
+                month = datetime.strptime(name[len(PARTITION_PREFIX):], '%Y%m')
+            except ValueError:
+                continue
+            # القسم كله أقدم من الحد: حذفه أرخص من DELETE لكل صف
+            if _next_month(month) <= cutoff:
+                connection.execute(text(f'DROP TABLE IF EXISTS {name}'))
+                dropped += 1
+        db.session.commit()
+        return dropped
+
+    archive = NotificationArchive.__table__
+    removed = 0
+    while True:
+        keys = db.session.execute(
+            select(archive.c.notification_id, archive.c.created_at)
+            .where(archive.c.created_at < cutoff)
+            .limit(batch_size)
+        ).all()
+        if not keys:
+            break
+        db.session.execute(delete(archive).where(
+            archive.c.notification_id.in_([key.notification_id for key in keys]),
+            archive.c.created_at < cutoff
+        ))
+        db.session.commit()
+        removed += len(keys)
+        if len(keys) < batch_size:
+            break
+    return removed
+
+
+def purge_notifications(batch_size=None, policies=None, now=None):
+    """
+    وظيفة مجدولة: تطبيق سياسات الاحتفاظ على الإشعارات ثم حذف الأرشيف المنتهي
+
+    Returns:
+        dict: {'success', 'by_policy': {name: rows}, 'archive_expired', 'metrics'}
+    """
+    batch_size = batch_size or BATCH_SIZE
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    by_policy = {}
+    batches = 0
+
+    try:
+        for policy in (policies if policies is not None else get_policies()):
+            moved, policy_batches = _apply_policy(policy, now, batch_size)
+            by_policy[policy.name] = moved
+            batches += policy_batches
+        expired = _drop_expired_archive(now, batch_size)
+
+        metrics = {
+            'rows_moved': sum(by_policy.values()),
+            'batches': batches,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }
+        logger.info(f'الاحتفاظ بالإشعارات: {by_policy} {metrics}')
+        return {'success': True, 'by_policy': by_policy, 'archive_expired': expired, 'metrics': metrics}
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'خطأ في تطبيق سياسات الاحتفاظ بالإشعارات: {str(e)}')
+        return {'success': False, 'error': str(e), 'by_policy': by_policy}
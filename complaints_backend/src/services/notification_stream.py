@@ -0,0 +1,230 @@
+"""
+بث الإشعارات عبر Server-Sent Events
+
+- كل commit يضيف إشعارات أو يغيّر حالة قراءتها ينشر إشارة للمستخدمين المعنيين عبر
+  notification_hub (يصل إلى كل عمال gunicorn عبر PUBSUB_DIR)
+- الاتصال المفتوح ينتظر الإشارة دون أي استعلام، ثم يجلب الإشعارات الجديدة فقط
+  ويرسل عدد غير المقروء إن تغيّر؛ اتصال قاعدة البيانات يُعاد للمجمع بين الإشارات
+- معرّف كل حدث هو مؤشر (created_at, notification_id) فيستأنف العميل عبر Last-Event-ID؛
+  ما فاته يُرسل على صفحات من REPLAY_LIMIT حتى تعود صفحة ناقصة
+- نبضة (تعليق SSE) كل SSE_HEARTBEAT_SECONDS تبقي الوسطاء من إغلاق الاتصال، ويُغلق
+  الاتصال بعد SSE_MAX_SECONDS ليعيد المتصفح الاتصال ويتحرر خيط العامل
+"""
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, event, inspect, or_
+from sqlalchemy.orm import Session
+from src.database.db import db
+from src.models.complaint import Notification
+from src.core.pubsub import PubSubHub
+from src.utils.pagination import decode_cursor, encode_cursor
+
+NOTIFICATION = 'notification'
+UNREAD = 'unread'
+
+HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', 15))
+MAX_STREAM_SECONDS = float(os.getenv('SSE_MAX_SECONDS', 300))
+RETRY_MS = int(os.getenv('SSE_RETRY_MS', 3000))
+REPLAY_LIMIT = 100
+# إشعارات تُثبّت بعد إشعار أحدث منها (توزيع غير متزامن) تبقى ضمن هذه النافذة
+LOOKBACK = timedelta(seconds=30)
+
+notification_hub = PubSubHub(directory=os.getenv('PUBSUB_DIR') or None)
+
+
+def mark_notifications_changed(session, user_ids, kind=NOTIFICATION):
+    """تسجيل مستخدمين تتغير إشعاراتهم لتُنشر الإشارة بعد نجاح الـ commit فقط"""
+    pending = session.info.setdefault('notification_events', {})
+    pending.setdefault(kind, set()).update(user_ids)
+
+
+def publish_notification_changes(user_ids, kind=NOTIFICATION):
+    notification_hub.publish(user_ids, kind)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_notification_changes(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, Notification):
+            mark_notifications_changed(session, [obj.user_id], NOTIFICATION)
+    for obj in session.dirty:
+        if isinstance(obj, Notification) and inspect(obj).attrs.is_read.history.has_changes():
+            mark_notifications_changed(session, [obj.user_id], UNREAD)
+    for obj in session.deleted:
+        if isinstance(obj, Notification):
+            mark_notifications_changed(session, [obj.user_id], UNREAD)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_notification_changes(session):
+    pending = session.info.pop('notification_events', None)
+    if not pending:
+        return
+    for kind, user_ids in pending.items():
+        # إشعار جديد يغيّر العدد أيضاً، فلا حاجة لإشارة unread منفصلة
+        if kind == UNREAD:
+            user_ids = user_ids - pending.get(NOTIFICATION, set())
+        publish_notification_changes(user_ids, kind)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_notification_changes(session):
+    session.info.pop('notification_events', None)
+
+
+def format_event(data=None, event_name=None, event_id=None, comment=None):
+    lines = []
+    if comment is not None:
+        lines.append(f': {comment}')
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event_name is not None:
+        lines.append(f'event: {event_name}')
+    if data is not None:
+        lines.extend(f'data: {line}' for line in current_app.json.dumps(data).splitlines())
+    return '\n'.join(lines) + '\n\n'
+
+
+def _unread_count(user_id):
+    from src.services.notification_counters import get_unread_count
+    return get_unread_count(user_id)
+
+
+class _StreamState:
+    """موضع آخر إشعار أُرسل ومعرفات الإشعارات المرسلة ضمن النافذة الخلفية (LOOKBACK)"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.cursor = None
+        self.sent_order = deque()
+        self.sent = set()
+        self.unread = None
+
+    def remember(self, notification):
+        self.cursor = max(self.cursor, (notification.created_at, notification.notification_id))
+        self.sent.add(notification.notification_id)
+        self.sent_order.append((notification.created_at, notification.notification_id))
+        # ما خرج من النافذة لا يعيده fresh، فلا حاجة لتذكره
+        horizon = self.cursor[0] - LOOKBACK
+        while self.sent_order and self.sent_order[0][0] < horizon:
+            self.sent.discard(self.sent_order.popleft()[1])
+
+    def start(self, last_event_id):
+        base = Notification.query.filter(Notification.user_id == self.user_id)
+        cursor = None
+        if last_event_id:
+            try:
+                cursor = decode_cursor(last_event_id)
+            except ValueError:
+                cursor = None
+
+        if cursor is None:
+            latest = base.order_by(Notification.created_at.desc(), Notification.notification_id.desc()).first()
+            self.cursor = (latest.created_at, latest.notification_id) if latest else (datetime.utcnow(), '')
+            replay = []
+        else:
+            self.cursor = cursor
+            replay = self._after(base, cursor)
+
+        # ما قبل المؤشر ضمن النافذة يُعتبر مرسلاً في الاتصال السابق
+        since = self.cursor[0] - LOOKBACK
+        for created_at, notification_id in base.with_entities(Notification.created_at, Notification.notification_id).filter(
+            Notification.created_at >= since,
+            or_(Notification.created_at < self.cursor[0],
+                and_(Notification.created_at == self.cursor[0], Notification.notification_id <= self.cursor[1]))
+        ).order_by(Notification.created_at, Notification.notification_id):
+            self.sent.add(notification_id)
+            self.sent_order.append((created_at, notification_id))
+        return replay
+
+    def backlog(self):
+        """الصفحة التالية من الإشعارات بعد المؤشر الحالي (استئناف Last-Event-ID)"""
+        return self._after(Notification.query.filter(Notification.user_id == self.user_id), self.cursor)
+
+    def _after(self, base, cursor):
+        sort_value, key_value = cursor
+        return base.filter(or_(
+            Notification.created_at > sort_value,
+            and_(Notification.created_at == sort_value, Notification.notification_id > key_value)
+        )).order_by(Notification.created_at, Notification.notification_id).limit(REPLAY_LIMIT).all()
+
+    def fresh(self):
+        query = Notification.query.filter(
+            Notification.user_id == self.user_id,
+            Notification.created_at >= self.cursor[0] - LOOKBACK
+        )
+        if self.sent:
+            query = query.filter(~Notification.notification_id.in_(self.sent))
+        return query.order_by(Notification.created_at, Notification.notification_id).limit(REPLAY_LIMIT).all()
+
+
+def _notification_events(state, notifications):
+    for notification in notifications:
+        state.remember(notification)
+        yield format_event(
+            notification.to_dict(),
+            event_name=NOTIFICATION,
+            event_id=encode_cursor(notification.created_at, notification.notification_id)
+        )
+
+
+def _unread_event(state, force=False):
+    count = _unread_count(state.user_id)
+    if force or count != state.unread:
+        state.unread = count
+        return format_event({'unread_count': count}, event_name=UNREAD)
+    return None
+
+
+def stream_notifications(user_id, last_event_id=None, heartbeat=None, max_seconds=None):
+    """
+    مولّد أحداث SSE لمستخدم واحد (يُستخدم مع stream_with_context)
+
+    Args:
+        last_event_id: مؤشر آخر إشعار استلمه العميل لإعادة إرسال ما فاته
+    """
+    heartbeat = heartbeat or HEARTBEAT_SECONDS
+    deadline = time.monotonic() + (max_seconds or MAX_STREAM_SECONDS)
+    # الاشتراك قبل القراءة الأولى حتى لا تضيع إشارة تصل بينهما
+    subscription = notification_hub.subscribe(user_id)
+    state = _StreamState(user_id)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        replay = state.start(last_event_id)
+        chunks = list(_notification_events(state, replay))
+        while len(replay) == REPLAY_LIMIT:
+            db.session.close()
+            yield from chunks
+            replay = state.backlog()
+            chunks = list(_notification_events(state, replay))
+        chunks.append(_unread_event(state, force=True))
+        db.session.close()
+        yield from chunks
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            kinds = subscription.wait(timeout=min(heartbeat, remaining))
+            if not kinds:
+                yield format_event(comment='heartbeat')
+                continue
+
+            chunks = []
+            if NOTIFICATION in kinds:
+                while True:
+                    batch = state.fresh()
+                    chunks.extend(_notification_events(state, batch))
+                    if len(batch) < REPLAY_LIMIT:
+                        break
+            unread = _unread_event(state)
+            if unread:
+                chunks.append(unread)
+            db.session.close()
+            yield from chunks
+    finally:
+        notification_hub.unsubscribe(subscription)
+        db.session.remove()
@@ -0,0 +1,196 @@
+"""
+توزيع الإشعارات على أعضاء الأدوار (Fan-out)
+
+- المستلمون يُقرؤون من فهرس مخزن (اسم الدور ← معرفات المستخدمين) بدل استعلام
+  ربط الأدوار مع كل طلب؛ يُبطل الفهرس بعد أي commit يضيف مستخدماً أو يغيّر دوره
+  أو يحذفه، ومهلة NOTIFY_ROLE_CACHE_TTL تحد من التقادم بين العمال
+- الوضع المتزامن (الافتراضي): جملة INSERT واحدة متعددة الصفوف داخل معاملة الطلب
+- الوضع غير المتزامن (NOTIFY_FANOUT_ASYNC=true): تُسجّل المهمة وتُرسل إلى طابور
+  خلفي بعد نجاح الـ commit فقط، ويعود الطلب دون انتظار الكتابة
+- في الوضعين يُبلّغ المستلمون المتصلون عبر SSE بعد تثبيت الكتابة (notification_stream)
+"""
+import logging
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.orm import Session
+from flask import current_app
+from src.database.db import db
+from src.models.complaint import User, Role, Notification
+from src.core.cache import TTLCache
+from src.core.metrics import observe_fanout
+from src.services.notification_stream import mark_notifications_changed, publish_notification_changes
+from src.services.notification_counters import add_unread
+
+logger = logging.getLogger('complaints_system.notifications')
+
+ADMIN_ROLES = ('Technical Committee', 'Higher Committee')
+INSERT_CHUNK_SIZE = 500
+
+role_recipients_cache = TTLCache(
+    maxsize=32,
+    ttl=float(os.getenv('NOTIFY_ROLE_CACHE_TTL', 60))
+)
+
+
+def _async_enabled():
+    return os.getenv('NOTIFY_FANOUT_ASYNC', 'false').lower() == 'true'
+
+
+def get_role_user_ids(role_names):
+    """معرفات مستخدمي الأدوار المطلوبة (من الذاكرة المؤقتة إن أمكن)"""
+    user_ids = []
+    seen = set()
+    for role_name in role_names:
+        members = role_recipients_cache.get(role_name)
+        if members is None:
+            members = tuple(
+                user_id for (user_id,) in db.session.query(User.user_id)
+                .join(Role, User.role_id == Role.role_id)
+                .filter(Role.role_name == role_name)
+                .order_by(User.user_id)
+                .all()
+            )
+            role_recipients_cache.set(role_name, members)
+        for user_id in members:
+            if user_id not in seen:
+                seen.add(user_id)
+                user_ids.append(user_id)
+    return user_ids
+
+
+def invalidate_role_recipients():
+    role_recipients_cache.clear()
+
+
+def _build_rows(user_ids, message, notification_type, complaint_id):
+    now = datetime.utcnow()
+    return [{
+        'notification_id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'complaint_id': complaint_id,
+        'message': message,
+        'type': notification_type,
+        'is_read': False,
+        'created_at': now
+    } for user_id in user_ids]
+
+
+def insert_notifications(connection, rows):
+    """
+    كتابة الإشعارات بجمل INSERT متعددة الصفوف (دفعات لتفادي حد المعاملات في SQLite)
+    مع زيادة عدادات غير المقروء في نفس المعاملة
+    """
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        connection.execute(insert(Notification.__table__).values(rows[start:start + INSERT_CHUNK_SIZE]))
+    add_unread(connection, [row['user_id'] for row in rows])
+    return len(rows)
+
+
+class FanoutWorker:
+    """عامل خلفي واحد لكل عملية يكتب دفعات الإشعارات في معاملة مستقلة"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='notification-fanout', daemon=True)
+                self._thread.start()
+
+    def submit(self, app, rows):
+        self._ensure_started()
+        self._queue.put((app, rows))
+
+    def _run(self):
+        while True:
+            app, rows = self._queue.get()
+            try:
+                with app.app_context():
+                    with db.engine.begin() as connection:
+                        insert_notifications(connection, rows)
+                publish_notification_changes(row['user_id'] for row in rows)
+                self.processed += len(rows)
+            except Exception as e:
+                self.failed += len(rows)
+                logger.error(f'فشل توزيع {len(rows)} إشعار: {str(e)}')
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """انتظار انتهاء كل المهام المعلقة (للاختبارات وإيقاف التشغيل)"""
+        self._queue.join()
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'processed': self.processed,
+            'failed': self.failed
+        }
+
+
+fanout_worker = FanoutWorker()
+
+
+def notify_roles(role_names, message, notification_type, complaint_id=None, exclude_user_ids=None):
+    """
+    إرسال نفس الإشعار لكل أعضاء الأدوار المحددة
+
+    Returns:
+        int: عدد المستلمين (المكتوبين أو المجدولين)
+    """
+    exclude = set(exclude_user_ids or ())
+    user_ids = [user_id for user_id in get_role_user_ids(role_names) if user_id not in exclude]
+    if not user_ids:
+        return 0
+
+    rows = _build_rows(user_ids, message, notification_type, complaint_id)
+    if _async_enabled():
+        observe_fanout('async', len(rows))
+        db.session.info.setdefault('pending_fanout', []).append(rows)
+        return len(rows)
+
+    observe_fanout('sync', len(rows))
+    mark_notifications_changed(db.session, user_ids)
+    return insert_notifications(db.session.connection(), rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_membership_changes(session, flush_context):
+    if session.info.get('role_recipients_dirty'):
+        return
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, User):
+            session.info['role_recipients_dirty'] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if state.attrs.role_id.history.has_changes():
+                session.info['role_recipients_dirty'] = True
+                return
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    if session.info.pop('role_recipients_dirty', False):
+        invalidate_role_recipients()
+    pending = session.info.pop('pending_fanout', None)
+    if pending:
+        app = current_app._get_current_object()
+        for rows in pending:
+            fanout_worker.submit(app, rows)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('role_recipients_dirty', None)
+    session.info.pop('pending_fanout', None)
@@ -0,0 +1,118 @@
+"""
+نسخ الإيصالات المشتقة: نسخة مراجعة مضغوطة وصورة مصغرة
+
+- تُجدول بعد حفظ الدفعة في ProcessPoolExecutor مشترك داخل العملية فيعود الطلب فوراً
+- تُخزن بجانب الإيصالات في _derivatives/<size>/<اسم الإيصال>.jpg؛ بما أن الإيصال
+  مسمى ببصمة محتواه فالنسخة المشتقة صالحة دائماً ولا تحتاج إلى إبطال
+- إن طُلبت نسخة غير موجودة بعد (إيصال قديم أو لم ينتهِ العامل) تُبنى داخل الطلب مرة واحدة
+- RECEIPT_DERIVATIVE_WORKERS=0 يعطل الجدولة وتُبنى النسخ عند أول طلب فقط
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from src.utils.images import build_derivatives
+
+logger = logging.getLogger(__name__)
+
+# الاسم -> (أطول ضلع بالبكسل، جودة JPEG)
+DERIVATIVE_SIZES = {
+    'review': (1600, 80),
+    'thumb': (320, 70),
+}
+DERIVATIVES_DIRNAME = '_derivatives'
+
+
+def derivative_name(filename, size):
+    base = os.path.splitext(filename)[0]
+    return f'{DERIVATIVES_DIRNAME}/{size}/{base}.jpg'
+
+
+def _full_path(folder, name):
+    return os.path.join(folder, *name.split('/'))
+
+
+def _targets(folder, filename, sizes=None):
+    return [
+        (_full_path(folder, derivative_name(filename, size)), max_edge, quality)
+        for size, (max_edge, quality) in DERIVATIVE_SIZES.items()
+        if sizes is None or size in sizes
+    ]
+
+
+class DerivativeWorker:
+    """مجمع عمليات يُنشأ عند أول استخدام (spawn لتجنب نسخ خيوط واتصالات العامل الحالي)"""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _ensure_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def submit(self, source_path, targets):
+        future = self._ensure_executor().submit(build_derivatives, source_path, targets)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+        error = future.exception()
+        if error is not None:
+            logger.warning('Receipt derivative generation failed: %s', error)
+
+    def join(self, timeout=None):
+        """انتظار انتهاء كل المهام المجدولة (للاختبارات والإيقاف)"""
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+derivative_worker = DerivativeWorker(max_workers=int(os.getenv('RECEIPT_DERIVATIVE_WORKERS', 2)))
+
+
+def schedule_receipt_derivatives(folder, filename):
+    """جدولة توليد النسخ المشتقة الناقصة؛ لا تفشل الطلب أبداً"""
+    targets = [target for target in _targets(folder, filename) if not os.path.exists(target[0])]
+    if not targets or derivative_worker.max_workers <= 0:
+        return None
+    try:
+        return derivative_worker.submit(_full_path(folder, filename), targets)
+    except Exception as e:
+        logger.warning('Could not schedule receipt derivatives for %s: %s', filename, e)
+        return None
+
+
+def get_receipt_derivative(folder, filename, size):
+    """
+    المسار النسبي (داخل folder) للنسخة المطلوبة، مع بنائها إن لم تكن موجودة
+
+    Returns:
+        str or None: None إن تعذر البناء (ملف ليس صورة مثلاً) فيُرسل الأصل
+    """
+    name = derivative_name(filename, size)
+    if os.path.exists(_full_path(folder, name)):
+        return name
+    try:
+        build_derivatives(_full_path(folder, filename), _targets(folder, filename, sizes={size}))
+    except Exception as e:
+        logger.warning('Could not build %s derivative for %s: %s', size, filename, e)
+        return None
+    return name
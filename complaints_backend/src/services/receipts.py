@@ -0,0 +1,261 @@
+"""
+فهرس الإيصالات المخزنة حسب المحتوى (receipt_blobs)
+
+- كل دفعة جديدة تزيد ref_count لبصمة إيصالها داخل نفس المعاملة (upsert)
+- حذف دفعة ينقص العداد (حدث after_flush)؛ الملفات التي وصل عدادها للصفر لا تُحذف فوراً
+  حتى لا تتسابق مع رفع جديد لنفس المحتوى، بل عبر prune_unreferenced_receipts بعد مهلة
+  (ومعها الملفات التي كُتبت ثم تراجعت معاملة دفعتها فلا صف لها)
+- find_duplicate_receipts يعلّم الدفعات التي تشارك نفس الإيصال عبر بحث بالفهرس
+  (المفتاح الأساسي لـ receipt_blobs ثم فهرس payments.receipt_image_path)
+"""
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from src.database.db import db
+from src.models.complaint import Payment, ReceiptBlob, User
+from src.services.receipt_derivatives import DERIVATIVE_SIZES, DERIVATIVES_DIRNAME, derivative_name
+
+logger = logging.getLogger(__name__)
+
+RECEIPTS_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads', 'receipts')
+CONTENT_ADDRESS = re.compile(r'^[0-9a-f]{2}/([0-9a-f]{64})\.\w+$')
+# مهلة حذف الإيصالات غير المستخدمة في المهمة اليومية
+PRUNE_GRACE_HOURS = float(os.getenv('RECEIPT_PRUNE_GRACE_HOURS', 24))
+
+
+def receipt_sha256(receipt_path):
+    """بصمة الإيصال من مساره، أو None للإيصالات القديمة المسماة بـ UUID"""
+    match = CONTENT_ADDRESS.match(receipt_path or '')
+    return match.group(1) if match else None
+
+
+def _upsert_insert(connection):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    return None
+
+
+def add_receipt_reference(payment, upload):
+    """
+    تسجيل إشارة الدفعة إلى ملف الإيصال (upload: ناتج validate_and_save_file)
+    يجب استدعاؤها بعد flush للدفعة وقبل commit
+    """
+    connection = db.session.connection()
+    table = ReceiptBlob.__table__
+    now = datetime.utcnow()
+    values = {
+        'sha256': upload['sha256'],
+        'storage_path': upload['filename'],
+        'size': upload['size'],
+        'mime_type': upload.get('mime'),
+        'ref_count': 1,
+        'first_payment_id': payment.payment_id,
+        'created_at': now,
+        'last_referenced_at': now
+    }
+
+    insert = _upsert_insert(connection)
+    if insert is not None:
+        stmt = insert(table).values(**values)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=['sha256'],
+            set_={'ref_count': table.c.ref_count + 1, 'last_referenced_at': now}
+        ))
+        return
+
+    result = connection.execute(
+        update(table).where(table.c.sha256 == upload['sha256'])
+        .values(ref_count=table.c.ref_count + 1, last_referenced_at=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(**values))
+
+
+@event.listens_for(Session, 'after_flush')
+def _release_deleted_payments(session, flush_context):
+    released = [
+        sha for sha in (receipt_sha256(obj.receipt_image_path) for obj in session.deleted if isinstance(obj, Payment))
+        if sha
+    ]
+    if not released:
+        return
+    table = ReceiptBlob.__table__
+    connection = session.connection()
+    for sha in released:
+        connection.execute(
+            update(table).where(table.c.sha256 == sha, table.c.ref_count > 0)
+            .values(ref_count=table.c.ref_count - 1)
+        )
+
+
+def find_duplicate_receipts(payments):
+    """
+    الدفعات الأخرى التي أُرسل معها نفس الإيصال حرفياً
+
+    Returns:
+        dict: payment_id -> [{payment_id, user_id, user_name, status, created_at}]
+    """
+    paths = {payment.receipt_image_path for payment in payments if receipt_sha256(payment.receipt_image_path)}
+    if not paths:
+        return {}
+
+    shared = [
+        path for (path,) in db.session.query(ReceiptBlob.storage_path).filter(
+            ReceiptBlob.sha256.in_([receipt_sha256(path) for path in paths]),
+            ReceiptBlob.ref_count > 1
+        )
+    ]
+    if not shared:
+        return {}
+
+    by_path = {}
+    rows = (
+        db.session.query(
+            Payment.payment_id, Payment.user_id, User.full_name, Payment.status,
+            Payment.created_at, Payment.receipt_image_path
+        )
+        .join(User, User.user_id == Payment.user_id)
+        .filter(Payment.receipt_image_path.in_(shared))
+        .order_by(Payment.created_at)
+    )
+    for payment_id, user_id, full_name, status, created_at, path in rows:
+        by_path.setdefault(path, []).append({
+            'payment_id': payment_id,
+            'user_id': user_id,
+            'user_name': full_name,
+            'status': status,
+            'created_at': created_at.isoformat() if created_at else None
+        })
+
+    return {
+        payment.payment_id: [
+            other for other in by_path.get(payment.receipt_image_path, ())
+            if other['payment_id'] != payment.payment_id
+        ]
+        for payment in payments
+        if len(by_path.get(payment.receipt_image_path, ())) > 1
+    }
+
+
+def _receipt_files(folder, storage_path):
+    names = [storage_path] + [derivative_name(storage_path, size) for size in DERIVATIVE_SIZES]
+    return [os.path.join(folder, *name.split('/')) for name in names]
+
+
+def _remove_receipt_files(folder, storage_path):
+    for path in _receipt_files(folder, storage_path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _modified_after(path, timestamp):
+    try:
+        return os.path.getmtime(path) >= timestamp
+    except FileNotFoundError:
+        return False
+
+
+def prune_unreferenced_receipts(grace=timedelta(days=1), folder=RECEIPTS_FOLDER):
+    """
+    حذف ملفات الإيصالات (ونسخها المشتقة) التي لم تعد أي دفعة تشير إليها منذ grace
+
+    - كل صف يُعاد فحصه بقفل (FOR UPDATE) قبل حذف ملفه: دفعة جديدة لنفس المحتوى تزيد
+      ref_count في الصف نفسه، فإما يراها الفحص أو تنتظر حتى ينتهي الحذف ثم تكتب الملف من جديد
+    - الرفع المكرر يحدّث mtime للملف قبل تسجيل دفعته، فلا يُحذف ملف لُمس خلال المهلة
+    - ملفات بعنوان محتوى لا صف لها ولا دفعة تُحذف أيضاً إن كانت أقدم من المهلة
+    """
+    cutoff = datetime.utcnow() - grace
+    file_cutoff = time.time() - grace.total_seconds()
+    candidates = [
+        sha for (sha,) in db.session.query(ReceiptBlob.sha256)
+        .filter(ReceiptBlob.ref_count <= 0, ReceiptBlob.last_referenced_at < cutoff)
+    ]
+    removed = 0
+    for sha in candidates:
+        blob = (
+            ReceiptBlob.query
+            .filter(ReceiptBlob.sha256 == sha, ReceiptBlob.ref_count <= 0, ReceiptBlob.last_referenced_at < cutoff)
+            .populate_existing().with_for_update().first()
+        )
+        if blob is None or _modified_after(_receipt_files(folder, blob.storage_path)[0], file_cutoff):
+            db.session.rollback()
+            continue
+        try:
+            _remove_receipt_files(folder, blob.storage_path)
+        except OSError as e:
+            logger.warning('Could not remove receipt %s: %s', blob.storage_path, e)
+            db.session.rollback()
+            continue
+        db.session.delete(blob)
+        db.session.commit()
+        removed += 1
+    db.session.commit()
+    return removed + _prune_orphan_files(folder, file_cutoff)
+
+
+def _prune_orphan_files(folder, file_cutoff, batch_size=500):
+    """ملفات كُتبت قبل معاملة دفعة تراجعت: لا صف لها في receipt_blobs ولا تشير إليها دفعة"""
+    orphans = {}
+    for root, dirs, names in os.walk(folder):
+        if root == folder:
+            dirs[:] = [name for name in dirs if name != DERIVATIVES_DIRNAME]
+        for name in names:
+            path = os.path.join(root, name)
+            storage_path = os.path.relpath(path, folder).replace(os.sep, '/')
+            sha = receipt_sha256(storage_path)
+            if sha and not _modified_after(path, file_cutoff):
+                orphans[storage_path] = sha
+
+    removed = 0
+    paths = list(orphans)
+    for start in range(0, len(paths), batch_size):
+        batch = paths[start:start + batch_size]
+        known = {
+            sha for (sha,) in db.session.query(ReceiptBlob.sha256)
+            .filter(ReceiptBlob.sha256.in_([orphans[path] for path in batch]))
+        }
+        referenced = {
+            path for (path,) in db.session.query(Payment.receipt_image_path)
+            .filter(Payment.receipt_image_path.in_(batch))
+        }
+        db.session.commit()
+        for storage_path in batch:
+            if orphans[storage_path] in known or storage_path in referenced:
+                continue
+            try:
+                _remove_receipt_files(folder, storage_path)
+            except OSError as e:
+                logger.warning('Could not remove orphan receipt %s: %s', storage_path, e)
+                continue
+            removed += 1
+    return removed
+
+
+def cleanup_receipts(folder=None):
+    """
+    وظيفة مجدولة: حذف الإيصالات غير المستخدمة بعد مهلة RECEIPT_PRUNE_GRACE_HOURS
+
+    Returns:
+        dict: {'success', 'removed'}
+    """
+    try:
+        removed = prune_unreferenced_receipts(
+            grace=timedelta(hours=PRUNE_GRACE_HOURS), folder=folder or RECEIPTS_FOLDER
+        )
+        logger.info(f'حذف الإيصالات غير المستخدمة: {removed} ملف')
+        return {'success': True, 'removed': removed}
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'خطأ في حذف الإيصالات غير المستخدمة: {str(e)}')
+        return {'success': False, 'error': str(e)}
@@ -1,97 +1,231 @@
+"""
+المهام المجدولة للاشتراكات (تعمل بعمليات جماعية على مستوى SQL)
+
+- انتهاء الاشتراكات: UPDATE واحد لكل دفعة مع منطق فترة السماح داخل شرط WHERE
+- تذكيرات D-14 / D-7 / D-3: INSERT ... SELECT للإشعارات ثم UPDATE لأعلام التذكير
+- كل دفعة (SCHEDULER_BATCH_SIZE صف) تُثبّت في commit مستقل حتى لا تطول المعاملة
+- كل تشغيل يعيد مقاييس: الصفوف المفحوصة والمحدّثة وعدد الدفعات والزمن المستغرق
+"""
+import logging
+import os
+import time
 from datetime import datetime, timedelta
+from sqlalchemy import and_, false, literal, literal_column, or_, select, true, update
 from src.database.db import db
-from src.models.complaint import Subscription, Notification, Settings
+from src.models.complaint import Subscription, Notification
+from src.core.principal_cache import invalidate_principals
+from src.core.settings_registry import get_settings
+from src.services.notification_stream import mark_notifications_changed
+from src.services.notification_counters import add_unread
+
+logger = logging.getLogger('complaints_system.scheduler')
+
+BATCH_SIZE = int(os.environ.get('SCHEDULER_BATCH_SIZE', 1000))
+
+REMINDER_STAGES = (
+    (14, 'notified_14d', 'renewal_reminder_14d',
+     'تنبيه: اشتراكك سينتهي بعد 14 يوماً في {date}. يرجى التجديد قريباً.'),
+    (7, 'notified_7d', 'renewal_reminder_7d',
+     'تنبيه مهم: اشتراكك سينتهي بعد 7 أيام في {date}. يرجى التجديد.'),
+    (3, 'notified_3d', 'renewal_reminder_3d',
+     'تنبيه عاجل: اشتراكك سينتهي بعد 3 أيام في {date}. يرجى التجديد فوراً.'),
+)
+
+
+def _metrics(started, scanned, updated, batches):
+    return {
+        'rows_scanned': scanned,
+        'rows_updated': updated,
+        'batches': batches,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _not_flagged(column):
+    return or_(column.is_(None), column == false())
+
 
-def check_and_expire_subscriptions():
+def _expiry_condition(now, settings):
+    """شرط انتهاء الاشتراك مع فترة السماح بنفس منطق الحساب السابق في بايثون"""
+    subscriptions = Subscription.__table__
+    if not settings.enable_grace_period:
+        return subscriptions.c.end_date < now
+
+    grace_cutoff = now - timedelta(days=settings.grace_period_days)
+    return or_(
+        subscriptions.c.end_date < grace_cutoff,
+        and_(
+            subscriptions.c.end_date < now,
+            _not_flagged(subscriptions.c.grace_period_enabled)
+        )
+    )
+
+
+def _uuid_sql(dialect):
+    """توليد UUID داخل قاعدة البيانات لمفتاح الإشعار"""
+    if dialect == 'postgresql':
+        return literal_column("gen_random_uuid()::text")
+    return literal_column(
+        "lower(hex(randomblob(4))) || '-' || lower(hex(randomblob(2))) || '-4' || "
+        "substr(lower(hex(randomblob(2))), 2) || '-' || "
+        "substr('89ab', 1 + (abs(random()) % 4), 1) || substr(lower(hex(randomblob(2))), 2) || '-' || "
+        "lower(hex(randomblob(6)))"
+    )
+
+
+def _date_sql(column, dialect):
+    if dialect == 'postgresql':
+        return db.func.to_char(column, 'YYYY-MM-DD')
+    return db.func.strftime('%Y-%m-%d', column)
+
+
+def check_and_expire_subscriptions(batch_size=None):
     """
     وظيفة مجدولة لتغيير الاشتراكات المنتهية إلى expired
     يجب تشغيلها يومياً
     """
+    batch_size = batch_size or BATCH_SIZE
+    started = time.perf_counter()
+    scanned = updated = batches = 0
+
     try:
         now = datetime.utcnow()
-        expired_count = 0
-        
-        active_subscriptions = Subscription.query.filter_by(status='active').all()
-        
-        grace_period_setting = Settings.query.filter_by(key='grace_period_days').first()
-        grace_period_days = int(grace_period_setting.value) if grace_period_setting else 7
-        
-        enable_grace_period = Settings.query.filter_by(key='enable_grace_period').first()
-        global_grace_enabled = enable_grace_period.value.lower() == 'true' if enable_grace_period else True
-        
-        for subscription in active_subscriptions:
-            if global_grace_enabled and subscription.grace_period_enabled:
-                expiry_with_grace = subscription.end_date + timedelta(days=grace_period_days)
-            else:
-                expiry_with_grace = subscription.end_date
-            
-            if now > expiry_with_grace:
-                subscription.status = 'expired'
-                expired_count += 1
-        
-        db.session.commit()
-        return {'expired_count': expired_count, 'success': True}
-        
+        subscriptions = Subscription.__table__
+        condition = and_(subscriptions.c.status == 'active', _expiry_condition(now, get_settings()))
+
+        while True:
+            rows = db.session.execute(
+                select(subscriptions.c.subscription_id, subscriptions.c.user_id)
+                .where(condition)
+                .order_by(subscriptions.c.subscription_id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            scanned += len(rows)
+            result = db.session.execute(
+                update(subscriptions)
+                .where(subscriptions.c.subscription_id.in_([row[0] for row in rows]))
+                .where(condition)
+                .values(status='expired')
+            )
+            db.session.commit()
+            invalidate_principals({row[1] for row in rows})
+
+            updated += result.rowcount
+            batches += 1
+            if len(rows) < batch_size:
+                break
+
+        metrics = _metrics(started, scanned, updated, batches)
+        logger.info(f'انتهاء الاشتراكات: {metrics}')
+        return {'expired_count': updated, 'success': True, 'metrics': metrics}
+
     except Exception as e:
         db.session.rollback()
-        return {'error': str(e), 'success': False}
+        logger.error(f'خطأ في فحص الاشتراكات المنتهية: {str(e)}')
+        return {'error': str(e), 'success': False, 'metrics': _metrics(started, scanned, updated, batches)}
 
-def send_renewal_reminders():
+
+def _send_stage_reminders(now, days, flag, notification_type, template, batch_size):
+    subscriptions = Subscription.__table__
+    notifications = Notification.__table__
+    flag_column = subscriptions.c[flag]
+    dialect = db.session.get_bind().dialect.name
+
+    # نفس نافذة (end_date - now).days == days
+    condition = and_(
+        subscriptions.c.status == 'active',
+        subscriptions.c.end_date >= now + timedelta(days=days),
+        subscriptions.c.end_date < now + timedelta(days=days + 1),
+        _not_flagged(flag_column)
+    )
+    prefix, suffix = template.split('{date}')
+    scanned = sent = batches = 0
+
+    while True:
+        selected = db.session.execute(
+            select(subscriptions.c.subscription_id, subscriptions.c.user_id)
+            .where(condition)
+            .order_by(subscriptions.c.subscription_id)
+            .limit(batch_size)
+        ).all()
+        if not selected:
+            break
+        ids = [subscription_id for subscription_id, _ in selected]
+        scanned += len(ids)
+
+        chunk = and_(subscriptions.c.subscription_id.in_(ids), condition)
+        rows = select(
+            _uuid_sql(dialect),
+            subscriptions.c.user_id,
+            literal(prefix) + _date_sql(subscriptions.c.end_date, dialect) + literal(suffix),
+            literal(notification_type),
+            false(),
+            literal(now, type_=notifications.c.created_at.type)
+        ).where(chunk)
+        result = db.session.execute(
+            notifications.insert().from_select(
+                ['notification_id', 'user_id', 'message', 'type', 'is_read', 'created_at'],
+                rows
+            )
+        )
+        db.session.execute(update(subscriptions).where(chunk).values({flag: true()}))
+        # صف إشعار لكل اشتراك في الدفعة؛ أي فرق نادر (تغيّر الاشتراك بين الجملتين) تصححه المطابقة
+        add_unread(db.session.connection(), [user_id for _, user_id in selected])
+        mark_notifications_changed(db.session, [user_id for _, user_id in selected])
+        db.session.commit()
+
+        sent += result.rowcount
+        batches += 1
+        if len(ids) < batch_size:
+            break
+
+    return scanned, sent, batches
+
+
+def send_renewal_reminders(batch_size=None):
     """
     وظيفة مجدولة لإرسال تذكيرات انتهاء الاشتراك
     D-14, D-7, D-3
     يجب تشغيلها يومياً
     """
+    batch_size = batch_size or BATCH_SIZE
+    started = time.perf_counter()
+    scanned = sent = batches = 0
+    by_stage = {}
+
     try:
         now = datetime.utcnow()
-        reminders_sent = 0
-        
-        subscriptions = Subscription.query.filter_by(status='active').all()
-        
-        for subscription in subscriptions:
-            days_remaining = (subscription.end_date - now).days
-            
-            if days_remaining == 14 and not subscription.notified_14d:
-                notification = Notification(
-                    user_id=subscription.user_id,
-                    message=f'تنبيه: اشتراكك سينتهي بعد 14 يوماً في {subscription.end_date.strftime("%Y-%m-%d")}. يرجى التجديد قريباً.',
-                    type='renewal_reminder_14d'
-                )
-                subscription.notified_14d = True
-                db.session.add(notification)
-                reminders_sent += 1
-            
-            elif days_remaining == 7 and not subscription.notified_7d:
-                notification = Notification(
-                    user_id=subscription.user_id,
-                    message=f'تنبيه مهم: اشتراكك سينتهي بعد 7 أيام في {subscription.end_date.strftime("%Y-%m-%d")}. يرجى التجديد.',
-                    type='renewal_reminder_7d'
-                )
-                subscription.notified_7d = True
-                db.session.add(notification)
-                reminders_sent += 1
-            
-            elif days_remaining == 3 and not subscription.notified_3d:
-                notification = Notification(
-                    user_id=subscription.user_id,
-                    message=f'تنبيه عاجل: اشتراكك سينتهي بعد 3 أيام في {subscription.end_date.strftime("%Y-%m-%d")}. يرجى التجديد فوراً.',
-                    type='renewal_reminder_3d'
-                )
-                subscription.notified_3d = True
-                db.session.add(notification)
-                reminders_sent += 1
-        
-        db.session.commit()
-        return {'reminders_sent': reminders_sent, 'success': True}
-        
+        for days, flag, notification_type, template in REMINDER_STAGES:
+            stage_scanned, stage_sent, stage_batches = _send_stage_reminders(
+                now, days, flag, notification_type, template, batch_size
+            )
+            by_stage[f'd{days}'] = stage_sent
+            scanned += stage_scanned
+            sent += stage_sent
+            batches += stage_batches
+
+        metrics = _metrics(started, scanned, sent, batches)
+        metrics['by_stage'] = by_stage
+        logger.info(f'تذكيرات التجديد: {metrics}')
+        return {'reminders_sent': sent, 'success': True, 'metrics': metrics}
+
     except Exception as e:
         db.session.rollback()
-        return {'error': str(e), 'success': False}
+        logger.error(f'خطأ في إرسال تذكيرات التجديد: {str(e)}')
+        return {'error': str(e), 'success': False, 'metrics': _metrics(started, scanned, sent, batches)}
+
 
 def run_daily_tasks():
     """تشغيل جميع المهام اليومية"""
+    from src.services.notification_retention import purge_notifications
+    from src.services.receipts import cleanup_receipts
     results = {
         'expiry_check': check_and_expire_subscriptions(),
-        'renewal_reminders': send_renewal_reminders()
+        'renewal_reminders': send_renewal_reminders(),
+        'notification_retention': purge_notifications(),
+        'receipt_cleanup': cleanup_receipts()
     }
     return results
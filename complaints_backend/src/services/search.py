@@ -0,0 +1,273 @@
+"""
+البحث النصي الكامل في الشكاوى مع دعم تطبيع النص العربي
+
+- SQLite: جدول افتراضي FTS5 باسم complaints_fts مع ترتيب bm25
+- PostgreSQL: جدول complaint_search بعمود tsvector وفهرس GIN مع ترتيب ts_rank
+- يُطبَّق نفس التطبيع (الهمزات، التاء المربوطة، الألف المقصورة، التشكيل،
+  التطويل، الأرقام الهندية) وحذف أداة التعريف على النص المفهرس وعلى نص الاستعلام
+- تحديث الفهرس تزايدياً عبر أحداث الـ ORM عند إنشاء الشكوى أو تعديلها
+"""
+import logging
+import re
+from sqlalchemy import DDL, bindparam, column, event, func, inspect, literal_column, select, text
+from src.database.db import db
+from src.models.complaint import Complaint
+
+logger = logging.getLogger('complaints_system.search')
+
+SQLITE_TABLE = 'complaints_fts'
+POSTGRES_TABLE = 'complaint_search'
+
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+_CHAR_MAP = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+})
+_ARTICLE_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+
+_SQLITE_CREATE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} "
+    "USING fts5(complaint_id UNINDEXED, title, description, tokenize='unicode61')"
+)
+_POSTGRES_CREATE = (
+    f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+    "complaint_id VARCHAR(36) PRIMARY KEY REFERENCES complaints(complaint_id) ON DELETE CASCADE, "
+    "document TSVECTOR NOT NULL)"
+)
+_POSTGRES_INDEX = (
+    f"CREATE INDEX IF NOT EXISTS idx_{POSTGRES_TABLE}_document "
+    f"ON {POSTGRES_TABLE} USING GIN (document)"
+)
+
+_fts_available = {}
+
+
+def normalize_arabic(value):
+    """تطبيع النص العربي للفهرسة والبحث"""
+    if not value:
+        return ''
+    value = _DIACRITICS.sub('', value)
+    value = value.translate(_CHAR_MAP)
+    return value.lower()
+
+
+def _strip_article(token):
+    for prefix in _ARTICLE_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            return token[len(prefix):]
+    return token
+
+
+def tokenize(value):
+    """تقسيم النص بعد التطبيع وحذف أداة التعريف من كل كلمة"""
+    return [_strip_article(token) for token in _TOKEN.findall(normalize_arabic(value))]
+
+
+def _dialect(bind):
+    return bind.dialect.name
+
+
+def search_supported(bind=None):
+    bind = bind or db.engine
+    dialect = _dialect(bind)
+    if dialect == 'postgresql':
+        return True
+    if dialect != 'sqlite':
+        return False
+    if bind.url not in _fts_available:
+        try:
+            with bind.connect() as connection:
+                connection.exec_driver_sql("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)")
+                connection.exec_driver_sql("DROP TABLE IF EXISTS temp.fts5_probe")
+            _fts_available[bind.url] = True
+        except Exception:
+            logger.warning('FTS5 غير متاح في SQLite، سيتم استخدام البحث بـ LIKE')
+            _fts_available[bind.url] = False
+    return _fts_available[bind.url]
+
+
+def _upsert_document(connection, complaint_id, title, description):
+    dialect = _dialect(connection)
+    title = ' '.join(tokenize(title))
+    description = ' '.join(tokenize(description))
+    if dialect == 'sqlite':
+        connection.execute(
+            text(f"DELETE FROM {SQLITE_TABLE} WHERE complaint_id = :complaint_id"),
+            {'complaint_id': complaint_id}
+        )
+        connection.execute(
+            text(f"INSERT INTO {SQLITE_TABLE} (complaint_id, title, description) "
+                 "VALUES (:complaint_id, :title, :description)"),
+            {'complaint_id': complaint_id, 'title': title, 'description': description}
+        )
+    elif dialect == 'postgresql':
+        connection.execute(
+            text(f"INSERT INTO {POSTGRES_TABLE} (complaint_id, document) VALUES ("
+                 ":complaint_id, "
+                 "setweight(to_tsvector('simple', :title), 'A') || "
+                 "setweight(to_tsvector('simple', :description), 'B')) "
+                 "ON CONFLICT (complaint_id) DO UPDATE SET document = EXCLUDED.document"),
+            {'complaint_id': complaint_id, 'title': title, 'description': description}
+        )
+
+
+def _delete_document(connection, complaint_id):
+    dialect = _dialect(connection)
+    if dialect == 'sqlite':
+        connection.execute(
+            text(f"DELETE FROM {SQLITE_TABLE} WHERE complaint_id = :complaint_id"),
+            {'complaint_id': complaint_id}
+        )
+    elif dialect == 'postgresql':
+        connection.execute(
+            text(f"DELETE FROM {POSTGRES_TABLE} WHERE complaint_id = :complaint_id"),
+            {'complaint_id': complaint_id}
+        )
+
+
+def ensure_search_index(bind=None, backfill=True):
+    """إنشاء بنية الفهرس إن لم تكن موجودة وتعبئتها للشكاوى غير المفهرسة"""
+    bind = bind or db.engine
+    if not search_supported(bind):
+        return False
+
+    dialect = _dialect(bind)
+    with bind.begin() as connection:
+        if dialect == 'sqlite':
+            connection.exec_driver_sql(_SQLITE_CREATE)
+        else:
+            connection.exec_driver_sql(_POSTGRES_CREATE)
+            connection.exec_driver_sql(_POSTGRES_INDEX)
+
+    if backfill:
+        rebuild_search_index(bind, only_missing=True)
+    return True
+
+
+def rebuild_search_index(bind=None, only_missing=False, batch_size=500):
+    """إعادة بناء الفهرس على دفعات، يعيد عدد الشكاوى المفهرسة"""
+    bind = bind or db.engine
+    if not search_supported(bind):
+        return 0
+
+    index_table = SQLITE_TABLE if _dialect(bind) == 'sqlite' else POSTGRES_TABLE
+    complaints = Complaint.__table__
+    indexed = 0
+    last_id = ''
+
+    while True:
+        with bind.begin() as connection:
+            stmt = select(complaints.c.complaint_id, complaints.c.title, complaints.c.description) \
+                .where(complaints.c.complaint_id > last_id) \
+                .order_by(complaints.c.complaint_id) \
+                .limit(batch_size)
+            if only_missing:
+                stmt = stmt.where(complaints.c.complaint_id.not_in(
+                    select(literal_column('complaint_id')).select_from(text(index_table))
+                ))
+            rows = connection.execute(stmt).all()
+            if not rows:
+                break
+            for complaint_id, title, description in rows:
+                _upsert_document(connection, complaint_id, title, description)
+            indexed += len(rows)
+            last_id = rows[-1][0]
+
+    return indexed
+
+
+def apply_search(query, search):
+    """
+    تطبيق البحث على استعلام الشكاوى مع الحفاظ على مرشحات الصلاحيات الموجودة فيه
+
+    Returns:
+        tuple: (query, rank_ordering or None)
+    """
+    tokens = tokenize(search)
+    if not tokens:
+        return query, None
+
+    bind = db.session.get_bind()
+    if not search_supported(bind):
+        normalized = normalize_arabic(search)
+        return query.filter(
+            (Complaint.title.contains(search)) |
+            (Complaint.description.contains(search)) |
+            (Complaint.title.contains(normalized)) |
+            (Complaint.description.contains(normalized))
+        ), None
+
+    ranked, ordering = ranked_matches(_dialect(bind), tokens)
+    query = query.join(ranked, ranked.c.complaint_id == Complaint.complaint_id)
+    return query, ordering
+
+
+def ranked_matches(dialect, tokens):
+    """استعلام فرعي (complaint_id, rank) للشكاوى المطابقة مع ترتيب الصلة"""
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        ranked = select(
+            literal_column('complaint_id').label('complaint_id'),
+            literal_column(f'bm25({SQLITE_TABLE}, 0, 2.0, 1.0)').label('rank')
+        ).select_from(text(SQLITE_TABLE)).where(
+            text(f'{SQLITE_TABLE} MATCH :search_match').bindparams(search_match=match)
+        ).subquery('search_rank')
+        return ranked, ranked.c.rank.asc()
+
+    # معامل واحد مربوط يُستخدم في الترتيب والشرط معاً
+    search_query = bindparam('search_query', ' & '.join(f'{token}:*' for token in tokens))
+    ts_query = func.to_tsquery(literal_column("'simple'"), search_query)
+    document = column('document')
+    ranked = select(
+        literal_column('complaint_id').label('complaint_id'),
+        func.ts_rank(document, ts_query).label('rank')
+    ).select_from(text(POSTGRES_TABLE)).where(document.op('@@')(ts_query)).subquery('search_rank')
+    return ranked, ranked.c.rank.desc()
+
+
+event.listen(
+    Complaint.__table__, 'after_create',
+    DDL(_SQLITE_CREATE).execute_if(dialect='sqlite')
+)
+event.listen(
+    Complaint.__table__, 'after_create',
+    DDL(_POSTGRES_CREATE).execute_if(dialect='postgresql')
+)
+event.listen(
+    Complaint.__table__, 'after_create',
+    DDL(_POSTGRES_INDEX).execute_if(dialect='postgresql')
+)
+event.listen(
+    Complaint.__table__, 'before_drop',
+    DDL(f'DROP TABLE IF EXISTS {SQLITE_TABLE}').execute_if(dialect='sqlite')
+)
+event.listen(
+    Complaint.__table__, 'before_drop',
+    DDL(f'DROP TABLE IF EXISTS {POSTGRES_TABLE}').execute_if(dialect='postgresql')
+)
+
+
+@event.listens_for(Complaint, 'after_insert')
+def _index_new_complaint(mapper, connection, target):
+    if search_supported(connection.engine):
+        _upsert_document(connection, target.complaint_id, target.title, target.description)
+
+
+@event.listens_for(Complaint, 'after_update')
+def _reindex_updated_complaint(mapper, connection, target):
+    state = inspect(target)
+    if not (state.attrs.title.history.has_changes() or state.attrs.description.history.has_changes()):
+        return
+    if search_supported(connection.engine):
+        _upsert_document(connection, target.complaint_id, target.title, target.description)
+
+
+@event.listens_for(Complaint, 'after_delete')
+def _unindex_deleted_complaint(mapper, connection, target):
+    if search_supported(connection.engine):
+        _delete_document(connection, target.complaint_id)
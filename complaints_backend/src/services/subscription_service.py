@@ -1,6 +1,8 @@
 from datetime import datetime, timedelta
 from src.database.db import db
-from src.models.complaint import User, Subscription, Payment, Settings, Notification
+from src.models.complaint import User, Subscription, Payment, Notification
+from src.core.principal_cache import invalidate_principal
+from src.core.settings_registry import get_settings
 
 def create_or_extend_subscription(user_id, payment_id, reviewed_by_id):
     """
@@ -31,8 +33,7 @@ def create_or_extend_subscription(user_id, payment_id, reviewed_by_id):
         
         end_date = start_date + timedelta(days=365)
         
-        grace_period_setting = Settings.query.filter_by(key='enable_grace_period').first()
-        grace_enabled = grace_period_setting.value.lower() == 'true' if grace_period_setting else True
+        grace_enabled = get_settings().enable_grace_period
         
         new_subscription = Subscription(
             user_id=user.user_id,
@@ -56,6 +57,7 @@ def create_or_extend_subscription(user_id, payment_id, reviewed_by_id):
         db.session.add(new_subscription)
         db.session.add(notification)
         db.session.commit()
+        invalidate_principal(user.user_id)
         
         return {
             'success': True,
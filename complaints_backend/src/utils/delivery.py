@@ -0,0 +1,71 @@
+"""
+إرسال الملفات المحمية (الإيصالات) بعد التحقق من الصلاحية
+
+- FILE_DELIVERY=x-accel: يعيد Flask ترويسة X-Accel-Redirect فقط وينقل nginx الملف من موقع
+  internal (مع دعم Range والطلبات الشرطية) فلا يبقى عامل gunicorn مشغولاً طوال النقل
+- FILE_DELIVERY=flask (الافتراضي، بيئة التطوير): send_from_directory كما كان
+- في وضع x-accel يُحسب ETag و Last-Modified بنفس صيغة nginx ("<mtime>-<size>" ست عشري)
+  فتتطابق الترويسات مع ما يرسله nginx، ويُرد 304 من Flask مباشرة دون تحويل الطلب
+"""
+import mimetypes
+import os
+from datetime import datetime, timezone
+from urllib.parse import quote
+from flask import Response, request, send_from_directory
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+RECEIPTS_INTERNAL_PREFIX = os.getenv('X_ACCEL_RECEIPTS_PREFIX', '/_protected/receipts/')
+
+# الملفات المسماة ببصمة محتواها لا تتغير أبداً؛ private حتى لا تخزنها الوسائط المشتركة
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def delivery_mode():
+    return os.getenv('FILE_DELIVERY', 'flask').lower()
+
+
+def _apply_cache_control(response, immutable):
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = None
+    return response
+
+
+def _accel_response(folder, filename, internal_prefix):
+    path = safe_join(folder, filename)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+    stat = os.stat(path)
+    mtime = int(stat.st_mtime)
+
+    response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.set_etag(f'{mtime:x}-{stat.st_size:x}')
+    response.last_modified = datetime.fromtimestamp(mtime, tz=timezone.utc)
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.headers['X-Accel-Redirect'] = internal_prefix.rstrip('/') + '/' + quote(filename)
+    return response
+
+
+def send_protected_file(folder, filename, internal_prefix=RECEIPTS_INTERNAL_PREFIX, immutable=False):
+    """
+    إرسال ملف من folder بعد أن تحقق المستدعي من الصلاحية
+
+    Args:
+        internal_prefix: موقع nginx الداخلي المقابل لـ folder
+        immutable: الملف لا يتغير أبداً (اسم مبني على بصمة المحتوى)
+    """
+    if delivery_mode() != 'x-accel':
+        return _apply_cache_control(send_from_directory(folder, filename), immutable)
+
+    response = _apply_cache_control(_accel_response(folder, filename, internal_prefix), immutable)
+    response.make_conditional(request)
+    if response.status_code == 304:
+        del response.headers['X-Accel-Redirect']
+    return response
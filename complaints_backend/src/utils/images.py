@@ -0,0 +1,105 @@
+"""
+توليد نسخ مصغرة من صور الإيصالات بصيغة JPEG بدون بيانات EXIF، وإزالة البيانات
+الوصفية (EXIF/GPS/XMP) من الصورة الأصلية قبل تخزينها
+
+تعمل build_derivatives داخل عمليات منفصلة (ProcessPoolExecutor) لذلك لا يستورد
+هذا الملف شيئاً من التطبيق.
+"""
+import os
+import tempfile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# حد أعلى لعدد البكسلات قبل فك الصورة (حماية من صور الضغط المفرط)
+MAX_PIXELS = 40_000_000
+
+# جودة إعادة ترميز الأصل عند وجود بيانات وصفية
+ORIGINAL_JPEG_QUALITY = 95
+
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+
+def _save_jpeg(image, dest_path, quality):
+    # لا يُمرر exif ولا icc_profile فلا تُنسخ البيانات الوصفية للصورة الأصلية
+    _save_atomic(image, dest_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+
+
+def _save_atomic(image, dest_path, format, **options):
+    directory = os.path.dirname(dest_path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.image-', suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            image.save(output, format, **options)
+        os.replace(temp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _flatten(image):
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    if image.mode not in ('RGB', 'L'):
+        return image.convert('RGB')
+    return image
+
+
+def build_derivatives(source_path, targets):
+    """
+    targets: [(dest_path, max_edge, quality)]؛ تُبنى من الأكبر إلى الأصغر
+    على نفس الصورة المفكوكة مرة واحدة
+
+    Returns:
+        list: مسارات الملفات المكتوبة
+    """
+    written = []
+    with Image.open(source_path) as source:
+        if source.width * source.height > MAX_PIXELS:
+            raise ValueError(f'image too large: {source.width}x{source.height}')
+        largest = max(max_edge for _, max_edge, _ in targets)
+        # JPEG: فك الصورة مباشرة بمقياس مصغر بدلاً من الدقة الكاملة
+        source.draft('RGB', (largest, largest))
+        image = _flatten(ImageOps.exif_transpose(source))
+
+        for dest_path, max_edge, quality in sorted(targets, key=lambda target: -target[1]):
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            _save_jpeg(image, dest_path, quality)
+            written.append(dest_path)
+    return written
+
+
+def _has_metadata(image):
+    return bool(image.getexif()) or any(key in image.info for key in METADATA_KEYS) or bool(getattr(image, 'text', None))
+
+
+def strip_metadata(path):
+    """
+    إعادة ترميز الصورة في مكانها بدون EXIF/GPS/XMP والتعليقات النصية، مع تطبيق
+    اتجاه EXIF على البكسلات أولاً. الصورة التي لا تحمل بيانات وصفية أو التي لا
+    يتعرف عليها Pillow لا تُلمس (نوعها تحقق منه فحص MIME قبل ذلك)
+
+    Returns:
+        bool: True إن أُعيد كتابة الملف
+    """
+    try:
+        source = Image.open(path)
+    except UnidentifiedImageError:
+        return False
+    with source:
+        if source.width * source.height > MAX_PIXELS:
+            raise ValueError(f'image too large: {source.width}x{source.height}')
+        if not _has_metadata(source):
+            return False
+        format = source.format
+        image = ImageOps.exif_transpose(source)
+        options = {'icc_profile': source.info['icc_profile']} if source.info.get('icc_profile') else {}
+        if format == 'JPEG':
+            options.update(quality=ORIGINAL_JPEG_QUALITY, optimize=True)
+        _save_atomic(image, path, format, **options)
+    return True
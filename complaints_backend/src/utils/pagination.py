@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+MAX_PER_PAGE = 100
+
+
+def get_pagination_args(request, default_per_page):
+    """قراءة معاملات الترقيم من الطلب مع حد أقصى لحجم الصفحة"""
+    per_page = request.args.get('per_page', default_per_page, type=int) or default_per_page
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    use_cursor = (
+        request.args.get('pagination', '').lower() == 'cursor'
+        or 'cursor' in request.args
+    )
+    include_total = request.args.get('include_total', 'false' if use_cursor else 'true').lower() == 'true'
+    return {
+        'page': max(1, request.args.get('page', 1, type=int) or 1),
+        'per_page': per_page,
+        'use_cursor': use_cursor,
+        'cursor': request.args.get('cursor') or None,
+        'include_total': include_total
+    }
+
+
+def encode_cursor(sort_value, key_value):
+    """ترميز موضع آخر صف كمؤشر معتم (opaque)"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, key_value], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """فك ترميز المؤشر، يرفع ValueError إن كان غير صالح"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, key_value = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(sort_value), key_value
+    except Exception:
+        raise ValueError('مؤشر الصفحة غير صالح')
+
+
+def keyset_paginate(query, sort_column, key_column, cursor=None, per_page=20):
+    """
+    ترقيم بالمفتاح (keyset) تنازلياً على (sort_column, key_column)
+
+    Returns:
+        tuple: (items, next_cursor, has_more)
+    """
+    if cursor:
+        sort_value, key_value = decode_cursor(cursor)
+        query = query.filter(or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, key_column < key_value)
+        ))
+
+    rows = query.order_by(sort_column.desc(), key_column.desc()).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_cursor(
+            getattr(last, sort_column.key),
+            getattr(last, key_column.key)
+        )
+    return items, next_cursor, has_more
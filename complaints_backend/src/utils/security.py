@@ -3,6 +3,9 @@ import uuid
 import magic
 from werkzeug.utils import secure_filename
 from flask import current_app
+from src.core.metrics import observe_upload
+from src.core.ingest import ingest_content_addressed, UploadTooLarge, UnsupportedMimeType
+from src.utils.images import strip_metadata
 
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 ALLOWED_MIME_TYPES = {
@@ -116,6 +119,11 @@ def validate_and_save_file(file, upload_folder):
     """
     التحقق الشامل من الملف وحفظه بشكل آمن
     
+    يُفحص نوع MIME من أول جزء في الذاكرة ثم يُكتب الملف كتدفق مع حساب الحجم
+    و SHA-256، ويتوقف الرفع فور تجاوز الحد الأقصى. تُزال بيانات EXIF/GPS من الصورة
+    قبل حساب البصمة، واسم الملف هو بصمة المحتوى المخزن (<ab>/<sha256>.<ext>)
+    فلا يُخزن نفس الإيصال مرتين.
+    
     Returns:
         tuple: (success: bool, result: str or dict)
     """
@@ -125,23 +133,32 @@ def validate_and_save_file(file, upload_folder):
     if not validate_file_extension(file.filename):
         return False, {'error': f'نوع الملف غير مسموح. الامتدادات المسموحة: {", ".join(ALLOWED_IMAGE_EXTENSIONS)}'}
     
-    if not validate_file_size(file):
-        return False, {'error': f'حجم الملف يجب أن يكون أقل من {MAX_FILE_SIZE / (1024*1024):.0f} ميجابايت'}
+    size_error = {'error': f'حجم الملف يجب أن يكون أقل من {MAX_FILE_SIZE / (1024*1024):.0f} ميجابايت'}
+    if file.content_length and file.content_length > MAX_FILE_SIZE:
+        return False, size_error
     
     try:
-        safe_filename = generate_secure_filename(file.filename)
-        
         os.makedirs(upload_folder, exist_ok=True)
         
-        file_path = os.path.join(upload_folder, safe_filename)
-        file.save(file_path)
-        
-        if not validate_mime_type(file_path):
-            os.remove(file_path)
-            return False, {'error': 'نوع الملف غير صالح. يجب أن يكون صورة PNG أو JPEG فقط'}
-        
-        return True, {'filename': safe_filename, 'path': file_path}
+        result = ingest_content_addressed(
+            file.stream, upload_folder, max_size=MAX_FILE_SIZE, allowed_mimes=ALLOWED_MIME_TYPES,
+            sanitize=strip_metadata
+        )
         
+        observe_upload('receipt', result.size)
+        return True, {
+            'filename': result.name,
+            'path': result.path,
+            'size': result.size,
+            'sha256': result.sha256,
+            'mime': result.mime,
+            'deduplicated': result.deduplicated
+        }
+    
+    except UploadTooLarge:
+        return False, size_error
+    except UnsupportedMimeType:
+        return False, {'error': 'نوع الملف غير صالح. يجب أن يكون صورة PNG أو JPEG فقط'}
     except Exception as e:
         current_app.logger.error(f'خطأ في حفظ الملف: {str(e)}')
         return False, {'error': f'فشل في حفظ الملف: {str(e)}'}
@@ -0,0 +1,139 @@
+"""
+اختبارات سجل التدقيق ذي الكتابة المؤجلة (Write-behind Audit Logger)
+"""
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+import sys
+import os
+
+import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, AuditLog
+from src.core.audit import AuditLogger, AuditBuffer, audit_buffer
+
+
+class TestAuditLogger(unittest.TestCase):
+    """اختبار الطابور والدفعات ووضع الكتابة المتزامنة"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        interval = mock.patch.object(audit_buffer, 'flush_interval', 0.05)
+        interval.start()
+        self.addCleanup(interval.stop)
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Role(role_id=1, role_name='Trader', description='تاجر'))
+            db.session.add(Role(role_id=3, role_name='Higher Committee', description='لجنة عليا'))
+            user = User(username='audit_user', email='audit_user@test.com',
+                        password_hash=generate_password_hash('secret123'),
+                        full_name='مستخدم التدقيق', role_id=1)
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.user_id
+
+    def tearDown(self):
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_buffered_log_stays_out_of_caller_session(self):
+        """السجل المؤجل لا يُضاف لجلسة الطلب ويُكتب بعد التفريغ"""
+        with self.app.app_context():
+            written_before = audit_buffer.written
+            self.assertTrue(AuditLogger.log('login_attempt', self.user_id, 'Login successful'))
+            self.assertEqual(len(db.session.new), 0)
+
+            audit_buffer.flush()
+            self.assertEqual(audit_buffer.written, written_before + 1)
+            self.assertEqual(AuditLog.query.filter_by(action_type='login_attempt').count(), 1)
+
+    def test_must_persist_survives_caller_rollback(self):
+        """الأحداث الحرجة تُكتب فوراً عبر اتصال مستقل ولا تتأثر بتراجع المستدعي"""
+        with self.app.app_context():
+            user = db.session.get(User, self.user_id)
+            user.full_name = 'اسم لن يُحفظ'
+            AuditLogger.log_user_role_change(self.user_id, self.user_id, 'Trader', 'Technical Committee')
+            db.session.rollback()
+
+            self.assertEqual(db.session.get(User, self.user_id).full_name, 'مستخدم التدقيق')
+            self.assertEqual(AuditLog.query.filter_by(action_type='role_change').count(), 1)
+
+    def test_admin_role_change_uses_must_persist_helper(self):
+        """تغيير الدور من لوحة الإدارة يمر عبر المساعد المتزامن لا عبر جلسة الطلب"""
+        with self.app.app_context():
+            admin = User(username='audit_admin', email='audit_admin@test.com',
+                         password_hash=generate_password_hash('admin123'),
+                         full_name='مشرف التدقيق', role_id=3)
+            db.session.add(admin)
+            db.session.commit()
+            token = jwt.encode({'user_id': admin.user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                               self.app.config['SECRET_KEY'], algorithm='HS256')
+
+        with mock.patch.object(AuditLogger, 'log_user_role_change', wraps=AuditLogger.log_user_role_change) as helper:
+            response = self.client.put(f'/api/admin/users/{self.user_id}/role',
+                                       headers={'Authorization': f'Bearer {token}'},
+                                       json={'role_name': 'Higher Committee'})
+        self.assertEqual(response.status_code, 200)
+        helper.assert_called_once()
+
+        with self.app.app_context():
+            log = AuditLog.query.filter_by(action_type='role_change', affected_user_id=self.user_id).one()
+            self.assertEqual((log.old_value, log.new_value), ('Trader', 'Higher Committee'))
+            self.assertIn('مستخدم التدقيق', log.description)
+
+    def test_full_queue_drops_and_counts(self):
+        """امتلاء الطابور يسقط السجلات الزائدة ويحتسبها"""
+        buffer = AuditBuffer(maxsize=2)
+        with mock.patch.object(buffer, '_ensure_started'):
+            for _ in range(3):
+                buffer.put({'action_type': 'login_attempt'})
+
+        stats = buffer.stats()
+        self.assertEqual(stats['queue_depth'], 2)
+        self.assertEqual(stats['enqueued'], 2)
+        self.assertEqual(stats['dropped'], 1)
+
+    def test_batches_by_size(self):
+        """الدفعة تُكتب بجملة واحدة عند بلوغ حجمها"""
+        with self.app.app_context():
+            batches_before = audit_buffer.batches
+            with mock.patch.object(audit_buffer, 'batch_size', 5), \
+                    mock.patch.object(audit_buffer, 'flush_interval', 30):
+                for i in range(5):
+                    AuditLogger.log('login_attempt', self.user_id, f'Login {i}')
+                audit_buffer.flush()
+
+            self.assertEqual(audit_buffer.batches, batches_before + 1)
+            self.assertEqual(AuditLog.query.count(), 5)
+
+    def test_login_is_audited_without_request_commit(self):
+        """تسجيل الدخول يُدقق عبر الطابور"""
+        response = self.client.post('/api/login', json={'username': 'audit_user', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post('/api/login', json={'username': 'audit_user', 'password': 'secret123'})
+        self.assertEqual(response.status_code, 200)
+
+        audit_buffer.flush()
+        with self.app.app_context():
+            descriptions = sorted(log.description for log in AuditLog.query.filter_by(action_type='login_attempt'))
+        self.assertEqual(descriptions, ['Login failed', 'Login successful'])
+
+
+if __name__ == '__main__':
+    unittest.main()
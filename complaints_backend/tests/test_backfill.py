@@ -0,0 +1,151 @@
+"""
+اختبارات التعبئة التدريجية على دفعات قابلة للاستئناف
+"""
+import unittest
+from unittest import mock
+import shutil
+import tempfile
+import textwrap
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, func, inspect, select
+from src.database.backfill import DONE, Backfill, add_foreign_key, add_nullable_column, backfill_status, run_backfill
+from src.database.migrate import run_migrations
+
+
+def _items_table(metadata, with_length=False):
+    columns = [Column('item_id', Integer, primary_key=True), Column('name', String(50), nullable=False)]
+    if with_length:
+        columns.append(Column('name_length', Integer))
+    return Table('items', metadata, *columns)
+
+
+class TestBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory, 'test.db')}")
+        self.addCleanup(self.engine.dispose)
+
+        _items_table(MetaData()).create(self.engine)
+        with self.engine.begin() as connection:
+            connection.execute(_items_table(MetaData()).insert(), [
+                {'item_id': i, 'name': 'x' * i} for i in range(1, 11)
+            ])
+            add_nullable_column(connection, 'items', Column('name_length', Integer))
+        self.items = _items_table(MetaData(), with_length=True)
+
+    def _lengths(self):
+        with self.engine.connect() as connection:
+            return dict(connection.execute(select(self.items.c.item_id, self.items.c.name_length)).all())
+
+    def _backfill(self, **kwargs):
+        kwargs.setdefault('values', {'name_length': func.length(self.items.c.name)})
+        return Backfill(name='items_name_length', table=self.items, batch_size=3, pause=0, **kwargs)
+
+    def test_fills_in_batches_and_records_checkpoint(self):
+        progress = []
+        state = run_backfill(self.engine, self._backfill(), progress=progress.append)
+
+        self.assertEqual(state['status'], DONE)
+        self.assertEqual(state['rows_done'], 10)
+        self.assertEqual(state['batches'], 4)
+        self.assertEqual(self._lengths(), {i: i for i in range(1, 11)})
+        self.assertEqual([item['last_key'] for item in progress], [3, 6, 9, 10])
+
+        [checkpoint] = backfill_status(self.engine)
+        self.assertEqual((checkpoint['status'], checkpoint['rows_total'], checkpoint['last_key']), (DONE, 10, '10'))
+        self.assertIsNotNone(checkpoint['finished_at'])
+
+        # مكتملة: التشغيل التالي لا يلمس الجدول
+        self.assertEqual(run_backfill(self.engine, self._backfill(apply=self.fail))['batches'], 4)
+
+    def test_resumes_after_failure_from_last_committed_batch(self):
+        seen = []
+
+        def flaky(connection, keys):
+            seen.append(list(keys))
+            if len(seen) == 2:
+                raise RuntimeError('انقطع الاتصال')
+            return self._backfill().run_batch(connection, keys)
+
+        with self.assertRaises(RuntimeError):
+            run_backfill(self.engine, self._backfill(apply=flaky))
+        self.assertEqual(self._lengths()[4], None)
+        self.assertEqual(backfill_status(self.engine)[0]['last_key'], '3')
+
+        state = run_backfill(self.engine, self._backfill(apply=flaky))
+        self.assertTrue(state['resumed'])
+        self.assertEqual(seen[2], [4, 5, 6])
+        self.assertEqual(state['rows_done'], 10)
+        self.assertEqual(self._lengths(), {i: i for i in range(1, 11)})
+
+    def test_where_skips_filled_rows(self):
+        with self.engine.begin() as connection:
+            connection.execute(self.items.update().where(self.items.c.item_id <= 5).values(name_length=0))
+
+        state = run_backfill(self.engine, self._backfill(where=[self.items.c.name_length.is_(None)]))
+        self.assertEqual(state['rows_total'], 5)
+        self.assertEqual(state['rows_done'], 5)
+        self.assertEqual(self._lengths()[1], 0)
+        self.assertEqual(self._lengths()[6], 6)
+
+    def test_add_nullable_column_guards(self):
+        with self.engine.begin() as connection:
+            self.assertFalse(add_nullable_column(connection, 'items', Column('name_length', Integer)))
+            with self.assertRaises(ValueError):
+                add_nullable_column(connection, 'items', Column('required', Integer, nullable=False))
+
+    def test_constraint_phase_from_non_transactional_migration(self):
+        migrations = os.path.join(self.directory, 'migrations')
+        os.makedirs(migrations)
+        with open(os.path.join(migrations, '001_items_name_upper.py'), 'w') as f:
+            f.write(textwrap.dedent('''
+                from sqlalchemy import Column, Integer, MetaData, String, Table, func
+                from src.database.backfill import Backfill, add_nullable_column, create_index, run_backfill, set_not_null
+
+                TRANSACTIONAL = False
+
+                items = Table('items', MetaData(), Column('item_id', Integer, primary_key=True),
+                              Column('name', String(50)), Column('name_upper', String(50)))
+
+                def upgrade(connection):
+                    add_nullable_column(connection, 'items', Column('name_upper', String(50)))
+                    run_backfill(connection.engine, Backfill(
+                        name='001_items_name_upper', table=items, pause=0,
+                        values={'name_upper': func.upper(items.c.name)}))
+                    set_not_null(connection, 'items', 'name_upper')
+                    create_index(connection, 'idx_items_name_upper', 'items', ['name_upper'])
+            '''))
+
+        self.assertEqual(run_migrations(self.engine, migrations), ['001_items_name_upper'])
+        self.assertIn('idx_items_name_upper', {index['name'] for index in inspect(self.engine).get_indexes('items')})
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.exec_driver_sql(
+                'SELECT COUNT(*) FROM items WHERE name_upper IS NULL').scalar(), 0)
+        self.assertEqual(backfill_status(self.engine)[0]['status'], DONE)
+
+    def test_add_foreign_key_resumes_after_failed_validate(self):
+        """قيد NOT VALID بقي من محاولة سابقة يُتحقق منه بدل إعادة إضافته"""
+        def run(state):
+            connection = mock.Mock()
+            connection.dialect.name = 'postgresql'
+            connection.execute.return_value.scalar.return_value = state
+            added = add_foreign_key(connection, 'items', 'fk_items_owner', 'owner_id', 'users(user_id)')
+            statements = [str(call.args[0]) for call in connection.execute.call_args_list[1:]]
+            return added, statements
+
+        self.assertEqual(run(None), (True, [
+            'ALTER TABLE items ADD CONSTRAINT fk_items_owner FOREIGN KEY (owner_id) REFERENCES users(user_id) NOT VALID',
+            'ALTER TABLE items VALIDATE CONSTRAINT fk_items_owner'
+        ]))
+        self.assertEqual(run(False), (False, ['ALTER TABLE items VALIDATE CONSTRAINT fk_items_owner']))
+        self.assertEqual(run(True), (False, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
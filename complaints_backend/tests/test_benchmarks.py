@@ -0,0 +1,64 @@
+"""
+اختبار سريع لحزمة القياس بأحجام صغيرة جداً
+"""
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.db import db
+from src.main import app
+from src.database.migrate import migration_status
+from src.core.audit import audit_buffer
+from benchmarks.seed import SeedVolumes, seed
+from benchmarks.runner import SCENARIOS, BenchmarkContext, percentile, run_benchmarks, compare_reports
+
+
+class TestBenchmarks(unittest.TestCase):
+    """التأكد من أن التوليد والسيناريوهات تعمل وتنتج تقريراً كاملاً"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        self.app.limiter.reset()
+
+    def tearDown(self):
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+    def test_seed_and_run_all_scenarios(self):
+        volumes = SeedVolumes(traders=5, committee=2, admins=1, complaints=30, notifications=40, payments=5)
+        with self.app.app_context():
+            info = seed(volumes, progress=lambda message: None)
+            # القاعدة تُبنى بالترحيلات لا بـ create_all
+            self.assertTrue(all(item['applied_at'] for item in migration_status(db.engine)))
+
+        ctx = BenchmarkContext(self.app, info['trader_usernames'], info['committee_usernames'], info['search_terms'])
+        report = run_benchmarks(self.app, ctx, requests=2, warmup=0, progress=lambda message: None)
+
+        self.assertEqual(set(report['scenarios']), set(SCENARIOS))
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['sql_per_request'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+        comparison = compare_reports(report, report)
+        self.assertEqual(comparison['login']['p95_ms']['change_pct'], 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
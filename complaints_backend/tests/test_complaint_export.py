@@ -0,0 +1,152 @@
+"""
+اختبارات تصدير الشكاوى كتدفق CSV / XLSX
+"""
+import unittest
+import csv
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, Complaint, ComplaintCategory, ComplaintStatus
+from src.core.audit import audit_buffer
+from src.services.complaint_export import EXPORT_HEADERS, iter_csv
+
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+class TestComplaintExport(unittest.TestCase):
+    """التحقق من المرشحات والتنسيقين وثبات عدد الاستعلامات"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add_all([
+                Role(role_id=1, role_name='Trader', description='تاجر'),
+                Role(role_id=2, role_name='Technical Committee', description='لجنة فنية'),
+                Role(role_id=3, role_name='Higher Committee', description='لجنة عليا')
+            ])
+            category = ComplaintCategory(category_name='جودة المنتج')
+            new_status = ComplaintStatus(status_name='جديدة')
+            closed_status = ComplaintStatus(status_name='مغلقة')
+            admin = User(username='export_admin', email='export_admin@test.com',
+                         password_hash=generate_password_hash('x'), full_name='مشرف', role_id=3)
+            member = User(username='export_member', email='export_member@test.com',
+                          password_hash=generate_password_hash('x'), full_name='عضو اللجنة', role_id=2)
+            trader = User(username='export_trader', email='export_trader@test.com',
+                          password_hash=generate_password_hash('x'), full_name='تاجر التصدير', role_id=1)
+            db.session.add_all([category, new_status, closed_status, admin, member, trader])
+            db.session.flush()
+
+            now = datetime.utcnow()
+            for i in range(30):
+                db.session.add(Complaint(
+                    trader_id=trader.user_id,
+                    title='=HYPERLINK("x")' if i == 0 else f'شكوى {i}',
+                    description='وصف & <تفاصيل>',
+                    category_id=category.category_id,
+                    status_id=closed_status.status_id if i % 3 == 0 else new_status.status_id,
+                    submitted_at=now - timedelta(minutes=i),
+                    assigned_to_committee_id=member.user_id if i % 2 else None
+                ))
+            db.session.commit()
+            self.admin_id = admin.user_id
+            self.member_id = member.user_id
+            self.trader_id = trader.user_id
+            self.closed_status_id = closed_status.status_id
+
+    def tearDown(self):
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self, user_id):
+        token = jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def _csv(self, user_id, query=''):
+        response = self.client.get(f'/api/complaints/export?format=csv{query}', headers=self._headers(user_id))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment; filename="complaints-', response.headers['Content-Disposition'])
+        text = response.get_data().decode('utf-8')
+        self.assertTrue(text.startswith('\ufeff'))
+        return list(csv.reader(io.StringIO(text.lstrip('\ufeff'))))
+
+    def test_csv_applies_list_filters(self):
+        rows = self._csv(self.admin_id)
+        self.assertEqual(rows[0], EXPORT_HEADERS)
+        self.assertEqual(len(rows), 31)
+        self.assertEqual(rows[1][1], '\'=HYPERLINK("x")')
+        self.assertEqual(rows[1][6], 'تاجر التصدير')
+
+        closed = self._csv(self.admin_id, f'&status_id={self.closed_status_id}')
+        self.assertEqual(len(closed), 11)
+        self.assertTrue(all(row[4] == 'مغلقة' for row in closed[1:]))
+
+        assigned = self._csv(self.member_id, '&assigned_only=true')
+        self.assertEqual(len(assigned), 16)
+        self.assertTrue(all(row[7] == 'عضو اللجنة' for row in assigned[1:]))
+
+    def test_xlsx_is_valid_workbook(self):
+        response = self.client.get('/api/complaints/export?format=xlsx', headers=self._headers(self.admin_id))
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+            self.assertIn('xl/workbook.xml', archive.namelist())
+            sheet = ET.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        rows = sheet.findall(f'{SHEET_NS}sheetData/{SHEET_NS}row')
+        self.assertEqual(len(rows), 31)
+        first = [cell.findtext(f'{SHEET_NS}is/{SHEET_NS}t') for cell in rows[1]]
+        self.assertEqual(first[2], 'وصف & <تفاصيل>')
+
+    def test_export_uses_constant_number_of_queries(self):
+        """الصفوف تُقرأ باستعلام واحد مسطح بغض النظر عن عددها"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if 'FROM complaints' in statement:
+                statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            self._csv(self.admin_id)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        self.assertEqual(len(statements), 1)
+
+    def test_csv_writer_flushes_in_bounded_chunks(self):
+        rows = (('x' * 1000,) for _ in range(200))
+        chunks = list(iter_csv(rows, headers=['h']))
+        self.assertGreater(len(chunks), 2)
+        self.assertTrue(all(len(chunk) < 70 * 1024 for chunk in chunks))
+
+    def test_export_rejects_traders_and_unknown_formats(self):
+        response = self.client.get('/api/complaints/export', headers=self._headers(self.trader_id))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/api/complaints/export?format=pdf', headers=self._headers(self.admin_id))
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
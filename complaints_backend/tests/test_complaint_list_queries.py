@@ -0,0 +1,193 @@
+"""
+اختبارات عدد الاستعلامات في قائمة الشكاوى (بدون N+1)
+"""
+import unittest
+import json
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import (
+    User, Role, Complaint, ComplaintCategory, ComplaintStatus,
+    ComplaintAttachment, ComplaintComment
+)
+
+
+class TestComplaintListQueries(unittest.TestCase):
+    """اختبار ثبات عدد الاستعلامات مع زيادة حجم الصفحة"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+
+            db.session.add_all([
+                Role(role_id=1, role_name='Trader', description='تاجر'),
+                Role(role_id=2, role_name='Technical Committee', description='لجنة فنية'),
+                Role(role_id=3, role_name='Higher Committee', description='لجنة عليا')
+            ])
+            category = ComplaintCategory(category_name='جودة المنتج')
+            status = ComplaintStatus(status_name='جديدة')
+            db.session.add_all([category, status])
+
+            admin = User(
+                username='list_admin',
+                email='list_admin@test.com',
+                password_hash=generate_password_hash('admin123'),
+                full_name='مشرف القائمة',
+                role_id=3
+            )
+            member = User(
+                username='list_member',
+                email='list_member@test.com',
+                password_hash=generate_password_hash('member123'),
+                full_name='عضو اللجنة',
+                role_id=2
+            )
+            db.session.add_all([admin, member])
+            db.session.flush()
+
+            base_time = datetime.utcnow()
+            for i in range(60):
+                trader = User(
+                    username=f'list_trader_{i}',
+                    email=f'list_trader_{i}@test.com',
+                    password_hash='x',
+                    full_name=f'تاجر {i}',
+                    role_id=1
+                )
+                db.session.add(trader)
+                db.session.flush()
+
+                complaint = Complaint(
+                    trader_id=trader.user_id,
+                    title=f'شكوى {i}',
+                    description='وصف',
+                    category_id=category.category_id,
+                    status_id=status.status_id,
+                    submitted_at=base_time - timedelta(minutes=i),
+                    assigned_to_committee_id=member.user_id if i % 2 else None
+                )
+                db.session.add(complaint)
+                db.session.flush()
+
+                for j in range(i % 3):
+                    db.session.add(ComplaintAttachment(
+                        complaint_id=complaint.complaint_id,
+                        file_name=f'file_{j}.pdf',
+                        file_path=f'uploads/file_{j}.pdf'
+                    ))
+                    db.session.add(ComplaintComment(
+                        complaint_id=complaint.complaint_id,
+                        user_id=member.user_id,
+                        comment_text='تعليق'
+                    ))
+
+            db.session.commit()
+            self.admin_id = admin.user_id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self):
+        token = jwt.encode({
+            'user_id': self.admin_id,
+            'exp': datetime.utcnow() + timedelta(hours=1)
+        }, self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def _get_page(self, per_page):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.client.get(
+                f'/api/complaints?per_page={per_page}',
+                headers=self._headers()
+            )
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data), statements
+
+    def test_query_count_is_flat(self):
+        """عدد الاستعلامات لا يتغير بين صفحة من 5 وصفحة من 50"""
+        self._get_page(5)
+        small, small_statements = self._get_page(5)
+        large, large_statements = self._get_page(50)
+
+        self.assertEqual(len(small['complaints']), 5)
+        self.assertEqual(len(large['complaints']), 50)
+        self.assertEqual(len(small_statements), len(large_statements))
+
+    def test_output_matches_to_dict(self):
+        """المخرجات مطابقة تماماً لـ Complaint.to_dict()"""
+        data, _ = self._get_page(50)
+
+        with self.app.app_context():
+            expected = [
+                complaint.to_dict()
+                for complaint in Complaint.query.order_by(Complaint.submitted_at.desc()).limit(50).all()
+            ]
+
+        self.assertEqual(data['complaints'], expected)
+
+    def test_cursor_pagination_walks_all_rows(self):
+        """الترقيم بالمؤشر يمر على جميع الصفوف بنفس ترتيب الترقيم العادي"""
+        seen = []
+        url = '/api/complaints?pagination=cursor&per_page=25'
+        while True:
+            response = self.client.get(url, headers=self._headers())
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.data)
+            self.assertNotIn('total', data)
+            seen.extend(complaint['complaint_id'] for complaint in data['complaints'])
+            if not data['has_more']:
+                self.assertIsNone(data['next_cursor'])
+                break
+            url = f"/api/complaints?cursor={data['next_cursor']}&per_page=25"
+
+        with self.app.app_context():
+            expected = [
+                complaint.complaint_id
+                for complaint in Complaint.query.order_by(
+                    Complaint.submitted_at.desc(), Complaint.complaint_id.desc()
+                ).all()
+            ]
+        self.assertEqual(seen, expected)
+
+    def test_page_size_is_capped(self):
+        """حجم الصفحة محدود بحد أقصى ومؤشر غير صالح يعيد 400"""
+        response = self.client.get('/api/complaints?per_page=100000', headers=self._headers())
+        self.assertEqual(json.loads(response.data)['per_page'], 100)
+
+        response = self.client.get('/api/complaints?cursor=not-a-cursor', headers=self._headers())
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
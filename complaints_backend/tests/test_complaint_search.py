@@ -0,0 +1,152 @@
+"""
+اختبارات البحث النصي في الشكاوى مع تطبيع النص العربي
+"""
+import unittest
+import json
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from src.database.db import db
+from src.main import app
+from src.models.complaint import (
+    User, Role, Complaint, ComplaintCategory, ComplaintStatus, Subscription
+)
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import psycopg2 as postgresql_psycopg2
+from src.services.search import normalize_arabic, tokenize, rebuild_search_index, ranked_matches
+
+
+class TestComplaintSearch(unittest.TestCase):
+    """اختبار البحث بالفهرس النصي وصلاحيات التاجر"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+
+            db.session.add_all([
+                Role(role_id=1, role_name='Trader', description='تاجر'),
+                Role(role_id=3, role_name='Higher Committee', description='لجنة عليا')
+            ])
+            category = ComplaintCategory(category_name='جودة المنتج')
+            status = ComplaintStatus(status_name='جديدة')
+            admin = User(username='search_admin', email='search_admin@test.com',
+                         password_hash='x', full_name='مشرف البحث', role_id=3)
+            trader = User(username='search_trader', email='search_trader@test.com',
+                          password_hash='x', full_name='تاجر البحث', role_id=1)
+            other = User(username='search_other', email='search_other@test.com',
+                         password_hash='x', full_name='تاجر آخر', role_id=1)
+            db.session.add_all([category, status, admin, trader, other])
+            db.session.flush()
+            db.session.add(Subscription(
+                user_id=trader.user_id,
+                start_date=datetime.utcnow(),
+                end_date=datetime.utcnow() + timedelta(days=365),
+                status='active'
+            ))
+
+            def add(owner, title, description, minutes):
+                complaint = Complaint(
+                    trader_id=owner.user_id, title=title, description=description,
+                    category_id=category.category_id, status_id=status.status_id,
+                    submitted_at=datetime.utcnow() - timedelta(minutes=minutes)
+                )
+                db.session.add(complaint)
+                return complaint
+
+            add(trader, 'مشكلة في الفاتورة', 'تأخر إصدار الفاتورة الشهرية', 1)
+            add(trader, 'إغلاق المحل', 'طلب مراجعة قرار الإغلاق', 2)
+            add(other, 'الفاتورة مكررة', 'وصلت فاتورة مكررة', 3)
+            add(other, 'شكوى عامة', 'لا علاقة لها بالموضوع', 4)
+            db.session.commit()
+
+            self.admin_id = admin.user_id
+            self.trader_id = trader.user_id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _search(self, user_id, term):
+        token = jwt.encode({
+            'user_id': user_id,
+            'exp': datetime.utcnow() + timedelta(hours=1)
+        }, self.app.config['SECRET_KEY'], algorithm='HS256')
+        response = self.client.get(
+            '/api/complaints',
+            query_string={'search': term},
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [complaint['title'] for complaint in json.loads(response.data)['complaints']]
+
+    def test_normalization(self):
+        """توحيد الهمزات والتاء المربوطة والتشكيل والأرقام"""
+        self.assertEqual(normalize_arabic('إغلاقُ المحلّ'), normalize_arabic('اغلاق المحل'))
+        self.assertEqual(normalize_arabic('فاتورة'), 'فاتوره')
+        self.assertEqual(normalize_arabic('مستشفى'), 'مستشفي')
+        self.assertEqual(normalize_arabic('٢٠٢٤'), '2024')
+        self.assertEqual(tokenize('والفاتورة الشهرية'), ['فاتوره', 'شهريه'])
+
+    def test_search_ignores_spelling_variants(self):
+        """البحث يطابق بغض النظر عن الهمزة والتاء المربوطة والتشكيل"""
+        self.assertEqual(self._search(self.admin_id, 'اغلاق'), ['إغلاق المحل'])
+        self.assertEqual(
+            sorted(self._search(self.admin_id, 'فاتوره')),
+            sorted(['مشكلة في الفاتورة', 'الفاتورة مكررة'])
+        )
+        self.assertEqual(self._search(self.admin_id, 'الإِغْلاق'), ['إغلاق المحل'])
+
+    def test_title_matches_rank_first(self):
+        """المطابقة في العنوان أعلى ترتيباً من المطابقة في الوصف"""
+        with self.app.app_context():
+            complaint = Complaint.query.filter_by(title='شكوى عامة').first()
+            complaint.description = 'مراجعة الإغلاق المؤقت'
+            db.session.commit()
+
+        self.assertEqual(self._search(self.admin_id, 'الاغلاق'), ['إغلاق المحل', 'شكوى عامة'])
+
+    def test_trader_sees_only_own_matches(self):
+        """التاجر لا يرى نتائج شكاوى غيره"""
+        self.assertEqual(self._search(self.trader_id, 'الفاتورة'), ['مشكلة في الفاتورة'])
+
+    def test_index_follows_updates(self):
+        """تعديل العنوان يحدّث الفهرس وإعادة البناء لا تكرر المستندات"""
+        with self.app.app_context():
+            complaint = Complaint.query.filter_by(title='شكوى عامة').first()
+            complaint.title = 'انقطاع الكهرباء'
+            db.session.commit()
+            self.assertEqual(rebuild_search_index(), 4)
+
+        self.assertEqual(self._search(self.admin_id, 'الكهرباء'), ['انقطاع الكهرباء'])
+        self.assertEqual(self._search(self.admin_id, 'عامة'), [])
+
+    def test_postgres_query_binds_search_terms(self):
+        """استعلام PostgreSQL يربط نص البحث في الترتيب والشرط (لا يبقى :search_query خاماً)"""
+        ranked, _ = ranked_matches('postgresql', tokenize('الفاتورة الشهرية'))
+        compiled = select(ranked).compile(dialect=postgresql_psycopg2.dialect())
+        sql = str(compiled)
+
+        self.assertNotIn(':search_query', sql)
+        self.assertEqual(sql.count('%(search_query)s'), 2)
+        self.assertIn('ts_rank(document, to_tsquery(', sql)
+        self.assertIn('document @@ to_tsquery(', sql)
+        self.assertEqual(compiled.params, {'search_query': 'فاتوره:* & شهريه:*'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+"""
+اختبارات عدادات لوحة المعلومات (Dashboard Counters)
+"""
+import unittest
+from unittest import mock
+import json
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.database.db import db
+from src.main import app
+from src.models.complaint import (
+    User, Role, Complaint, ComplaintCategory, ComplaintStatus, ComplaintStatsCounter
+)
+from src.services import dashboard_stats
+from src.services.dashboard_stats import reconcile_dashboard_stats
+
+
+class TestDashboardStats(unittest.TestCase):
+    """اختبار تحديث العدادات داخل المعاملة والمطابقة"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+
+            db.session.add_all([
+                Role(role_id=1, role_name='Trader', description='تاجر'),
+                Role(role_id=2, role_name='Technical Committee', description='لجنة فنية')
+            ])
+            self.categories = [ComplaintCategory(category_name='غش تجاري'), ComplaintCategory(category_name='تسعير')]
+            self.statuses = [ComplaintStatus(status_name='جديدة'), ComplaintStatus(status_name='مكتملة')]
+            member = User(username='stats_member', email='stats_member@test.com',
+                          password_hash='x', full_name='عضو', role_id=2)
+            trader = User(username='stats_trader', email='stats_trader@test.com',
+                          password_hash='x', full_name='تاجر', role_id=1)
+            db.session.add_all(self.categories + self.statuses + [member, trader])
+            db.session.flush()
+
+            for i in range(9):
+                db.session.add(Complaint(
+                    trader_id=trader.user_id,
+                    title=f'شكوى {i}',
+                    description='وصف',
+                    category_id=self.categories[i % 2].category_id,
+                    status_id=self.statuses[0].status_id,
+                    priority='High' if i % 3 == 0 else None,
+                    submitted_at=datetime.utcnow() - timedelta(days=i * 10)
+                ))
+            db.session.commit()
+
+            self.member_id = member.user_id
+            self.trader_id = trader.user_id
+            self.done_status_id = self.statuses[1].status_id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self):
+        token = jwt.encode({
+            'user_id': self.member_id,
+            'exp': datetime.utcnow() + timedelta(hours=1)
+        }, self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def _legacy_stats(self):
+        """الإحصائيات محسوبة بالطريقة القديمة من جدول الشكاوى"""
+        status_stats = db.session.query(
+            ComplaintStatus.status_name, db.func.count(Complaint.complaint_id)
+        ).join(Complaint).group_by(ComplaintStatus.status_name).all()
+        category_stats = db.session.query(
+            ComplaintCategory.category_name, db.func.count(Complaint.complaint_id)
+        ).join(Complaint).group_by(ComplaintCategory.category_name).all()
+        priority_stats = db.session.query(
+            Complaint.priority, db.func.count(Complaint.complaint_id)
+        ).group_by(Complaint.priority).all()
+        return {
+            'total_complaints': Complaint.query.count(),
+            'status': sorted(status_stats),
+            'category': sorted(category_stats),
+            'priority': sorted(priority_stats)
+        }
+
+    def _get_stats(self):
+        response = self.client.get('/api/dashboard/stats', headers=self._headers())
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        return {
+            'total_complaints': data['total_complaints'],
+            'recent_complaints': data['recent_complaints'],
+            'status': sorted((d['status'], d['count']) for d in data['status_distribution']),
+            'category': sorted((d['category'], d['count']) for d in data['category_distribution']),
+            'priority': sorted((d['priority'], d['count']) for d in data['priority_distribution'])
+        }
+
+    def test_counters_match_aggregates(self):
+        """العدادات تطابق الاستعلامات التجميعية بما فيها الأولوية الافتراضية"""
+        stats = self._get_stats()
+        with self.app.app_context():
+            expected = self._legacy_stats()
+
+        self.assertEqual(stats['total_complaints'], 9)
+        self.assertEqual(stats['recent_complaints'], 3)
+        self.assertEqual(stats['status'], expected['status'])
+        self.assertEqual(stats['category'], expected['category'])
+        self.assertEqual(stats['priority'], expected['priority'])
+        self.assertIn(('Medium', 6), stats['priority'])
+
+    def test_status_change_moves_counter(self):
+        """تغيير الحالة عبر الواجهة ينقل العداد بين الحالتين"""
+        with self.app.app_context():
+            complaint_id = Complaint.query.first().complaint_id
+
+        response = self.client.put(
+            f'/api/complaints/{complaint_id}/status',
+            headers=self._headers(),
+            json={'status_id': self.done_status_id}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        stats = self._get_stats()
+        self.assertEqual(stats['status'], sorted([('جديدة', 8), ('مكتملة', 1)]))
+        with self.app.app_context():
+            self.assertEqual(reconcile_dashboard_stats()['drift'], [])
+
+    def test_rollback_discards_counter_changes(self):
+        """التراجع عن المعاملة يلغي تحديث العدادات"""
+        with self.app.app_context():
+            complaint = Complaint.query.first()
+            complaint.priority = 'Low'
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(reconcile_dashboard_stats()['drift'], [])
+
+    def test_read_does_not_scan_complaints(self):
+        """قراءة الإحصائيات لا تستعلم من جدول الشكاوى"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        self._get_stats()
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            self._get_stats()
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertFalse([s for s in statements if 'FROM complaints' in s])
+
+    def test_reconcile_repairs_drift(self):
+        """المطابقة تكتشف الفروقات وتصححها"""
+        with self.app.app_context():
+            ComplaintStatsCounter.query.filter_by(dimension='total').update({'count': 1})
+            db.session.commit()
+
+            result = reconcile_dashboard_stats(apply=False)
+            self.assertEqual(result['drift'], [
+                {'dimension': 'total', 'bucket': 'all', 'expected': 9, 'stored': 1}
+            ])
+
+            self.assertEqual(len(reconcile_dashboard_stats()['drift']), 1)
+            self.assertEqual(reconcile_dashboard_stats()['drift'], [])
+
+        self.assertEqual(self._get_stats()['total_complaints'], 9)
+
+    def test_reconcile_keeps_concurrent_changes(self):
+        """شكوى تُنشأ بين المسح وتطبيق التصحيح لا تضيع من العدادات"""
+        with self.app.app_context():
+            ComplaintStatsCounter.query.filter_by(dimension='total').update({'count': 1})
+            db.session.commit()
+            engine = db.engine
+            stored_counters = dashboard_stats._stored_counters
+            category_id = ComplaintCategory.query.first().category_id
+            status_id = ComplaintStatus.query.first().status_id
+
+            def arrives_before_fix(session, lock=False):
+                if lock:
+                    with Session(engine) as other:
+                        other.add(Complaint(trader_id=self.trader_id, title='شكوى جديدة', description='وصف',
+                                            category_id=category_id, status_id=status_id,
+                                            submitted_at=datetime.utcnow()))
+                        other.commit()
+                return stored_counters(session, lock)
+
+            with mock.patch.object(dashboard_stats, '_stored_counters', side_effect=arrives_before_fix):
+                result = reconcile_dashboard_stats()
+
+            self.assertEqual(result['drift'], [
+                {'dimension': 'total', 'bucket': 'all', 'expected': 10, 'stored': 2}
+            ])
+            self.assertEqual(reconcile_dashboard_stats(apply=False)['drift'], [])
+
+        self.assertEqual(self._get_stats()['total_complaints'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
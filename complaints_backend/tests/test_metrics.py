@@ -0,0 +1,106 @@
+"""
+اختبارات نقطة /metrics ومقاييس Prometheus
+"""
+import unittest
+import runpy
+import subprocess
+import shutil
+import tempfile
+import sys
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import create_engine, text
+from prometheus_client import REGISTRY
+from src.database.db import db
+from src.main import app, pool_options
+from src.core.audit import audit_buffer
+from src.core.metrics import TimedQueuePool
+
+
+def _sample(name, labels=None):
+    return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+
+class TestMetrics(unittest.TestCase):
+    """التحقق من الهستوغرامات والعدادات وتجميعها بين العمليات"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def tearDown(self):
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_request_latency_labelled_by_endpoint_and_status(self):
+        labels = {'blueprint': 'complaint', 'endpoint': 'complaint.get_categories', 'method': 'GET', 'status': '401'}
+        before = _sample('allajnah_http_request_duration_seconds_count', labels)
+
+        self.assertEqual(self.client.get('/api/categories').status_code, 401)
+        self.client.delete('/api/categories')
+
+        self.assertEqual(_sample('allajnah_http_request_duration_seconds_count', labels), before + 1)
+        self.assertEqual(_sample('allajnah_http_requests_in_progress', {'blueprint': 'complaint'}), 0)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        body = response.get_data(as_text=True)
+        self.assertIn('endpoint="complaint.get_categories"', body)
+        self.assertIn('endpoint="<unmatched>"', body)
+        self.assertNotIn('endpoint="metrics"', body)
+
+    def test_pool_checkout_wait_is_observed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'pool.db')}", poolclass=TimedQueuePool)
+        before = _sample('allajnah_db_pool_checkout_wait_seconds_count')
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+        engine.dispose()
+        self.assertEqual(_sample('allajnah_db_pool_checkout_wait_seconds_count'), before + 1)
+
+    def test_pool_covers_every_gunicorn_thread(self):
+        """كل خيط في العامل يجد اتصالاً دون انتظار"""
+        threads = runpy.run_path(os.path.join(os.path.dirname(BACKEND_DIR), 'gunicorn.conf.py'))['threads']
+        self.assertIs(pool_options['poolclass'], TimedQueuePool)
+        self.assertGreaterEqual(pool_options['pool_size'], threads)
+
+    def test_sqlite_keeps_default_pool(self):
+        """قاعدة SQLite المحلية لا تُفرض عليها إعدادات مجمع الخادم"""
+        with self.app.app_context():
+            self.assertEqual(db.engine.dialect.name, 'sqlite')
+            self.assertNotIsInstance(db.engine.pool, TimedQueuePool)
+
+    def test_multiprocess_store_aggregates_workers(self):
+        """قيم العمليات المنفصلة تُجمع من ملفات المجلد المشترك"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory)
+        worker = 'from src.core.metrics import observe_upload; observe_upload("receipt", 2048)'
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', worker], cwd=BACKEND_DIR, env=env, check=True)
+
+        reader = 'import sys; from src.core.metrics import render_metrics; sys.stdout.write(render_metrics().decode())'
+        output = subprocess.run(
+            [sys.executable, '-c', reader], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+        ).stdout
+        self.assertIn('allajnah_upload_bytes_count{kind="receipt"} 2.0', output)
+        self.assertIn('allajnah_upload_bytes_sum{kind="receipt"} 4096.0', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+اختبارات مشغّل الترحيلات المرقّمة
+"""
+import unittest
+import shutil
+import subprocess
+import tempfile
+import textwrap
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, inspect, text
+from src.main import app
+from src.database.migrate import discover, migration_status, run_migrations
+
+
+class TestMigrationRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory, 'test.db')}")
+        self.addCleanup(self.engine.dispose)
+        self.migrations = os.path.join(self.directory, 'migrations')
+        os.makedirs(self.migrations)
+
+    def _write(self, filename, body):
+        with open(os.path.join(self.migrations, filename), 'w') as f:
+            f.write(textwrap.dedent(body))
+
+    def _tables(self):
+        return set(inspect(self.engine).get_table_names())
+
+    def test_applies_pending_in_order_once(self):
+        self._write('010_second.py', '''
+            from sqlalchemy import text
+            def upgrade(connection):
+                connection.execute(text("INSERT INTO items (name) VALUES ('from 010')"))
+        ''')
+        self._write('002_first.py', '''
+            from sqlalchemy import text
+            def upgrade(connection):
+                connection.execute(text("CREATE TABLE items (name VARCHAR(20))"))
+        ''')
+        self._write('notes.py', 'raise RuntimeError("not a migration")\n')
+
+        self.assertEqual(run_migrations(self.engine, self.migrations), ['002_first', '010_second'])
+        self.assertEqual(run_migrations(self.engine, self.migrations), [])
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute(text('SELECT COUNT(*) FROM items')).scalar(), 1)
+
+        status = migration_status(self.engine, self.migrations)
+        self.assertEqual([item['version'] for item in status], ['002', '010'])
+        self.assertTrue(all(item['applied_at'] for item in status))
+
+    def test_failed_migration_rolls_back_and_stops(self):
+        self._write('001_create.py', '''
+            from sqlalchemy import text
+            def upgrade(connection):
+                connection.execute(text("CREATE TABLE items (name VARCHAR(20))"))
+        ''')
+        self._write('002_broken.py', '''
+            from sqlalchemy import text
+            def upgrade(connection):
+                connection.execute(text("INSERT INTO items (name) VALUES ('partial')"))
+                connection.execute(text("INSERT INTO missing_table VALUES (1)"))
+        ''')
+        self._write('003_after.py', '''
+            from sqlalchemy import text
+            def upgrade(connection):
+                connection.execute(text("CREATE TABLE after_broken (id INTEGER)"))
+        ''')
+
+        with self.assertRaises(Exception):
+            run_migrations(self.engine, self.migrations)
+
+        status = {item['version']: item['applied_at'] for item in migration_status(self.engine, self.migrations)}
+        self.assertIsNotNone(status['001'])
+        self.assertIsNone(status['002'])
+        self.assertIsNone(status['003'])
+        self.assertNotIn('after_broken', self._tables())
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute(text('SELECT COUNT(*) FROM items')).scalar(), 0)
+
+    def test_duplicate_versions_are_rejected(self):
+        self._write('001_a.py', 'def upgrade(connection):\n    pass\n')
+        self._write('001_b.py', 'def upgrade(connection):\n    pass\n')
+        with self.assertRaises(ValueError):
+            discover(self.migrations)
+
+    def test_project_migrations_build_schema_from_empty_database(self):
+        with app.app_context():
+            applied = run_migrations(self.engine)
+        self.assertEqual(applied[0], '000_baseline')
+        self.assertEqual(applied, [f"{m.version}_{m.name}" for m in discover()])
+
+        tables = self._tables()
+        self.assertTrue({'complaints', 'notifications', 'schema_migrations', 'complaints_fts'} <= tables)
+        indexes = {index['name'] for index in inspect(self.engine).get_indexes('complaints')}
+        self.assertIn('idx_complaints_trader_submitted', indexes)
+        # made redundant by the composite index in 002
+        self.assertNotIn('idx_complaints_trader_id', indexes)
+
+        with app.app_context():
+            self.assertEqual(run_migrations(self.engine), [])
+
+    def test_cli_runs_before_metrics_directory_exists(self):
+        """أمر الحاوية يشغّل الترحيلات قبل أن ينشئ gunicorn مجلد PROMETHEUS_MULTIPROC_DIR"""
+        backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ,
+                   PROMETHEUS_MULTIPROC_DIR=os.path.join(self.directory, 'missing_metrics_dir'),
+                   DATABASE_URL=f"sqlite:///{os.path.join(self.directory, 'cli.db')}")
+        result = subprocess.run(
+            [sys.executable, os.path.join(backend, 'src', 'database', 'migrate.py')],
+            cwd=os.path.dirname(backend), env=env, capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertFalse(os.path.exists(env['PROMETHEUS_MULTIPROC_DIR']))
+
+        engine = create_engine(env['DATABASE_URL'])
+        self.addCleanup(engine.dispose)
+        self.assertEqual(
+            [item['applied_at'] is not None for item in migration_status(engine)],
+            [True] * len(discover())
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+"""
+اختبارات عدادات الإشعارات غير المقروءة والقراءة الجماعية
+"""
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, Notification, NotificationUnreadCounter
+from src.core.audit import audit_buffer
+from src.services.notifications import fanout_worker, notify_roles
+from src.services import notification_counters
+from src.services.notification_counters import add_unread, get_unread_count, reconcile_unread_counters
+from src.utils.pagination import encode_cursor
+
+
+class TestNotificationCounters(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Role(role_id=3, role_name='Higher Committee', description='لجنة عليا'))
+            users = [
+                User(username=f'counter_{name}', email=f'counter_{name}@test.com',
+                     password_hash=generate_password_hash('x'), full_name=name, role_id=3)
+                for name in ('first', 'second')
+            ]
+            db.session.add_all(users)
+            db.session.commit()
+            self.user_id, self.other_id = (user.user_id for user in users)
+
+            base = datetime.utcnow() - timedelta(hours=1)
+            db.session.add_all([
+                Notification(user_id=self.user_id, message=f'إشعار {i}', type='test',
+                             created_at=base + timedelta(minutes=i))
+                for i in range(5)
+            ])
+            db.session.commit()
+            self.ids = [n.notification_id for n in Notification.query.order_by(Notification.created_at)]
+
+    def tearDown(self):
+        fanout_worker.join()
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self):
+        token = jwt.encode({'user_id': self.user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def test_counter_follows_orm_and_core_writes(self):
+        with self.app.app_context():
+            self.assertEqual(get_unread_count(self.user_id), 5)
+
+            notification = db.session.get(Notification, self.ids[0])
+            notification.is_read = True
+            db.session.commit()
+            self.assertEqual(get_unread_count(self.user_id), 4)
+
+            db.session.delete(db.session.get(Notification, self.ids[1]))
+            db.session.commit()
+            self.assertEqual(get_unread_count(self.user_id), 3)
+
+            notify_roles(['Higher Committee'], 'توزيع', 'fanout')
+            db.session.rollback()
+            self.assertEqual(get_unread_count(self.user_id), 3)
+
+            notify_roles(['Higher Committee'], 'توزيع', 'fanout')
+            db.session.commit()
+            self.assertEqual(get_unread_count(self.user_id), 4)
+            self.assertEqual(get_unread_count(self.other_id), 1)
+            self.assertEqual(reconcile_unread_counters(apply=False)['drift'], [])
+
+    def test_listing_reads_counter_without_count_query(self):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.lower())
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.client.get('/api/notifications?per_page=2&pagination=cursor', headers=self._headers())
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['unread_count'], 5)
+        self.assertFalse([s for s in statements if 'count(' in s and 'from notifications' in s])
+
+    def test_bulk_read_by_ids_and_cursor(self):
+        response = self.client.put('/api/notifications/read', headers=self._headers(),
+                                   json={'ids': self.ids[:2] + ['missing']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['updated'], 2)
+        self.assertEqual(response.get_json()['unread_count'], 3)
+
+        # repeating the same ids changes nothing
+        again = self.client.put('/api/notifications/read', headers=self._headers(), json={'ids': self.ids[:2]})
+        self.assertEqual(again.get_json()['updated'], 0)
+
+        with self.app.app_context():
+            third = db.session.get(Notification, self.ids[3])
+            cursor = encode_cursor(third.created_at, third.notification_id)
+        response = self.client.put('/api/notifications/read', headers=self._headers(), json={'before': cursor})
+        self.assertEqual(response.get_json()['updated'], 2)
+        self.assertEqual(response.get_json()['unread_count'], 1)
+
+        self.assertEqual(self.client.put('/api/notifications/read', headers=self._headers(), json={}).status_code, 400)
+        self.assertEqual(self.client.put('/api/notifications/read', headers=self._headers(),
+                                         json={'before': 'not-a-cursor'}).status_code, 400)
+
+        all_read = self.client.put('/api/notifications/mark-all-read', headers=self._headers())
+        self.assertEqual(all_read.status_code, 200)
+        with self.app.app_context():
+            self.assertEqual(get_unread_count(self.user_id), 0)
+            self.assertEqual(reconcile_unread_counters(apply=False)['drift'], [])
+
+    def test_reconcile_repairs_drift(self):
+        with self.app.app_context():
+            db.session.get(NotificationUnreadCounter, self.user_id).unread_count = 42
+            db.session.add(NotificationUnreadCounter(user_id=self.other_id, unread_count=3))
+            db.session.commit()
+
+            result = reconcile_unread_counters()
+            self.assertTrue(result['success'])
+            self.assertEqual(
+                sorted((item['user_id'], item['expected'], item['stored']) for item in result['drift']),
+                sorted([(self.user_id, 5, 42), (self.other_id, 0, 3)])
+            )
+            self.assertEqual(get_unread_count(self.user_id), 5)
+            self.assertEqual(get_unread_count(self.other_id), 0)
+            self.assertEqual(reconcile_unread_counters()['drift'], [])
+
+    def test_reconcile_keeps_concurrent_changes(self):
+        """إشعار يصل بين المسح وتطبيق التصحيح لا يضيع من العداد"""
+        with self.app.app_context():
+            db.session.get(NotificationUnreadCounter, self.user_id).unread_count = 42
+            db.session.commit()
+            engine = db.engine
+            reconcile_user = notification_counters._reconcile_user
+
+            def arrives_before_fix(connection, user_id):
+                with engine.begin() as other:
+                    other.execute(Notification.__table__.insert().values(
+                        notification_id='concurrent', user_id=user_id, message='جديد', type='test',
+                        is_read=False, created_at=datetime.utcnow()))
+                    add_unread(other, [user_id])
+                return reconcile_user(connection, user_id)
+
+            with mock.patch.object(notification_counters, '_reconcile_user', side_effect=arrives_before_fix):
+                result = reconcile_unread_counters()
+
+            self.assertEqual(result['drift'], [{'user_id': self.user_id, 'expected': 6, 'stored': 43}])
+            self.assertEqual(get_unread_count(self.user_id), 6)
+
+if __name__ == '__main__':
+    unittest.main()
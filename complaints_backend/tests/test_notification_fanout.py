@@ -0,0 +1,152 @@
+"""
+اختبارات توزيع الإشعارات على أعضاء اللجان (Fan-out)
+"""
+import threading
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from sqlalchemy import event
+from src.database.db import db
+from src.main import app
+from src.models.complaint import (
+    User, Role, ComplaintCategory, ComplaintStatus, Subscription, Notification
+)
+from src.services.notifications import (
+    fanout_worker, get_role_user_ids, invalidate_role_recipients, role_recipients_cache
+)
+
+
+class TestNotificationFanout(unittest.TestCase):
+    """اختبار ثبات زمن تقديم الشكوى مع زيادة عدد أعضاء اللجنة"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        invalidate_role_recipients()
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+
+            db.session.add_all([
+                Role(role_id=1, role_name='Trader', description='تاجر'),
+                Role(role_id=2, role_name='Technical Committee', description='لجنة فنية'),
+                Role(role_id=3, role_name='Higher Committee', description='لجنة عليا')
+            ])
+            category = ComplaintCategory(category_name='غش تجاري')
+            db.session.add_all([category, ComplaintStatus(status_name='جديدة')])
+            trader = User(username='fanout_trader', email='fanout_trader@test.com',
+                          password_hash='x', full_name='تاجر', role_id=1)
+            db.session.add(trader)
+            db.session.flush()
+            db.session.add(Subscription(
+                user_id=trader.user_id,
+                start_date=datetime.utcnow(),
+                end_date=datetime.utcnow() + timedelta(days=365),
+                status='active'
+            ))
+            db.session.commit()
+
+            self.trader_id = trader.user_id
+            self.category_id = category.category_id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        invalidate_role_recipients()
+
+    def _add_members(self, count, role_id=2, prefix='member'):
+        with self.app.app_context():
+            start = User.query.filter_by(role_id=role_id).count()
+            db.session.add_all([
+                User(username=f'{prefix}_{i}', email=f'{prefix}_{i}@test.com',
+                     password_hash='x', full_name=f'عضو {i}', role_id=role_id)
+                for i in range(start, start + count)
+            ])
+            db.session.commit()
+
+    def _create_complaint(self):
+        token = jwt.encode({
+            'user_id': self.trader_id,
+            'exp': datetime.utcnow() + timedelta(hours=1)
+        }, self.app.config['SECRET_KEY'], algorithm='HS256')
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            # only statements issued by the request itself, not by the fan-out worker
+            if threading.current_thread() is threading.main_thread():
+                statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = self.client.post(
+                '/api/complaints',
+                headers={'Authorization': f'Bearer {token}'},
+                json={'title': 'شكوى', 'description': 'وصف', 'category_id': self.category_id}
+            )
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertEqual(response.status_code, 201)
+        return response, [s for s in statements if 'notifications' in s]
+
+    def test_single_insert_for_all_members(self):
+        """كل الإشعارات تُكتب بجملة INSERT واحدة مهما زاد عدد الأعضاء"""
+        self._add_members(3)
+        _, small = self._create_complaint()
+        self._add_members(27)
+        _, large = self._create_complaint()
+
+        self.assertEqual(len(small), 1)
+        self.assertEqual(len(large), 1)
+        with self.app.app_context():
+            self.assertEqual(Notification.query.filter_by(type='new_complaint').count(), 33)
+
+    def test_recipient_index_is_cached_and_invalidated(self):
+        """فهرس المستلمين يُخزن ويُبطل عند إضافة عضو أو تغيير دوره"""
+        self._add_members(2)
+        with self.app.app_context():
+            self.assertEqual(len(get_role_user_ids(['Technical Committee'])), 2)
+            self.assertIsNotNone(role_recipients_cache.get('Technical Committee'))
+
+        self._add_members(1)
+        with self.app.app_context():
+            self.assertIsNone(role_recipients_cache.get('Technical Committee'))
+            self.assertEqual(len(get_role_user_ids(['Technical Committee'])), 3)
+
+            member = User.query.filter_by(role_id=2).first()
+            member.role_id = 3
+            db.session.commit()
+            self.assertEqual(len(get_role_user_ids(['Technical Committee'])), 2)
+            self.assertEqual(len(get_role_user_ids(['Technical Committee', 'Higher Committee'])), 3)
+
+    def test_async_mode_defers_writes_until_commit(self):
+        """الوضع غير المتزامن يكتب الإشعارات في الخلفية بعد الـ commit"""
+        self._add_members(5)
+        with mock.patch.dict(os.environ, {'NOTIFY_FANOUT_ASYNC': 'true'}):
+            _, statements = self._create_complaint()
+        fanout_worker.join()
+
+        self.assertEqual(statements, [])
+        with self.app.app_context():
+            self.assertEqual(Notification.query.filter_by(type='new_complaint').count(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+اختبارات سياسات الاحتفاظ بالإشعارات وأرشفتها
+"""
+import unittest
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, Notification, NotificationArchive
+from src.core.audit import audit_buffer
+from src.services.notifications import fanout_worker
+from src.services.notification_counters import get_unread_count, reconcile_unread_counters
+from src.services.notification_retention import parse_policies, purge_notifications
+
+
+class TestNotificationRetention(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        self.now = datetime.utcnow()
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Role(role_id=3, role_name='Higher Committee', description='لجنة عليا'))
+            user = User(username='retention_user', email='retention_user@test.com',
+                        password_hash=generate_password_hash('x'), full_name='مستخدم', role_id=3)
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.user_id
+
+            rows = [
+                ('قديم مقروء 1', True, 200),
+                ('قديم مقروء 2', True, 120),
+                ('حديث مقروء', True, 10),
+                ('قديم غير مقروء', False, 400),
+                ('غير مقروء', False, 200),
+            ]
+            db.session.add_all([
+                Notification(user_id=self.user_id, message=message, type='test', is_read=is_read,
+                             created_at=self.now - timedelta(days=days))
+                for message, is_read, days in rows
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        fanout_worker.join()
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _hot_messages(self):
+        return {n.message for n in Notification.query.all()}
+
+    def test_archives_old_rows_in_batches_per_policy(self):
+        with self.app.app_context():
+            result = purge_notifications(batch_size=1, now=self.now)
+            self.assertTrue(result['success'])
+            self.assertEqual(result['by_policy'], {'read_90d_archive': 2, 'unread_365d_archive': 1})
+            self.assertEqual(result['metrics']['rows_moved'], 3)
+            self.assertGreaterEqual(result['metrics']['batches'], 3)
+
+            self.assertEqual(self._hot_messages(), {'حديث مقروء', 'غير مقروء'})
+            archived = {a.message: a for a in NotificationArchive.query.all()}
+            self.assertEqual(set(archived), {'قديم مقروء 1', 'قديم مقروء 2', 'قديم غير مقروء'})
+            self.assertFalse(archived['قديم غير مقروء'].is_read)
+            self.assertEqual(archived['قديم غير مقروء'].user_id, self.user_id)
+
+            # العداد أُنقص بالإشعار غير المقروء المؤرشف دون انحراف
+            self.assertEqual(get_unread_count(self.user_id), 1)
+            self.assertEqual(reconcile_unread_counters(apply=False)['drift'], [])
+
+            # تشغيل ثانٍ لا يجد شيئاً
+            self.assertEqual(purge_notifications(now=self.now)['metrics']['rows_moved'], 0)
+
+    def test_delete_policy_does_not_archive(self):
+        with self.app.app_context():
+            result = purge_notifications(policies=parse_policies('all:100:delete'), now=self.now)
+            self.assertEqual(result['by_policy'], {'all_100d_delete': 4})
+            self.assertEqual(self._hot_messages(), {'حديث مقروء'})
+            self.assertEqual(NotificationArchive.query.count(), 0)
+            self.assertEqual(get_unread_count(self.user_id), 0)
+
+    def test_expired_archive_rows_are_dropped(self):
+        with self.app.app_context():
+            db.session.add_all([
+                NotificationArchive(notification_id='expired', user_id=self.user_id, message='منتهي',
+                                    created_at=self.now - timedelta(days=800)),
+                NotificationArchive(notification_id='kept', user_id=self.user_id, message='باقٍ',
+                                    created_at=self.now - timedelta(days=100)),
+            ])
+            db.session.commit()
+
+            result = purge_notifications(policies=[], now=self.now)
+            self.assertEqual(result['archive_expired'], 1)
+            self.assertEqual([a.notification_id for a in NotificationArchive.query.all()], ['kept'])
+
+    def test_listing_reads_hot_table_only(self):
+        with self.app.app_context():
+            purge_notifications(now=self.now)
+        token = jwt.encode({'user_id': self.user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           self.app.config['SECRET_KEY'], algorithm='HS256')
+        response = self.client.get('/api/notifications', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual({n['message'] for n in data['notifications']}, {'حديث مقروء', 'غير مقروء'})
+        self.assertEqual(data['unread_count'], 1)
+
+    def test_invalid_policies_are_rejected(self):
+        for spec in ('read:90', 'seen:90:archive', 'read:0:archive', 'read:x:delete', 'read:90:move'):
+            with self.assertRaises(ValueError):
+                parse_policies(spec)
+        self.assertEqual(parse_policies(''), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
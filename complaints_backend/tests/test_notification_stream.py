@@ -0,0 +1,189 @@
+"""
+اختبارات بث الإشعارات (SSE) وموزع الأحداث بين العمليات
+"""
+import unittest
+from unittest import mock
+import json
+import shutil
+import tempfile
+import sys
+import os
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, Notification
+from src.core.audit import audit_buffer
+from src.core.pubsub import PubSubHub
+from src.services.notifications import fanout_worker, notify_roles
+
+
+def _parse(chunk):
+    event = {}
+    for line in chunk.decode('utf-8').strip().splitlines():
+        field, _, value = line.partition(': ')
+        event.setdefault(field, value)
+    if 'data' in event:
+        event['data'] = json.loads(event['data'])
+    return event
+
+
+class TestPubSubTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_signal_reaches_other_hub_through_socket_directory(self):
+        worker = PubSubHub(directory=self.directory)
+        publisher = PubSubHub(directory=self.directory)
+        self.addCleanup(worker.close)
+        self.addCleanup(publisher.close)
+
+        subscription = worker.subscribe('user-1')
+        other = worker.subscribe('user-2')
+        publisher.publish(['user-1', 'user-1'], 'notification')
+
+        self.assertEqual(subscription.wait(timeout=2), {'notification'})
+        self.assertEqual(other.wait(timeout=0.05), set())
+        self.assertEqual(worker.stats()['received'], 1)
+
+    def test_dead_process_socket_is_removed(self):
+        stale = os.path.join(self.directory, '999999-dead.sock')
+        import socket
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(stale)
+        sock.close()
+
+        publisher = PubSubHub(directory=self.directory)
+        self.addCleanup(publisher.close)
+        publisher.publish(['user-1'], 'unread')
+        self.assertFalse(os.path.exists(stale))
+
+
+class TestNotificationStream(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        patcher = mock.patch('src.services.notification_stream.HEARTBEAT_SECONDS', 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Role(role_id=3, role_name='Higher Committee', description='لجنة عليا'))
+            user = User(username='stream_admin', email='stream_admin@test.com',
+                        password_hash=generate_password_hash('x'), full_name='مشرف', role_id=3)
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.user_id
+
+    def tearDown(self):
+        fanout_worker.join()
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self, **extra):
+        token = jwt.encode({'user_id': self.user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}', **extra}
+
+    def _open(self, query_string=None, **headers):
+        headers = headers if query_string else self._headers(**headers)
+        response = self.client.get('/api/notifications/stream', headers=headers,
+                                   query_string=query_string, buffered=False)
+        self.addCleanup(response.close)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['X-Accel-Buffering'], 'no')
+        events = iter(response.response)
+        self.assertTrue(next(events).startswith(b'retry: '))
+        return events
+
+    def _notify(self, message):
+        with self.app.app_context():
+            db.session.add(Notification(user_id=self.user_id, message=message, type='test'))
+            db.session.commit()
+
+    def test_pushes_notifications_and_unread_counts(self):
+        events = self._open()
+        self.assertEqual(_parse(next(events)), {'event': 'unread', 'data': {'unread_count': 0}})
+
+        self._notify('أول إشعار')
+        pushed = _parse(next(events))
+        self.assertEqual(pushed['event'], 'notification')
+        self.assertEqual(pushed['data']['message'], 'أول إشعار')
+        self.assertTrue(pushed['id'])
+        self.assertEqual(_parse(next(events))['data'], {'unread_count': 1})
+
+        # Core INSERT from the role fan-out is announced after commit as well
+        with self.app.app_context():
+            notify_roles(['Higher Committee'], 'توزيع', 'fanout')
+            db.session.commit()
+        self.assertEqual(_parse(next(events))['data']['message'], 'توزيع')
+        self.assertEqual(_parse(next(events))['data'], {'unread_count': 2})
+
+        read = self.client.put('/api/notifications/mark-all-read', headers=self._headers())
+        self.assertEqual(read.status_code, 200)
+        self.assertEqual(_parse(next(events))['data'], {'unread_count': 0})
+
+        self.assertEqual(next(events), b': heartbeat\n\n')
+
+    def test_resumes_after_last_event_id(self):
+        events = self._open()
+        next(events)
+        self._notify('قبل الانقطاع')
+        last_id = _parse(next(events))['id']
+
+        self._notify('أثناء الانقطاع')
+        events = self._open(**{'Last-Event-ID': last_id})
+        replayed = _parse(next(events))
+        self.assertEqual(replayed['event'], 'notification')
+        self.assertEqual(replayed['data']['message'], 'أثناء الانقطاع')
+        self.assertEqual(_parse(next(events))['data'], {'unread_count': 2})
+
+    def test_resume_pages_through_long_backlog(self):
+        events = self._open()
+        next(events)
+        self._notify('قبل الانقطاع')
+        last_id = _parse(next(events))['id']
+
+        for i in range(5):
+            self._notify(f'فائت {i}')
+        with mock.patch('src.services.notification_stream.REPLAY_LIMIT', 2):
+            events = self._open(**{'Last-Event-ID': last_id})
+            replayed = [_parse(next(events)) for _ in range(6)]
+        self.assertEqual([item['data'].get('message') for item in replayed[:5]], [f'فائت {i}' for i in range(5)])
+        self.assertEqual(replayed[5]['data'], {'unread_count': 6})
+
+    def test_event_source_authenticates_with_stream_token(self):
+        issued = self.client.post('/api/notifications/stream-token', headers=self._headers())
+        self.assertEqual(issued.status_code, 200)
+        token = issued.get_json()['token']
+
+        events = self._open(query_string={'token': token})
+        self.assertEqual(_parse(next(events))['data'], {'unread_count': 0})
+
+        # the stream token is not an API token, and API tokens are not accepted in the URL
+        self.assertEqual(self.client.get('/api/notifications', headers={'Authorization': f'Bearer {token}'}).status_code, 401)
+        self.assertEqual(self.client.get('/api/notifications', query_string={'token': token}).status_code, 401)
+        api_token = self._headers()['Authorization'].split(' ')[1]
+        response = self.client.get('/api/notifications/stream', query_string={'token': api_token})
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
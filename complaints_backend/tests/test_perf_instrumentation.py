@@ -0,0 +1,117 @@
+"""
+اختبارات قياس أداء الطلبات (Server-Timing والتجميع لكل نقطة نهاية)
+"""
+import unittest
+import threading
+import sys
+import os
+import re
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role
+from src.core.audit import audit_buffer
+from src.core.perf import perf_aggregator
+
+
+class TestPerfInstrumentation(unittest.TestCase):
+    """التحقق من عدّ الجمل وترويسة Server-Timing ونقطة /api/admin/perf"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        perf_aggregator.reset()
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Role(role_id=1, role_name='Trader', description='تاجر'))
+            db.session.add(Role(role_id=3, role_name='Higher Committee', description='لجنة عليا'))
+            admin = User(username='perf_admin', email='perf_admin@test.com',
+                         password_hash=generate_password_hash('secret123'),
+                         full_name='مشرف', role_id=3)
+            trader = User(username='perf_trader', email='perf_trader@test.com',
+                          password_hash=generate_password_hash('secret123'),
+                          full_name='تاجر', role_id=1)
+            db.session.add_all([admin, trader])
+            db.session.commit()
+            self.admin_id = admin.user_id
+            self.trader_id = trader.user_id
+
+    def tearDown(self):
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self, user_id):
+        token = jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def test_server_timing_matches_executed_statements(self):
+        """عدد الجمل في الترويسة يطابق ما نفذه خيط الطلب فعلاً"""
+        request_thread = threading.current_thread()
+        statements = [0]
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if threading.current_thread() is request_thread:
+                statements[0] += 1
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            response = self.client.get('/api/notifications', headers=self._headers(self.admin_id))
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+        self.assertEqual(response.status_code, 200)
+        timing = response.headers['Server-Timing']
+        for metric in ('db;dur=', 'db-slowest;dur=', 'serialize;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        reported = int(re.search(r'desc="(\d+) queries"', timing).group(1))
+        self.assertGreater(reported, 0)
+        self.assertEqual(reported, statements[0])
+
+    def test_admin_perf_aggregates_per_endpoint(self):
+        """المشرف يرى تجميعات كل نقطة نهاية ويمكنه تصفيرها"""
+        for _ in range(3):
+            self.client.get('/api/notifications', headers=self._headers(self.admin_id))
+
+        response = self.client.get('/api/admin/perf', headers=self._headers(self.admin_id))
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['pid'], os.getpid())
+        by_endpoint = {entry['endpoint']: entry for entry in data['endpoints']}
+        entry = by_endpoint['GET /api/notifications']
+        self.assertEqual(entry['requests'], 3)
+        self.assertLessEqual(entry['p50_ms'], entry['p99_ms'])
+        self.assertGreater(entry['avg_statements'], 0)
+        self.assertTrue(entry['slowest_statement'])
+
+        self.client.get('/api/admin/perf?reset=true', headers=self._headers(self.admin_id))
+        self.assertEqual(
+            [e['endpoint'] for e in perf_aggregator.snapshot()],
+            ['GET /api/admin/perf']
+        )
+
+    def test_admin_perf_requires_higher_committee(self):
+        response = self.client.get('/api/admin/perf', headers=self._headers(self.trader_id))
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+اختبارات الذاكرة المؤقتة لهوية المستخدم (Principal Cache)
+- تقليل استعلامات token_required عند إصابة الذاكرة
+- الإبطال عند تغيير الدور أو الحالة أو اعتماد الدفع
+"""
+import unittest
+import json
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, Subscription
+from src.core.principal_cache import principal_cache, invalidate_all_principals
+
+
+class TestPrincipalCache(unittest.TestCase):
+    """اختبار الذاكرة المؤقتة لهوية المستخدم"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        invalidate_all_principals()
+
+        with self.app.app_context():
+            db.create_all()
+
+            if not Role.query.filter_by(role_name='Trader').first():
+                roles = [
+                    Role(role_id=1, role_name='Trader', description='تاجر'),
+                    Role(role_id=2, role_name='Technical Committee', description='لجنة فنية'),
+                    Role(role_id=3, role_name='Higher Committee', description='لجنة عليا')
+                ]
+                for role in roles:
+                    db.session.add(role)
+                db.session.commit()
+
+            admin = User(
+                username='cache_admin',
+                email='cache_admin@test.com',
+                password_hash=generate_password_hash('admin123'),
+                full_name='مشرف الذاكرة',
+                role_id=3
+            )
+            trader = User(
+                username='cache_trader',
+                email='cache_trader@test.com',
+                password_hash=generate_password_hash('trader123'),
+                full_name='تاجر الذاكرة',
+                role_id=1
+            )
+            db.session.add_all([admin, trader])
+            db.session.commit()
+
+            db.session.add(Subscription(
+                user_id=trader.user_id,
+                start_date=datetime.utcnow(),
+                end_date=datetime.utcnow() + timedelta(days=365),
+                status='active'
+            ))
+            db.session.commit()
+
+            self.admin_id = admin.user_id
+            self.trader_id = trader.user_id
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        invalidate_all_principals()
+
+    def _headers(self, user_id):
+        token = jwt.encode({
+            'user_id': user_id,
+            'exp': datetime.utcnow() + timedelta(hours=1)
+        }, self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def _count_statements(self, method, url, **kwargs):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = getattr(self.client, method)(url, **kwargs)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        return response, statements
+
+    def test_cache_hit_skips_principal_queries(self):
+        """الطلب الثاني لا يعيد استعلامات المستخدم والدور والاشتراك"""
+        headers = self._headers(self.trader_id)
+
+        first, first_statements = self._count_statements('get', '/api/profile', headers=headers)
+        self.assertEqual(first.status_code, 200)
+
+        hits_before = principal_cache.hits
+        second, second_statements = self._count_statements('get', '/api/profile', headers=headers)
+        self.assertEqual(second.status_code, 200)
+
+        self.assertEqual(principal_cache.hits, hits_before + 1)
+        self.assertLess(len(second_statements), len(first_statements))
+        self.assertEqual(
+            json.loads(first.data)['user'],
+            json.loads(second.data)['user']
+        )
+
+    def test_role_change_invalidates_principal(self):
+        """تغيير الدور يبطل الهوية المخزنة فوراً"""
+        trader_headers = self._headers(self.trader_id)
+        self.client.get('/api/profile', headers=trader_headers)
+        self.assertIsNotNone(principal_cache.get(self.trader_id))
+
+        response = self.client.put(
+            f'/api/admin/users/{self.trader_id}/role',
+            headers=self._headers(self.admin_id),
+            json={'role_name': 'Technical Committee'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(principal_cache.get(self.trader_id))
+
+        profile = self.client.get('/api/profile', headers=trader_headers)
+        self.assertEqual(json.loads(profile.data)['user']['role_name'], 'Technical Committee')
+
+    def test_deactivated_user_is_rejected(self):
+        """تعطيل الحساب يمنع استخدام الرمز المخزن"""
+        trader_headers = self._headers(self.trader_id)
+        self.assertEqual(self.client.get('/api/profile', headers=trader_headers).status_code, 200)
+
+        response = self.client.put(
+            f'/api/admin/users/{self.trader_id}/toggle-status',
+            headers=self._headers(self.admin_id)
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get('/api/profile', headers=trader_headers).status_code, 401)
+
+    def test_profile_update_refreshes_cached_user(self):
+        """تعديل الملف الشخصي يبطل النسخة المخزنة عبر الـ commit"""
+        headers = self._headers(self.trader_id)
+        self.client.get('/api/profile', headers=headers)
+
+        response = self.client.put('/api/profile', headers=headers, json={'full_name': 'اسم جديد'})
+        self.assertEqual(response.status_code, 200)
+
+        profile = self.client.get('/api/profile', headers=headers)
+        self.assertEqual(json.loads(profile.data)['user']['full_name'], 'اسم جديد')
+
+
+if __name__ == '__main__':
+    unittest.main()
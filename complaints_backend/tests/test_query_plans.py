@@ -0,0 +1,166 @@
+"""
+اختبارات خطط تنفيذ الاستعلامات الساخنة (EXPLAIN): تفشل إن عاد أي منها إلى مسح كامل للجدول
+
+- SQLite: تعمل دائماً على قاعدة الاختبار (EXPLAIN QUERY PLAN)
+- PostgreSQL: تعمل عند ضبط TEST_POSTGRES_URL (EXPLAIN بصيغة JSON مع enable_seqscan=off
+  حتى لا يفضّل المخطط المسح لصغر الجداول)
+"""
+import importlib.util
+import json
+import re
+import unittest
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, false, select, text
+from src.database.db import db
+from src.main import app
+from src.models.complaint import AuditLog, Complaint, Notification, Payment, Subscription
+
+TEST_POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+def hot_queries():
+    """الاستعلامات كما تبنيها المسارات والمهام المجدولة (القيم لا تؤثر على الخطة)"""
+    now = datetime.utcnow()
+    user_id = 'user-id'
+    return {
+        'complaints_by_trader': select(Complaint).where(Complaint.trader_id == user_id)
+            .order_by(Complaint.submitted_at.desc()).limit(10),
+        'complaints_assigned': select(Complaint).where(Complaint.assigned_to_committee_id == user_id)
+            .order_by(Complaint.submitted_at.desc()).limit(10),
+        'active_subscription': select(Subscription).where(
+            Subscription.user_id == user_id, Subscription.status == 'active', Subscription.end_date > now),
+        'latest_subscription': select(Subscription).where(
+            Subscription.user_id == user_id, Subscription.status == 'active')
+            .order_by(Subscription.end_date.desc()).limit(1),
+        'renewal_window': select(Subscription.subscription_id).where(
+            Subscription.status == 'active',
+            Subscription.end_date >= now + timedelta(days=7),
+            Subscription.end_date < now + timedelta(days=8)),
+        'payments_by_status': select(Payment).where(Payment.status == 'pending')
+            .order_by(Payment.created_at.desc()),
+        'pending_payment': select(Payment).where(Payment.user_id == user_id, Payment.status == 'pending').limit(1),
+        'receipt_owners': select(Payment.user_id).where(Payment.receipt_image_path == 'receipt.png'),
+        'notifications': select(Notification).where(Notification.user_id == user_id)
+            .order_by(Notification.created_at.desc(), Notification.notification_id.desc()).limit(20),
+        'unread_notifications': select(Notification).where(
+            Notification.user_id == user_id, Notification.is_read == false())
+            .order_by(Notification.created_at.desc()).limit(20),
+        'audit_logs_by_action': select(AuditLog).where(AuditLog.action_type == 'role_change')
+            .order_by(AuditLog.created_at.desc()).limit(50),
+        'audit_logs': select(AuditLog).order_by(AuditLog.created_at.desc()).limit(50),
+    }
+
+
+def _compile(connection, statement):
+    compiled = statement.compile(dialect=connection.dialect)
+    if compiled.positional:
+        return str(compiled), tuple(compiled.params[name] for name in compiled.positiontup)
+    return str(compiled), compiled.params
+
+
+def sqlite_plan(connection, statement):
+    sql, params = _compile(connection, statement)
+    return [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def sqlite_problems(plan):
+    problems = []
+    for detail in plan:
+        # "SCAN t USING INDEX ..." مسح مرتب بالفهرس (مع LIMIT) وليس مسحاً للجدول
+        if re.match(r'SCAN \w+$', detail) or re.match(r'SCAN \w+ (?!USING (COVERING )?INDEX)', detail):
+            problems.append(detail)
+        # فرز كامل للنتيجة؛ "RIGHT PART OF ORDER BY" (مفتاح فك التعادل فقط) مقبول
+        if detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+            problems.append(detail)
+    return problems
+
+
+def postgres_plan_nodes(connection, statement):
+    sql, params = _compile(connection, statement)
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}', params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    stack, nodes = [plan[0]['Plan']], []
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get('Plans', ()))
+    return nodes
+
+
+class TestSqliteQueryPlans(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_hot_queries_use_indexes(self):
+        with self.app.app_context(), db.engine.connect() as connection:
+            for name, statement in hot_queries().items():
+                with self.subTest(query=name):
+                    plan = sqlite_plan(connection, statement)
+                    self.assertEqual(sqlite_problems(plan), [], f'{name}: {plan}')
+
+    def test_detects_full_table_scan(self):
+        with self.app.app_context(), db.engine.connect() as connection:
+            plan = sqlite_plan(connection, select(Payment).where(Payment.sender_name == 'x'))
+            self.assertTrue(sqlite_problems(plan), plan)
+
+    def test_migration_matches_model_indexes(self):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'migrations', '002_add_composite_indexes.py')
+        spec = importlib.util.spec_from_file_location('migration_002', path)
+        migration = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(migration)
+
+        declared = {
+            index.name: (table.name, tuple(column.name for column in index.columns))
+            for table in (Complaint.__table__, Subscription.__table__, Payment.__table__,
+                          Notification.__table__, AuditLog.__table__)
+            for index in table.indexes
+        }
+        for name, table_name, columns in migration.INDEXES:
+            self.assertEqual(declared.get(name), (table_name, columns), name)
+
+
+@unittest.skipUnless(TEST_POSTGRES_URL, 'TEST_POSTGRES_URL غير مضبوط')
+class TestPostgresQueryPlans(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine(TEST_POSTGRES_URL)
+        db.metadata.create_all(cls.engine)
+
+    @classmethod
+    def tearDownClass(cls):
+        db.metadata.drop_all(cls.engine)
+        cls.engine.dispose()
+
+    def test_hot_queries_use_indexes(self):
+        with self.engine.connect() as connection:
+            connection.execute(text('SET enable_seqscan = off'))
+            for name, statement in hot_queries().items():
+                with self.subTest(query=name):
+                    nodes = postgres_plan_nodes(connection, statement)
+                    scans = [node.get('Relation Name') for node in nodes if node['Node Type'] == 'Seq Scan']
+                    self.assertEqual(scans, [], name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+"""
+اختبارات تخزين الإيصالات حسب المحتوى وكشف الإيصالات المكررة
+"""
+import unittest
+from unittest import mock
+import base64
+import io
+import os
+import shutil
+import tempfile
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, Payment, PaymentMethod, ReceiptBlob
+from src.core.audit import audit_buffer
+from src.services.notifications import fanout_worker
+from src.core.ingest import ingest_content_addressed
+from src.services.receipts import prune_unreferenced_receipts, receipt_sha256
+from src.services.scheduler import run_daily_tasks
+from src.services.receipt_derivatives import DERIVATIVES_DIRNAME, derivative_worker
+
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+class TestReceiptDedup(unittest.TestCase):
+    """نفس البايتات تُخزن مرة واحدة ويظهر للمراجع أنها مكررة"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        for module in ('src.routes.subscription', 'src.routes.subscription_v2'):
+            patcher = mock.patch(f'{module}.UPLOAD_FOLDER', self.folder)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add_all([
+                Role(role_id=1, role_name='Trader', description='تاجر'),
+                Role(role_id=3, role_name='Higher Committee', description='لجنة عليا')
+            ])
+            users = [
+                User(username=f'dedup_{name}', email=f'dedup_{name}@test.com',
+                     password_hash=generate_password_hash('x'), full_name=name, role_id=role_id)
+                for name, role_id in (('admin', 3), ('trader_a', 1), ('trader_b', 1))
+            ]
+            method = PaymentMethod(name='تحويل', account_number='123', account_holder='اللجنة', is_active=True)
+            db.session.add_all(users + [method])
+            db.session.commit()
+            self.admin_id, self.trader_a, self.trader_b = (user.user_id for user in users)
+            self.method_id = method.method_id
+
+    def tearDown(self):
+        derivative_worker.join()
+        fanout_worker.join()
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self, user_id):
+        token = jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def _submit(self, user_id, url='/api/payments', content=PNG):
+        response = self.client.post(url, headers=self._headers(user_id), data={
+            'method_id': self.method_id,
+            'sender_name': 'مرسل الدفعة',
+            'sender_phone': '777123456',
+            'amount': '50000',
+            'payment_date': datetime.utcnow().isoformat(),
+            'receipt_image': (io.BytesIO(content), 'receipt.png')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 201, response.get_data(as_text=True))
+        body = response.get_json()
+        return (body.get('data') or body)['payment']
+
+    def _stored_files(self):
+        derivative_worker.join()
+        return sorted(
+            path for path in (
+                os.path.relpath(os.path.join(root, name), self.folder).replace(os.sep, '/')
+                for root, _, names in os.walk(self.folder) for name in names
+            )
+            if not path.startswith(DERIVATIVES_DIRNAME + '/')
+        )
+
+    def test_identical_receipts_stored_once_and_flagged(self):
+        first = self._submit(self.trader_a)
+        second = self._submit(self.trader_b, url='/api/payment/submit')
+        other = self._submit(self.trader_b, content=PNG + b'\0')
+
+        self.assertEqual(first['receipt_image_path'], second['receipt_image_path'])
+        self.assertIsNotNone(receipt_sha256(first['receipt_image_path']))
+        self.assertEqual(self._stored_files(), sorted({first['receipt_image_path'], other['receipt_image_path']}))
+
+        with self.app.app_context():
+            blob = db.session.get(ReceiptBlob, receipt_sha256(first['receipt_image_path']))
+            self.assertEqual(blob.ref_count, 2)
+            self.assertEqual(blob.first_payment_id, first['payment_id'])
+
+        response = self.client.get('/api/admin/payments?status=pending', headers=self._headers(self.admin_id))
+        payments = {payment['payment_id']: payment for payment in response.get_json()['payments']}
+        self.assertEqual([d['payment_id'] for d in payments[second['payment_id']]['duplicate_receipts']],
+                         [first['payment_id']])
+        self.assertEqual([d['payment_id'] for d in payments[first['payment_id']]['duplicate_receipts']],
+                         [second['payment_id']])
+        self.assertEqual(payments[other['payment_id']]['duplicate_receipts'], [])
+
+        # both owners can still fetch the shared file
+        for user_id in (self.trader_a, self.trader_b):
+            response = self.client.get(f"/api/payment/receipt/{first['receipt_image_path']}",
+                                       headers=self._headers(user_id))
+            self.assertEqual(response.status_code, 200)
+            response.close()
+
+    def test_deleting_payments_releases_references(self):
+        first = self._submit(self.trader_a)
+        second = self._submit(self.trader_b)
+        sha = receipt_sha256(first['receipt_image_path'])
+
+        with self.app.app_context():
+            db.session.delete(db.session.get(Payment, second['payment_id']))
+            db.session.commit()
+            self.assertEqual(db.session.get(ReceiptBlob, sha).ref_count, 1)
+
+            db.session.delete(db.session.get(Payment, first['payment_id']))
+            db.session.commit()
+            self.assertEqual(db.session.get(ReceiptBlob, sha).ref_count, 0)
+
+            self.assertEqual(prune_unreferenced_receipts(folder=self.folder), 0)
+            self.assertEqual(prune_unreferenced_receipts(grace=timedelta(0), folder=self.folder), 1)
+            self.assertIsNone(db.session.get(ReceiptBlob, sha))
+        self.assertEqual(self._stored_files(), [])
+        derivatives = [names for _, _, names in os.walk(os.path.join(self.folder, DERIVATIVES_DIRNAME)) if names]
+        self.assertEqual(derivatives, [])
+
+    def _age(self, storage_path, days=2):
+        path = os.path.join(self.folder, *storage_path.split('/'))
+        past = (datetime.now() - timedelta(days=days)).timestamp()
+        os.utime(path, (past, past))
+
+    def test_duplicate_upload_keeps_released_file(self):
+        """رفع مكرر وصل قبل تسجيل دفعته يحمي الملف رغم أن ref_count صفر"""
+        payment = self._submit(self.trader_a)
+        path = payment['receipt_image_path']
+        with self.app.app_context():
+            db.session.delete(db.session.get(Payment, payment['payment_id']))
+            db.session.commit()
+            blob = db.session.get(ReceiptBlob, receipt_sha256(path))
+            blob.last_referenced_at = datetime.utcnow() - timedelta(days=2)
+            db.session.commit()
+            self._age(path)
+
+            result = ingest_content_addressed(io.BytesIO(PNG), self.folder)
+            self.assertTrue(result.deduplicated)
+            self.assertEqual(prune_unreferenced_receipts(folder=self.folder), 0)
+            self.assertIsNotNone(db.session.get(ReceiptBlob, receipt_sha256(path)))
+        self.assertEqual(self._stored_files(), [path])
+
+    def test_orphan_files_without_blob_are_swept(self):
+        """ملف كُتب ثم تراجعت معاملة دفعته يُحذف بعد المهلة فقط"""
+        stale = ingest_content_addressed(io.BytesIO(PNG + b'stale'), self.folder).name
+        fresh = ingest_content_addressed(io.BytesIO(PNG + b'fresh'), self.folder).name
+        self._age(stale)
+        kept = self._submit(self.trader_a)['receipt_image_path']
+        self._age(kept)
+
+        with self.app.app_context():
+            self.assertEqual(prune_unreferenced_receipts(folder=self.folder), 1)
+        self.assertEqual(self._stored_files(), sorted([fresh, kept]))
+
+    def test_daily_tasks_prune_receipts(self):
+        """المهمة اليومية تحذف الإيصالات غير المستخدمة في مجلد الإيصالات"""
+        orphan = ingest_content_addressed(io.BytesIO(PNG + b'orphan'), self.folder).name
+        self._age(orphan)
+        kept = self._submit(self.trader_a)['receipt_image_path']
+
+        with mock.patch('src.services.receipts.RECEIPTS_FOLDER', self.folder), self.app.app_context():
+            results = run_daily_tasks()
+        self.assertEqual(results['receipt_cleanup'], {'success': True, 'removed': 1})
+        self.assertEqual(self._stored_files(), [kept])
+
+
+if __name__ == '__main__':
+    unittest.main()
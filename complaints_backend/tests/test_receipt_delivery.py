@@ -0,0 +1,139 @@
+"""
+اختبارات إرسال الإيصالات عبر X-Accel-Redirect والرجوع إلى send_from_directory
+"""
+import unittest
+from unittest import mock
+import base64
+import io
+import os
+import shutil
+import tempfile
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, PaymentMethod
+from src.core.audit import audit_buffer
+from src.services.notifications import fanout_worker
+from src.services.receipt_derivatives import derivative_name, derivative_worker
+
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+class TestReceiptDelivery(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        for module in ('src.routes.subscription', 'src.routes.subscription_v2'):
+            patcher = mock.patch(f'{module}.UPLOAD_FOLDER', self.folder)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add_all([
+                Role(role_id=1, role_name='Trader', description='تاجر'),
+                Role(role_id=3, role_name='Higher Committee', description='لجنة عليا')
+            ])
+            users = [
+                User(username=f'accel_{name}', email=f'accel_{name}@test.com',
+                     password_hash=generate_password_hash('x'), full_name=name, role_id=role_id)
+                for name, role_id in (('admin', 3), ('owner', 1), ('stranger', 1))
+            ]
+            method = PaymentMethod(name='تحويل', account_number='123', account_holder='اللجنة', is_active=True)
+            db.session.add_all(users + [method])
+            db.session.commit()
+            self.admin_id, self.owner_id, self.stranger_id = (user.user_id for user in users)
+            self.method_id = method.method_id
+
+        response = self.client.post('/api/payments', headers=self._headers(self.owner_id), data={
+            'method_id': self.method_id,
+            'sender_name': 'مرسل الدفعة',
+            'sender_phone': '777123456',
+            'amount': '50000',
+            'payment_date': datetime.utcnow().isoformat(),
+            'receipt_image': (io.BytesIO(PNG), 'receipt.png')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 201)
+        self.filename = response.get_json()['data']['payment']['receipt_image_path']
+        self.url = f'/api/payment/receipt/{self.filename}'
+
+    def tearDown(self):
+        derivative_worker.join()
+        fanout_worker.join()
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self, user_id, **extra):
+        token = jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}', **extra}
+
+    def test_x_accel_hands_transfer_to_nginx(self):
+        with mock.patch.dict(os.environ, {'FILE_DELIVERY': 'x-accel'}):
+            response = self.client.get(self.url, headers=self._headers(self.owner_id))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['X-Accel-Redirect'], f'/_protected/receipts/{self.filename}')
+            self.assertEqual(response.get_data(), b'')
+            self.assertEqual(response.mimetype, 'image/png')
+            self.assertIn('private', response.headers['Cache-Control'])
+            self.assertIn('immutable', response.headers['Cache-Control'])
+
+            stat = os.stat(os.path.join(self.folder, *self.filename.split('/')))
+            etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+            self.assertEqual(response.headers['ETag'], etag)
+            self.assertIn('Last-Modified', response.headers)
+
+            # the conditional request is answered without involving nginx
+            cached = self.client.get(self.url, headers=self._headers(self.owner_id, **{'If-None-Match': etag}))
+            self.assertEqual(cached.status_code, 304)
+            self.assertNotIn('X-Accel-Redirect', cached.headers)
+
+            thumb = self.client.get(f'{self.url}?size=thumb', headers=self._headers(self.admin_id))
+            self.assertEqual(thumb.headers['X-Accel-Redirect'],
+                             f"/_protected/receipts/{derivative_name(self.filename, 'thumb')}")
+            self.assertEqual(thumb.mimetype, 'image/jpeg')
+
+            denied = self.client.get(self.url, headers=self._headers(self.stranger_id))
+            self.assertEqual(denied.status_code, 403)
+            self.assertNotIn('X-Accel-Redirect', denied.headers)
+
+    def test_development_fallback_streams_with_ranges(self):
+        response = self.client.get(self.url, headers=self._headers(self.owner_id))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Accel-Redirect', response.headers)
+        self.assertEqual(response.get_data(), PNG)
+        self.assertNotIn('public', response.headers['Cache-Control'])
+        etag = response.headers['ETag']
+        response.close()
+
+        partial = self.client.get(self.url, headers=self._headers(self.owner_id, Range='bytes=0-7'))
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.get_data(), PNG[:8])
+        partial.close()
+
+        cached = self.client.get(self.url, headers=self._headers(self.owner_id, **{'If-None-Match': etag}))
+        self.assertEqual(cached.status_code, 304)
+        cached.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
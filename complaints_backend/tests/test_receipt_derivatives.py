@@ -0,0 +1,151 @@
+"""
+اختبارات النسخ المشتقة من الإيصالات (نسخة المراجعة والصورة المصغرة)
+"""
+import unittest
+from unittest import mock
+import io
+import os
+import shutil
+import tempfile
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from PIL import Image
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, PaymentMethod
+from src.core.audit import audit_buffer
+from src.services.notifications import fanout_worker
+from src.services.receipt_derivatives import derivative_name, derivative_worker
+from src.utils.images import build_derivatives
+
+ORIENTATION = 0x0112
+
+
+def _photo(width=2400, height=1800, orientation=None):
+    image = Image.new('RGB', (width, height), (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    if orientation:
+        exif[ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+class TestReceiptDerivatives(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+        for module in ('src.routes.subscription', 'src.routes.subscription_v2'):
+            patcher = mock.patch(f'{module}.UPLOAD_FOLDER', self.folder)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add_all([
+                Role(role_id=1, role_name='Trader', description='تاجر'),
+                Role(role_id=3, role_name='Higher Committee', description='لجنة عليا')
+            ])
+            admin = User(username='deriv_admin', email='deriv_admin@test.com',
+                         password_hash=generate_password_hash('x'), full_name='مشرف', role_id=3)
+            trader = User(username='deriv_trader', email='deriv_trader@test.com',
+                          password_hash=generate_password_hash('x'), full_name='تاجر', role_id=1)
+            method = PaymentMethod(name='تحويل', account_number='123', account_holder='اللجنة', is_active=True)
+            db.session.add_all([admin, trader, method])
+            db.session.commit()
+            self.admin_id, self.trader_id, self.method_id = admin.user_id, trader.user_id, method.method_id
+
+    def tearDown(self):
+        derivative_worker.join()
+        fanout_worker.join()
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def _headers(self, user_id):
+        token = jwt.encode({'user_id': user_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}'}
+
+    def test_build_strips_exif_and_applies_orientation(self):
+        source = os.path.join(self.folder, 'photo.jpg')
+        with open(source, 'wb') as handle:
+            handle.write(_photo(orientation=6))
+        review, thumb = os.path.join(self.folder, 'review.jpg'), os.path.join(self.folder, 'thumb.jpg')
+
+        build_derivatives(source, [(thumb, 320, 70), (review, 1600, 80)])
+
+        for path, edge in ((review, 1600), (thumb, 320)):
+            with Image.open(path) as image:
+                self.assertEqual(image.format, 'JPEG')
+                self.assertEqual(max(image.size), edge)
+                # rotated 90 degrees by the orientation tag: portrait output
+                self.assertGreater(image.height, image.width)
+                self.assertEqual(len(image.getexif()), 0)
+        self.assertLess(os.path.getsize(thumb), os.path.getsize(review))
+
+    def test_upload_schedules_derivatives_and_serves_sizes(self):
+        response = self.client.post('/api/payments', headers=self._headers(self.trader_id), data={
+            'method_id': self.method_id,
+            'sender_name': 'مرسل الدفعة',
+            'sender_phone': '777123456',
+            'amount': '50000',
+            'payment_date': datetime.utcnow().isoformat(),
+            'receipt_image': (io.BytesIO(_photo()), 'receipt.jpg')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 201)
+        filename = response.get_json()['data']['payment']['receipt_image_path']
+
+        derivative_worker.join(timeout=60)
+        for size in ('review', 'thumb'):
+            self.assertTrue(os.path.exists(os.path.join(self.folder, *derivative_name(filename, size).split('/'))))
+
+        headers = self._headers(self.admin_id)
+        original = self.client.get(f'/api/payment/receipt/{filename}', headers=headers)
+        thumb = self.client.get(f'/api/payment/receipt/{filename}?size=thumb', headers=headers)
+        self.assertEqual(thumb.status_code, 200)
+        self.assertEqual(thumb.mimetype, 'image/jpeg')
+        self.assertLess(len(thumb.get_data()), len(original.get_data()) / 5)
+        original.close()
+        thumb.close()
+
+        self.assertEqual(self.client.get(f'/api/payment/receipt/{filename}?size=huge', headers=headers).status_code, 400)
+
+    def test_missing_derivative_is_built_on_request(self):
+        with mock.patch.object(derivative_worker, 'max_workers', 0):
+            response = self.client.post('/api/payments', headers=self._headers(self.trader_id), data={
+                'method_id': self.method_id,
+                'sender_name': 'مرسل الدفعة',
+                'sender_phone': '777123456',
+                'amount': '50000',
+                'payment_date': datetime.utcnow().isoformat(),
+                'receipt_image': (io.BytesIO(_photo(800, 600)), 'receipt.jpg')
+            }, content_type='multipart/form-data')
+        filename = response.get_json()['data']['payment']['receipt_image_path']
+        review_path = os.path.join(self.folder, *derivative_name(filename, 'review').split('/'))
+        self.assertFalse(os.path.exists(review_path))
+
+        response = self.client.get(f'/api/payment/receipt/{filename}?size=review', headers=self._headers(self.admin_id))
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertTrue(os.path.exists(review_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""
+اختبارات استقبال الإيصالات كتدفق (فحص MIME في الذاكرة، حد الحجم، الإعادة الذرية)
+"""
+import unittest
+import base64
+import hashlib
+import io
+import shutil
+import tempfile
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from src.main import app
+from src.core.ingest import ingest_stream, UploadTooLarge, UnsupportedMimeType
+from src.core.storage import LocalStorage
+from src.utils import security
+from src.utils.security import validate_and_save_file
+
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+def _jpeg_with_gps():
+    image = Image.new('RGB', (64, 32), (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: تدوير 90 درجة
+    exif[0x8825] = {1: 'N', 2: (15.0, 21.0, 0.0), 3: 'E', 4: (44.0, 12.0, 0.0)}  # GPSInfo
+    output = io.BytesIO()
+    image.save(output, 'JPEG', exif=exif)
+    return output.getvalue()
+
+
+class CountingStream(io.BytesIO):
+    """تدفق يحسب عدد البايتات المقروءة منه"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+class TestReceiptIngestion(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_valid_receipt_is_hashed_and_renamed_into_place(self):
+        data = PNG + b'\0' * 200000
+        with app.app_context():
+            success, result = validate_and_save_file(FileStorage(io.BytesIO(data), filename='receipt.png'), self.directory)
+
+        self.assertTrue(success)
+        self.assertEqual(result['size'], len(data))
+        self.assertEqual(result['sha256'], hashlib.sha256(data).hexdigest())
+        self.assertEqual(result['filename'], f"{result['sha256'][:2]}/{result['sha256']}.png")
+        self.assertFalse(result['deduplicated'])
+        self.assertEqual(sorted(os.listdir(self.directory)), [result['sha256'][:2]])
+        with open(result['path'], 'rb') as handle:
+            self.assertEqual(handle.read(), data)
+
+    def test_exif_is_stripped_before_hashing(self):
+        data = _jpeg_with_gps()
+        with Image.open(io.BytesIO(data)) as uploaded:
+            self.assertIn(0x8825, uploaded.getexif())
+
+        with app.app_context():
+            success, result = validate_and_save_file(FileStorage(io.BytesIO(data), filename='receipt.jpg'), self.directory)
+
+        self.assertTrue(success)
+        with open(result['path'], 'rb') as handle:
+            stored = handle.read()
+        self.assertEqual(result['sha256'], hashlib.sha256(stored).hexdigest())
+        self.assertEqual(result['size'], len(stored))
+        self.assertEqual(result['filename'], f"{result['sha256'][:2]}/{result['sha256']}.jpg")
+        with Image.open(result['path']) as image:
+            self.assertEqual(len(image.getexif()), 0)
+            self.assertEqual(image.size, (32, 64))
+        self.assertEqual(os.listdir(os.path.dirname(result['path'])), [os.path.basename(result['path'])])
+
+        # الرفع نفسه مرة أخرى يصل إلى نفس المحتوى المنظف
+        with app.app_context():
+            success, again = validate_and_save_file(FileStorage(io.BytesIO(data), filename='receipt.jpg'), self.directory)
+        self.assertTrue(again['deduplicated'])
+        self.assertEqual(again['sha256'], result['sha256'])
+
+    def test_oversized_upload_aborts_early(self):
+        limit = 100 * 1024
+        stream = CountingStream(PNG + b'\0' * (10 * limit))
+        with self.assertRaises(UploadTooLarge):
+            ingest_stream(stream, os.path.join(self.directory, 'big.png'), max_size=limit, chunk_size=8192)
+
+        self.assertLessEqual(stream.bytes_read, limit + 8192)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_oversized_receipt_is_rejected(self):
+        original = security.MAX_FILE_SIZE
+        security.MAX_FILE_SIZE = 1024
+        self.addCleanup(setattr, security, 'MAX_FILE_SIZE', original)
+
+        with app.app_context():
+            success, result = validate_and_save_file(
+                FileStorage(io.BytesIO(PNG + b'\0' * 4096), filename='receipt.png'), self.directory
+            )
+        self.assertFalse(success)
+        self.assertIn('حجم الملف', result['error'])
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_wrong_mime_is_rejected_before_writing(self):
+        stream = CountingStream(b'<html>not an image</html>' * 1000)
+        with self.assertRaises(UnsupportedMimeType):
+            ingest_stream(stream, os.path.join(self.directory, 'fake.png'), allowed_mimes={'image/png'})
+        self.assertLessEqual(stream.bytes_read, 2048)
+        self.assertEqual(os.listdir(self.directory), [])
+
+        with app.app_context():
+            success, result = validate_and_save_file(
+                FileStorage(io.BytesIO(b'plain text'), filename='receipt.jpg'), self.directory
+            )
+        self.assertFalse(success)
+        self.assertIn('نوع الملف غير صالح', result['error'])
+
+    def test_local_storage_streams_to_disk(self):
+        storage = LocalStorage(base_path=self.directory)
+        data = os.urandom(300000)
+        relative_path = storage.save(io.BytesIO(data), 'receipt.png', folder='receipts')
+
+        self.assertTrue(storage.exists(relative_path))
+        self.assertEqual(os.listdir(os.path.join(self.directory, 'receipts')), [os.path.basename(relative_path)])
+        with open(os.path.join(self.directory, relative_path), 'rb') as handle:
+            self.assertEqual(handle.read(), data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+اختبارات ETag و Cache-Control لمسارات البيانات المرجعية ومسار 304 بدون استعلامات
+"""
+import unittest
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, ComplaintCategory, PaymentMethod
+from src.core.audit import audit_buffer
+from src.core.reference_data import invalidate_reference_data, reference_cache
+from src.core.settings_registry import settings_registry
+
+
+class TestReferenceCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+        invalidate_reference_data()
+
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add_all([
+                Role(role_id=1, role_name='Trader', description='تاجر'),
+                Role(role_id=3, role_name='Higher Committee', description='لجنة عليا'),
+                ComplaintCategory(category_name='تسعير', description='مخالفات الأسعار'),
+                PaymentMethod(name='تحويل', account_number='123', account_holder='اللجنة', is_active=True)
+            ])
+            admin = User(username='ref_admin', email='ref_admin@test.com',
+                         password_hash=generate_password_hash('x'), full_name='مشرف', role_id=3)
+            db.session.add(admin)
+            db.session.commit()
+            self.admin_id = admin.user_id
+
+    def tearDown(self):
+        audit_buffer.flush()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        invalidate_reference_data()
+
+    def _headers(self, **extra):
+        token = jwt.encode({'user_id': self.admin_id, 'exp': datetime.utcnow() + timedelta(hours=1)},
+                           self.app.config['SECRET_KEY'], algorithm='HS256')
+        return {'Authorization': f'Bearer {token}', **extra}
+
+    def _count_queries(self, func):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            result = func()
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        return result, statements
+
+    def test_not_modified_skips_database(self):
+        first = self.client.get('/api/roles')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual([r['role_name'] for r in first.get_json()['roles']], ['Trader', 'Higher Committee'])
+        etag = first.headers['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        self.assertIn('public', first.headers['Cache-Control'])
+        self.assertIn('max-age=60', first.headers['Cache-Control'])
+
+        response, statements = self._count_queries(
+            lambda: self.client.get('/api/roles', headers={'If-None-Match': etag})
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b'')
+        self.assertEqual(statements, [])
+
+    def test_authenticated_lists_are_private(self):
+        response = self.client.get('/api/categories', headers=self._headers())
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertEqual(response.get_json()['categories'][0]['category_name'], 'تسعير')
+
+        cached = self.client.get('/api/categories', headers=self._headers(**{'If-None-Match': response.headers['ETag']}))
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get('/api/categories').status_code, 401)
+
+    def test_admin_edits_change_the_version(self):
+        methods = self.client.get('/api/payment-methods')
+        etag = methods.headers['ETag']
+
+        created = self.client.post('/api/admin/payment-methods', headers=self._headers(), json={
+            'name': 'محفظة', 'account_number': '456', 'account_holder': 'اللجنة', 'display_order': 1
+        })
+        self.assertEqual(created.status_code, 201)
+
+        refreshed = self.client.get('/api/payment-methods', headers={'If-None-Match': etag})
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertNotEqual(refreshed.headers['ETag'], etag)
+        self.assertEqual([m['name'] for m in refreshed.get_json()['payment_methods']], ['تحويل', 'محفظة'])
+
+        price = self.client.get('/api/subscription-price')
+        with self.app.app_context():
+            settings_registry.update({'annual_subscription_price': '75000'})
+        updated = self.client.get('/api/subscription-price', headers={'If-None-Match': price.headers['ETag']})
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual(updated.get_json()['price'], 75000.0)
+
+    def test_edits_reach_other_workers_through_settings_version(self):
+        """عامل لم يشهد الـ commit يعيد التحميل عند تحققه التالي من رقم الإصدار"""
+        first = self.client.get('/api/payment-methods')
+        with self.app.app_context():
+            stale_entry = reference_cache.get('payment_methods')
+            stale_settings = settings_registry.get()
+
+            db.session.add(PaymentMethod(name='محفظة', account_number='456', account_holder='اللجنة',
+                                         is_active=True, display_order=1))
+            db.session.commit()
+            self.assertEqual(settings_registry.get().version, stale_settings.version + 1)
+
+        # حالة عامل آخر: نسخته المحلية لم تُبطل وحان موعد التحقق من الإصدار
+        reference_cache.set('payment_methods', stale_entry)
+        settings_registry._snapshot = stale_settings
+        settings_registry._next_check = 0.0
+
+        refreshed = self.client.get('/api/payment-methods', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(refreshed.status_code, 200)
+        self.assertEqual([m['name'] for m in refreshed.get_json()['payment_methods']], ['تحويل', 'محفظة'])
+
+
+if __name__ == '__main__':
+    unittest.main()
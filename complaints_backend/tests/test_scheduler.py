@@ -0,0 +1,125 @@
+"""
+اختبارات المهام المجدولة الجماعية (انتهاء الاشتراكات وتذكيرات التجديد)
+"""
+import unittest
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, Subscription, Notification
+from src.core.settings_registry import settings_registry
+from src.services.scheduler import check_and_expire_subscriptions, send_renewal_reminders
+from src.services.notification_counters import get_unread_count, reconcile_unread_counters
+
+
+class TestScheduledJobs(unittest.TestCase):
+    """اختبار منطق فترة السماح والتذكيرات على دفعات"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        with self.app.app_context():
+            db.drop_all()
+            db.create_all()
+            db.session.add(Role(role_id=1, role_name='Trader', description='تاجر'))
+            db.session.commit()
+            settings_registry.update({'grace_period_days': '7', 'enable_grace_period': 'true'})
+
+            now = datetime.utcnow()
+            self.cases = {}
+            specs = {
+                'expired_no_grace': (now - timedelta(days=2), False),
+                'in_grace': (now - timedelta(days=2), True),
+                'grace_over': (now - timedelta(days=8), True),
+                'still_active': (now + timedelta(days=30), True),
+                'd14': (now + timedelta(days=14, hours=2), True),
+                'd7': (now + timedelta(days=7, hours=2), True),
+                'd3': (now + timedelta(days=3, hours=2), True),
+                'd6': (now + timedelta(days=6, hours=2), True),
+            }
+            for name, (end_date, grace) in specs.items():
+                user = User(username=f'job_{name}', email=f'job_{name}@test.com',
+                            password_hash='x', full_name=name, role_id=1)
+                db.session.add(user)
+                db.session.flush()
+                subscription = Subscription(
+                    user_id=user.user_id,
+                    start_date=end_date - timedelta(days=365),
+                    end_date=end_date,
+                    status='active',
+                    grace_period_enabled=grace
+                )
+                db.session.add(subscription)
+                db.session.flush()
+                self.cases[name] = (user.user_id, subscription.subscription_id)
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        settings_registry.invalidate()
+
+    def _status(self, name):
+        return db.session.get(Subscription, self.cases[name][1]).status
+
+    def test_expiry_respects_grace_period(self):
+        """الاشتراك ينتهي فقط بعد فترة السماح إن كانت مفعلة له"""
+        with self.app.app_context():
+            result = check_and_expire_subscriptions(batch_size=1)
+
+            self.assertTrue(result['success'])
+            self.assertEqual(result['expired_count'], 2)
+            self.assertEqual(result['metrics']['rows_updated'], 2)
+            self.assertEqual(result['metrics']['batches'], 2)
+            self.assertIn('elapsed_ms', result['metrics'])
+
+            self.assertEqual(self._status('expired_no_grace'), 'expired')
+            self.assertEqual(self._status('grace_over'), 'expired')
+            self.assertEqual(self._status('in_grace'), 'active')
+            self.assertEqual(self._status('still_active'), 'active')
+
+    def test_expiry_without_global_grace(self):
+        """تعطيل فترة السماح عامةً ينهي كل اشتراك تجاوز تاريخ الانتهاء"""
+        with self.app.app_context():
+            settings_registry.update({'enable_grace_period': 'false'})
+            result = check_and_expire_subscriptions()
+            self.assertEqual(result['expired_count'], 3)
+            self.assertEqual(self._status('in_grace'), 'expired')
+
+    def test_reminders_are_sent_once(self):
+        """تذكير واحد لكل مرحلة ولا يتكرر في التشغيل التالي"""
+        with self.app.app_context():
+            result = send_renewal_reminders(batch_size=2)
+            self.assertTrue(result['success'])
+            self.assertEqual(result['reminders_sent'], 3)
+            self.assertEqual(result['metrics']['by_stage'], {'d14': 1, 'd7': 1, 'd3': 1})
+
+            reminder = Notification.query.filter_by(
+                user_id=self.cases['d7'][0], type='renewal_reminder_7d'
+            ).one()
+            end_date = db.session.get(Subscription, self.cases['d7'][1]).end_date
+            self.assertIn(end_date.strftime('%Y-%m-%d'), reminder.message)
+            self.assertEqual(len(reminder.notification_id), 36)
+            self.assertFalse(reminder.is_read)
+            self.assertTrue(db.session.get(Subscription, self.cases['d7'][1]).notified_7d)
+            self.assertEqual(get_unread_count(self.cases['d7'][0]), 1)
+            self.assertEqual(reconcile_unread_counters(apply=False)['drift'], [])
+
+            self.assertEqual(Notification.query.filter_by(user_id=self.cases['d6'][0]).count(), 0)
+
+            again = send_renewal_reminders()
+            self.assertEqual(again['reminders_sent'], 0)
+            self.assertEqual(Notification.query.count(), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
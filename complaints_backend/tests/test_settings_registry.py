@@ -0,0 +1,151 @@
+"""
+اختبارات سجل الإعدادات داخل العملية (Settings Registry)
+"""
+import unittest
+import json
+from datetime import datetime, timedelta
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from src.database.db import db
+from src.main import app
+from src.models.complaint import User, Role, Settings
+from src.core.settings_registry import settings_registry, get_settings, VERSION_KEY
+
+
+class TestSettingsRegistry(unittest.TestCase):
+    """اختبار تحميل الإعدادات المطبوعة ورقم الإصدار"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = app
+        cls.app.config['TESTING'] = True
+        cls.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    def setUp(self):
+        self.client = self.app.test_client()
+        self.app.limiter.reset()
+
+        with self.app.app_context():
+            db.create_all()
+
+            if not Role.query.filter_by(role_name='Higher Committee').first():
+                db.session.add(Role(role_id=3, role_name='Higher Committee', description='لجنة عليا'))
+                db.session.commit()
+
+            admin = User(
+                username='settings_admin',
+                email='settings_admin@test.com',
+                password_hash=generate_password_hash('admin123'),
+                full_name='مشرف الإعدادات',
+                role_id=3
+            )
+            db.session.add(admin)
+            db.session.commit()
+            self.admin_id = admin.user_id
+
+            Settings.query.filter(Settings.key.in_(['currency', VERSION_KEY])).delete(synchronize_session=False)
+            settings_registry.update({
+                'annual_subscription_price': '20000',
+                'grace_period_days': '10',
+                'enable_grace_period': 'false'
+            })
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        settings_registry.invalidate()
+
+    def test_values_are_typed(self):
+        """القيم تُحوّل إلى أنواعها مع القيم الافتراضية للمفاتيح الناقصة"""
+        with self.app.app_context():
+            settings = get_settings()
+            self.assertEqual(settings.annual_subscription_price, 20000.0)
+            self.assertEqual(settings.grace_period_days, 10)
+            self.assertFalse(settings.enable_grace_period)
+            self.assertEqual(settings.currency, 'YER')
+
+    def test_hot_path_issues_no_queries(self):
+        """القراءة بعد التحميل الأول لا تنفذ أي استعلام"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            get_settings()
+            event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+            try:
+                for _ in range(5):
+                    get_settings()
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        self.assertEqual(statements, [])
+
+    def test_bulk_update_bumps_version(self):
+        """التحديث الجماعي يرفع الإصدار ويظهر فوراً في السجل"""
+        with self.app.app_context():
+            version_before = get_settings().version
+            self.assertEqual(version_before, 1)
+            settings_registry.update({'grace_period_days': 3, 'currency': 'USD'})
+
+            settings = get_settings()
+            self.assertEqual(settings.version, version_before + 1)
+            self.assertEqual(settings.grace_period_days, 3)
+            self.assertEqual(settings.currency, 'USD')
+            self.assertEqual(Settings.query.filter_by(key=VERSION_KEY).first().value, str(settings.version))
+
+    def test_version_is_incremented_in_sql(self):
+        """الإصدار يُرفع بجملة UPDATE على القيمة المخزنة لا بقراءة ثم كتابة"""
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            get_settings()
+            # عامل آخر رفع الإصدار بعد آخر قراءة لهذا العامل
+            Settings.query.filter_by(key=VERSION_KEY).update({'value': '7'})
+            db.session.commit()
+
+            event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+            try:
+                version = settings_registry.update({'grace_period_days': 4})
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+            self.assertEqual(version, 8)
+            self.assertEqual(settings_registry.update({'grace_period_days': 5}), 9)
+            self.assertEqual(get_settings().version, 9)
+
+        self.assertFalse(any(s.lstrip().upper().startswith('SELECT') for s in statements))
+        self.assertTrue(any('CAST(settings.value AS INTEGER) + ' in s for s in statements))
+
+    def test_admin_put_settings_uses_registry(self):
+        """PUT /api/admin/settings يحدّث القيم ويعيد رقم الإصدار"""
+        token = jwt.encode({
+            'user_id': self.admin_id,
+            'exp': datetime.utcnow() + timedelta(hours=1)
+        }, self.app.config['SECRET_KEY'], algorithm='HS256')
+
+        response = self.client.put(
+            '/api/admin/settings',
+            headers={'Authorization': f'Bearer {token}'},
+            json={'annual_subscription_price': 30000}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('version', json.loads(response.data))
+
+        price = self.client.get('/api/subscription-price')
+        self.assertEqual(json.loads(price.data)['price'], 30000.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+اختبارات واجهة التخزين S3/MinIO باستخدام Stubber من botocore (بدون شبكة)
+"""
+import unittest
+from unittest import mock
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botocore.stub import Stubber, ANY
+from src.core import storage
+from src.core.storage import S3Storage, get_storage_backend, reset_storage_backend
+
+ENDPOINT = 'http://minio.test:9000'
+
+
+class TestS3Storage(unittest.TestCase):
+
+    def setUp(self):
+        storage._clients.clear()
+        reset_storage_backend()
+        self.addCleanup(storage._clients.clear)
+        self.addCleanup(reset_storage_backend)
+        self.backend = S3Storage('receipts', endpoint_url=ENDPOINT, access_key='key', secret_key='secret')
+        self.stubber = Stubber(self.backend.s3_client)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def test_backends_share_one_tuned_client(self):
+        other = S3Storage('receipts', endpoint_url=ENDPOINT, access_key='key', secret_key='secret')
+        self.assertIs(other.s3_client, self.backend.s3_client)
+        config = self.backend.s3_client.meta.config
+        self.assertEqual(config.max_pool_connections, 50)
+        self.assertEqual(config.s3['addressing_style'], 'path')
+
+        elsewhere = S3Storage('receipts', endpoint_url='http://other.test:9000', access_key='key', secret_key='secret')
+        self.assertIsNot(elsewhere.s3_client, self.backend.s3_client)
+
+    def test_save_uses_transfer_config(self):
+        with mock.patch.dict(os.environ, {'S3_MULTIPART_THRESHOLD_MB': '16', 'S3_MAX_CONCURRENCY': '4'}):
+            backend = S3Storage('receipts', endpoint_url=ENDPOINT, access_key='key', secret_key='secret')
+        self.assertEqual(backend.transfer_config.multipart_threshold, 16 * 1024 * 1024)
+        self.assertEqual(backend.transfer_config.max_concurrency, 4)
+
+        with mock.patch.object(backend.s3_client, 'upload_fileobj') as upload:
+            key = backend.save(io.BytesIO(b'data'), 'receipt.png', folder='receipts')
+        self.assertTrue(key.startswith('receipts/receipt_'))
+        self.assertIs(upload.call_args.kwargs['Config'], backend.transfer_config)
+
+    def test_presigned_urls_are_cached_until_refresh_margin(self):
+        presign = mock.Mock(side_effect=lambda *args, **kwargs: f'{ENDPOINT}/signed/{presign.call_count}')
+        with mock.patch.object(self.backend.s3_client, 'generate_presigned_url', presign):
+            first = self.backend.get_url('ab/receipt.png')
+            self.assertEqual(self.backend.get_url('ab/receipt.png'), first)
+            self.assertEqual(presign.call_count, 1)
+            self.assertEqual(presign.call_args.kwargs['ExpiresIn'], 3600)
+
+            with mock.patch('src.core.cache.time.monotonic', return_value=10 ** 9):
+                self.assertNotEqual(self.backend.get_url('ab/receipt.png'), first)
+            self.assertEqual(presign.call_count, 2)
+
+            self.stubber.add_response('delete_object', {}, {'Bucket': 'receipts', 'Key': 'ab/receipt.png'})
+            self.assertTrue(self.backend.delete('ab/receipt.png'))
+            self.backend.get_url('ab/receipt.png')
+            self.assertEqual(presign.call_count, 3)
+
+    def test_delete_many_batches_requests(self):
+        keys = [f'receipts/{i:04d}.png' for i in range(1500)]
+        self.stubber.add_response('delete_objects', {}, {
+            'Bucket': 'receipts',
+            'Delete': {'Objects': [{'Key': key} for key in keys[:1000]], 'Quiet': True}
+        })
+        self.stubber.add_response('delete_objects', {
+            'Errors': [{'Key': keys[-1], 'Code': 'AccessDenied', 'Message': 'denied'}]
+        }, {'Bucket': 'receipts', 'Delete': ANY})
+
+        self.assertEqual(self.backend.delete_many(keys + keys[:10]), 1499)
+        self.stubber.assert_no_pending_responses()
+
+    def test_get_storage_backend_is_a_singleton(self):
+        env = {'STORAGE_BACKEND': 'minio', 'MINIO_ENDPOINT': 'minio.test:9000',
+               'MINIO_ACCESS_KEY': 'key', 'MINIO_SECRET_KEY': 'secret'}
+        with mock.patch.dict(os.environ, env):
+            backend = get_storage_backend()
+            self.assertIs(get_storage_backend(), backend)
+        self.assertIsInstance(backend, S3Storage)
+        self.assertEqual(backend.bucket_name, 'complaints-uploads')
+        self.assertEqual(backend.s3_client.meta.endpoint_url, ENDPOINT)
+        self.assertIs(backend.s3_client, self.backend.s3_client)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,7 @@ import { Textarea } from './ui/textarea';
 import { Badge } from './ui/badge';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogDescription, DialogFooter } from './ui/dialog';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from './ui/tabs';
-import { CheckCircle, XCircle, Eye, Clock } from 'lucide-react';
+import { CheckCircle, XCircle, Eye, Clock, AlertTriangle } from 'lucide-react';
 import axios from 'axios';
 
 const PaymentReview = () => {
@@ -137,6 +137,22 @@ const PaymentReview = () => {
                               <h3 className="font-semibold text-lg">{payment.user_name}</h3>
                               {getStatusBadge(payment.status)}
                             </div>
+
+                            {payment.duplicate_receipts?.length > 0 && (
+                              <div className="flex items-start gap-2 rounded-md border border-orange-300 bg-orange-50 p-2 text-sm text-orange-800">
+                                <AlertTriangle className="w-4 h-4 mt-0.5 shrink-0" />
+                                <div>
+                                  نفس صورة الإيصال أُرسلت مسبقاً مع:
+                                  {payment.duplicate_receipts.map(other => (
+                                    <div key={other.payment_id}>
+                                      الدفعة <span className="font-mono">{other.payment_id.slice(0, 8)}</span>
+                                      {' '}من {other.user_name} ({other.status})
+                                      {other.created_at && ` - ${new Date(other.created_at).toLocaleDateString('ar-YE')}`}
+                                    </div>
+                                  ))}
+                                </div>
+                              </div>
+                            )}
                             
                             <div className="grid grid-cols-2 gap-x-6 gap-y-2 text-sm">
                               <div>
@@ -253,10 +269,18 @@ const PaymentReview = () => {
           {selectedPayment && (
             <div className="mt-4">
               <img
-                src={`/api/payment/receipt/${selectedPayment.receipt_image_path}`}
+                src={`/api/payment/receipt/${selectedPayment.receipt_image_path}?size=review`}
                 alt="إيصال الدفع"
                 className="w-full rounded-lg border"
               />
+              <a
+                href={`/api/payment/receipt/${selectedPayment.receipt_image_path}`}
+                target="_blank"
+                rel="noreferrer"
+                className="mt-2 inline-block text-sm text-blue-600 hover:underline"
+              >
+                عرض الصورة الأصلية
+              </a>
             </div>
           )}
         </DialogContent>
@@ -75,10 +75,24 @@ const Reports = () => {
     fetchData();
   }, []);
 
-  const exportReport = (format) => {
-    // This would typically generate and download a report
-    console.log(`Exporting report in ${format} format`);
-    // Implementation would depend on backend API
+  const exportReport = async (format) => {
+    try {
+      const params = { format };
+      if (selectedCategory !== 'all') params.category_id = selectedCategory;
+      if (selectedStatus !== 'all') params.status_id = selectedStatus;
+
+      const response = await axios.get('/api/complaints/export', { params, responseType: 'blob' });
+      const url = window.URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `complaints.${format}`;
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      window.URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error('Failed to export complaints:', error);
+    }
   };
 
   const formatChartData = (data, labelKey, valueKey) => {
@@ -140,11 +154,11 @@ const Reports = () => {
               </p>
             </div>
             <div className="flex items-center gap-3">
-              <Button onClick={() => exportReport('pdf')} className="bg-red-600 hover:bg-red-700">
+              <Button onClick={() => exportReport('csv')} className="bg-blue-600 hover:bg-blue-700">
                 <Download className="w-4 h-4 mr-2" />
-                تصدير PDF
+                تصدير CSV
               </Button>
-              <Button onClick={() => exportReport('excel')} className="bg-green-600 hover:bg-green-700">
+              <Button onClick={() => exportReport('xlsx')} className="bg-green-600 hover:bg-green-700">
                 <Download className="w-4 h-4 mr-2" />
                 تصدير Excel
               </Button>
@@ -0,0 +1,37 @@
+"""
+gunicorn settings shared by the container CMD (loaded automatically from the working directory).
+
+Prometheus multiprocess mode: every worker writes its metric values to files under
+PROMETHEUS_MULTIPROC_DIR and /metrics aggregates them, so the directory is wiped when
+the master starts and a dead worker's live gauges are discarded when it exits.
+
+Notification streams (SSE) hold a connection, and so a gthread thread, for up to
+SSE_MAX_SECONDS. They are served by a separate gunicorn (the `stream` service in
+docker-compose.yml, nginx routes /api/notifications/stream to it) with more threads, so
+open streams never take the threads of the regular API. Both masters share PUBSUB_DIR;
+it is only created here, not wiped, since sockets of dead processes are removed by the
+next publisher. The database pool follows GUNICORN_THREADS (see src/main.py).
+"""
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+
+def on_starting(server):
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+    if os.environ.get('PUBSUB_DIR'):
+        os.makedirs(os.environ['PUBSUB_DIR'], exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)